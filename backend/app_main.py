@@ -11,7 +11,13 @@ import os
 import logging
 
 from backend.routers import auth, exams, students, questions, answers, grading, scores
-from backend.database import engine
+from backend.database import engine, get_pool_status, configure_db_threadpool, run_db_task
+from backend.services.question_import import shutdown_parse_pool
+from backend.services.student_search import ensure_student_index
+from backend.services.sessions import last_login_flusher
+from backend.services.sheet_preprocess import preprocess_dispatcher, pipeline_stats
+from backend.services.derived_images import derived_image_cache
+from backend.services.grading.jobs import grading_worker_pool
 from sqlalchemy import text
 
 # 配置日志
@@ -28,6 +34,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
 # 注册路由
@@ -39,6 +46,26 @@ app.include_router(answers.router, tags=["答题卡管理"])
 app.include_router(grading.router, tags=["AI阅卷"])
 app.include_router(scores.router, tags=["成绩管理"])
 
+@app.on_event("startup")
+async def startup():
+    """启动时配置数据库线程池容量，并补建学生检索索引"""
+    configure_db_threadpool()
+    last_login_flusher.start()
+    preprocess_dispatcher.start()
+    grading_worker_pool.start()
+    try:
+        await run_db_task(ensure_student_index)
+    except Exception as e:
+        logger.warning(f"学生检索索引检查失败: {str(e)}")
+
+@app.on_event("shutdown")
+def shutdown():
+    """关闭后台进程池，写入尚未落库的登录时间"""
+    shutdown_parse_pool()
+    preprocess_dispatcher.stop()
+    grading_worker_pool.stop()
+    last_login_flusher.stop()
+
 # ==================== 系统健康检查 ====================
 
 @app.get("/api/health")
@@ -68,6 +95,42 @@ def health_check():
             }
         }
 
+@app.get("/api/health/pool")
+def pool_status():
+    """数据库连接池状态"""
+    return {
+        "code": 1,
+        "msg": "获取成功",
+        "data": {
+            **get_pool_status(),
+            "timestamp": datetime.now().isoformat()
+        }
+    }
+
+@app.get("/api/health/preprocess")
+def preprocess_status():
+    """答题卡预处理流水线统计（各阶段平均耗时、吞吐量）"""
+    return {
+        "code": 1,
+        "msg": "获取成功",
+        "data": {
+            **pipeline_stats.snapshot(),
+            "timestamp": datetime.now().isoformat()
+        }
+    }
+
+@app.get("/api/health/derived-images")
+def derived_image_cache_status():
+    """缩略图/预览图缓存统计（命中、未命中、淘汰次数和占用空间）"""
+    return {
+        "code": 1,
+        "msg": "获取成功",
+        "data": {
+            **derived_image_cache.stats(),
+            "timestamp": datetime.now().isoformat()
+        }
+    }
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8001)
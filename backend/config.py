@@ -1,11 +1,48 @@
 import os
+import json
+
+# 可选的JSON配置文件，通过环境变量 EXAM_PLATFORM_CONFIG 指定路径
+# 文件中的键与下方环境变量同名（如 {"DB_HOST": "127.0.0.1", "DB_POOL_SIZE": 20}）
+_CONFIG_FILE = os.getenv("EXAM_PLATFORM_CONFIG")
+_FILE_CONFIG = {}
+if _CONFIG_FILE and os.path.exists(_CONFIG_FILE):
+    with open(_CONFIG_FILE, "r", encoding="utf-8") as f:
+        _FILE_CONFIG = json.load(f)
+
+def get_setting(name, default=None, cast=str):
+    """读取配置项，优先级：环境变量 > 配置文件 > 默认值"""
+    value = os.getenv(name, _FILE_CONFIG.get(name))
+    if value is None:
+        return default
+    if cast is bool and isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    return cast(value)
 
 # 数据库配置
 DATABASE_CONFIG = {
-    'host': 'localhost',
-    'user': 'root',
-    'password': '',  # 请根据实际情况修改，如果无密码则留空
-    'database': 'exam_platform'
+    'host': get_setting("DB_HOST", 'localhost'),
+    'port': get_setting("DB_PORT", 3306, int),
+    'user': get_setting("DB_USER", 'root'),
+    'password': get_setting("DB_PASSWORD", ''),  # 请根据实际情况修改，如果无密码则留空
+    'database': get_setting("DB_NAME", 'exam_platform')
 }
 
+# 数据库连接池配置
+DATABASE_POOL_CONFIG = {
+    'pool_size': get_setting("DB_POOL_SIZE", 10, int),
+    'max_overflow': get_setting("DB_MAX_OVERFLOW", 20, int),
+    'pool_timeout': get_setting("DB_POOL_TIMEOUT", 30, float),      # 等待空闲连接的最长秒数
+    'pool_recycle': get_setting("DB_POOL_RECYCLE", 1800, int),      # 连接回收周期（秒），需小于MySQL wait_timeout
+    'pool_pre_ping': get_setting("DB_POOL_PRE_PING", True, bool),
+    'statement_timeout_ms': get_setting("DB_STATEMENT_TIMEOUT_MS", 0, int),  # 0表示不限制
+    'echo': get_setting("DB_ECHO", False, bool)                      # 默认关闭SQL日志
+}
+# 执行数据库操作的线程数，默认与连接池上限一致
+DATABASE_POOL_CONFIG['threadpool_size'] = get_setting(
+    "DB_THREADPOOL_SIZE", DATABASE_POOL_CONFIG['pool_size'] + DATABASE_POOL_CONFIG['max_overflow'], int
+)
 
+# 答题卡图片存储目录
+UPLOAD_DIR = get_setting("UPLOAD_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "uploads"))
+# 单个上传文件的大小上限（字节）
+MAX_UPLOAD_BYTES = get_setting("MAX_UPLOAD_BYTES", 50 * 1024 * 1024, int)
@@ -1,8 +1,160 @@
-from sqlalchemy import create_engine
-from .config import DATABASE_CONFIG
+import threading
+import time
+from functools import partial
+
+import anyio
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+from .config import DATABASE_CONFIG, DATABASE_POOL_CONFIG
+
+
+class PoolStats:
+    """连接池运行统计（线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.overflow_events = 0
+        self.timeouts = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+
+    def record_checkout(self, wait_ms: float, overflowed: bool):
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+            if overflowed:
+                self.overflow_events += 1
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "overflow_events": self.overflow_events,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": round(self.total_wait_ms / self.checkouts, 3) if self.checkouts else 0.0,
+                "max_wait_ms": round(self.max_wait_ms, 3)
+            }
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    记录取连接等待时间、溢出和超时次数的连接池
+
+    溢出次数只统计本次取连接时新建了溢出连接（溢出计数增加到大于0）的情况，
+    池中已有溢出连接时复用空闲连接不计入。
+    """
+
+    stats: PoolStats = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # 溢出计数的增减串行化，使增加后读取的值即为本次增加的结果
+        self._overflow_count_lock = threading.Lock()
+        self._checkout_state = threading.local()
+
+    def _inc_overflow(self):
+        with self._overflow_count_lock:
+            created = super()._inc_overflow()
+            if created and self._overflow > 0:
+                self._checkout_state.overflowed = True
+            return created
+
+    def _dec_overflow(self):
+        with self._overflow_count_lock:
+            return super()._dec_overflow()
+
+    def _do_get(self):
+        state = self._checkout_state
+        # QueuePool在竞争失败时会递归调用_do_get，只在最外层统计一次
+        if getattr(state, "active", False):
+            return super()._do_get()
+        state.active = True
+        state.overflowed = False
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except PoolTimeoutError:
+            self.stats.record_timeout()
+            raise
+        finally:
+            state.active = False
+        wait_ms = (time.perf_counter() - start) * 1000
+        self.stats.record_checkout(wait_ms, state.overflowed)
+        return conn
+
+
+def build_database_url(config: dict) -> str:
+    """根据配置生成数据库连接URL"""
+    return (
+        f"mysql+pymysql://{config['user']}:{config['password']}"
+        f"@{config['host']}:{config.get('port', 3306)}/{config['database']}"
+    )
+
+
+def create_db_engine(config: dict = None, pool_config: dict = None):
+    """按配置创建数据库引擎"""
+    config = config or DATABASE_CONFIG
+    pool_config = {**DATABASE_POOL_CONFIG, **(pool_config or {})}
+
+    stats = PoolStats()
+    pool_class = type("EnginePool", (InstrumentedQueuePool,), {"stats": stats})
+
+    new_engine = create_engine(
+        build_database_url(config),
+        poolclass=pool_class,
+        pool_size=pool_config['pool_size'],
+        max_overflow=pool_config['max_overflow'],
+        pool_timeout=pool_config['pool_timeout'],
+        pool_recycle=pool_config['pool_recycle'],
+        pool_pre_ping=pool_config['pool_pre_ping'],
+        echo=pool_config['echo']
+    )
+    new_engine.pool_stats = stats
+
+    statement_timeout_ms = pool_config['statement_timeout_ms']
+    if statement_timeout_ms > 0:
+        @event.listens_for(new_engine, "connect")
+        def set_statement_timeout(dbapi_conn, connection_record):
+            # MySQL的max_execution_time仅对只读SELECT生效
+            cursor = dbapi_conn.cursor()
+            cursor.execute(f"SET SESSION max_execution_time = {int(statement_timeout_ms)}")
+            cursor.close()
+
+    return new_engine
+
+
+def get_pool_status(target_engine=None) -> dict:
+    """获取连接池实时状态"""
+    target_engine = target_engine or engine
+    pool = target_engine.pool
+    return {
+        "pool_size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": pool.overflow(),
+        "max_overflow": pool._max_overflow,
+        **target_engine.pool_stats.snapshot()
+    }
+
 
 # 创建数据库连接
-engine = create_engine(
-    f"mysql+pymysql://{DATABASE_CONFIG['user']}:{DATABASE_CONFIG['password']}@{DATABASE_CONFIG['host']}:3306/{DATABASE_CONFIG['database']}",
-    echo=True
-)
+engine = create_db_engine()
+
+
+# 数据库线程池：同步路由和async路由中的数据库操作共用一个有界线程池，避免阻塞事件循环
+def configure_db_threadpool():
+    """将默认线程池容量设置为配置值（需在事件循环内调用）"""
+    anyio.to_thread.current_default_thread_limiter().total_tokens = DATABASE_POOL_CONFIG['threadpool_size']
+
+async def run_db_task(func, *args, **kwargs):
+    """在有界线程池中执行同步数据库函数"""
+    return await anyio.to_thread.run_sync(partial(func, *args, **kwargs))
@@ -1,20 +1,144 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File
-from typing import List
+from fastapi import APIRouter, HTTPException, UploadFile, File, Query
+from fastapi.responses import FileResponse
+from typing import List, Optional
+from sqlalchemy import text
 import logging
 
+from backend.database import engine, run_db_task
+from backend.services.pagination import encode_cursor, decode_cursor
+from backend.services.serialization import ROWS_FORMAT, LIST_FORMAT_PATTERN, encode_rows, json_response
+from backend.services.answer_storage import ingest_uploads, object_path
+from backend.services.derived_images import DERIVED_VARIANTS, DerivedImageError, derived_image_cache
+from backend.services.sheet_preprocess import preprocess_dispatcher
+
 # 配置日志
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+def _check_exam_exists(exam_id: int):
+    """检查考试是否存在，不存在时抛出404"""
+    with engine.connect() as conn:
+        exam_result = conn.execute(text("SELECT exam_id FROM exams WHERE exam_id = :exam_id"), {"exam_id": exam_id}).fetchone()
+        if not exam_result:
+            raise HTTPException(status_code=404, detail=f"考试 {exam_id} 不存在")
+
 @router.get("/api/exams/{exam_id}/images")
-def get_exam_images(exam_id: int):
-    """获取考试答题卡图片列表"""
-    # 占位符实现
-    return {"code": 1, "msg": "获取成功", "data": []}
+def get_exam_images(
+    exam_id: int,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    format: str = Query(ROWS_FORMAT, pattern=LIST_FORMAT_PATTERN)
+):
+    """获取考试答题卡图片列表（按上传顺序游标分页）"""
+    try:
+        conditions = ["exam_id = :exam_id"]
+        params = {"exam_id": exam_id, "limit": limit + 1}
+        if cursor:
+            (cursor_id,) = decode_cursor(cursor, int)
+            conditions.append("image_id > :cursor_id")
+            params["cursor_id"] = cursor_id
+
+        with engine.connect() as conn:
+            result = conn.execute(
+                text(f"""
+                SELECT image_id, student_id, original_filename, content_type, file_size, content_hash, status, created_at
+                FROM answer_images
+                WHERE {' AND '.join(conditions)}
+                ORDER BY image_id
+                LIMIT :limit
+                """),
+                params
+            )
+            columns = list(result.keys())
+            rows = result.fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1].image_id)
+
+        return json_response({
+            "code": 1,
+            "msg": "获取成功",
+            "data": encode_rows(rows, columns, format),
+            "next_cursor": next_cursor
+        })
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"获取答题卡图片失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"获取答题卡图片失败: {str(e)}")
 
 @router.post("/api/exams/{exam_id}/images")
 async def upload_exam_images(exam_id: int, files: List[UploadFile] = File(...)):
-    """上传答题卡图片"""
-    # 占位符实现
-    return {"code": 1, "msg": "上传成功", "data": {"count": len(files)}}
+    """上传答题卡图片（分块写盘并按内容哈希去重）"""
+    try:
+        await run_db_task(_check_exam_exists, exam_id)
+
+        uploads = [(file.filename, file.content_type, file.file) for file in files]
+        images, errors = await run_db_task(ingest_uploads, exam_id, uploads)
+        if images:
+            # 唤醒预处理调度线程领取新图片
+            preprocess_dispatcher.notify()
+
+        duplicate_count = sum(1 for image in images if image["duplicate"])
+        return {
+            "code": 1,
+            "msg": "上传成功",
+            "data": {
+                "count": len(images) - duplicate_count,
+                "duplicate_count": duplicate_count,
+                "images": images,
+                "errors": errors
+            }
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"上传答题卡图片失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"上传答题卡图片失败: {str(e)}")
+
+@router.get("/api/exams/{exam_id}/images/preprocess-status")
+def get_preprocess_status(exam_id: int):
+    """获取考试答题卡的预处理进度（按状态统计）"""
+    try:
+        with engine.connect() as conn:
+            result = conn.execute(
+                text("SELECT status, COUNT(*) AS image_count FROM answer_images WHERE exam_id = :exam_id GROUP BY status"),
+                {"exam_id": exam_id}
+            )
+            counts = {"uploaded": 0, "processing": 0, "processed": 0, "failed": 0}
+            counts.update({row.status: row.image_count for row in result})
+        return {"code": 1, "msg": "获取成功", "data": counts}
+    except Exception as e:
+        logger.error(f"获取预处理进度失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"获取预处理进度失败: {str(e)}")
+
+@router.get("/api/images/{image_id}/{variant}")
+def get_derived_image(image_id: int, variant: str):
+    """获取答题卡的缩略图(thumb)或预览图(preview)，首次请求时生成并缓存"""
+    if variant not in DERIVED_VARIANTS:
+        raise HTTPException(status_code=404, detail=f"未知的图片规格: {variant}")
+    try:
+        with engine.connect() as conn:
+            image = conn.execute(
+                text("SELECT content_hash, storage_path FROM answer_images WHERE image_id = :image_id"),
+                {"image_id": image_id}
+            ).fetchone()
+        if not image:
+            raise HTTPException(status_code=404, detail=f"图片 {image_id} 不存在")
+
+        path = derived_image_cache.get_or_create(variant, image.content_hash, object_path(image.storage_path))
+        # 派生图片由内容哈希决定，内容不会变化，可长期缓存
+        return FileResponse(path, media_type="image/jpeg", headers={
+            "Cache-Control": "public, max-age=31536000, immutable",
+            "ETag": f'"{image.content_hash}-{variant}"'
+        })
+    except HTTPException:
+        raise
+    except DerivedImageError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        logger.error(f"获取派生图片失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"获取派生图片失败: {str(e)}")
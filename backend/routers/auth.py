@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
 from typing import Optional
 from datetime import datetime
@@ -6,7 +6,8 @@ import hashlib
 from sqlalchemy import text
 import logging
 
-from backend.database import engine
+from backend.database import engine, run_db_task
+from backend.services.sessions import create_session, revoke_session, get_current_session, last_login_flusher
 
 # 配置日志
 logger = logging.getLogger(__name__)
@@ -47,6 +48,44 @@ def verify_password(password: str, hashed_password: str) -> bool:
     """验证密码"""
     return hash_password(password) == hashed_password
 
+def _create_user(user: UserRegisterRequest) -> int:
+    """创建用户（同步，在数据库线程池中执行）"""
+    with engine.connect() as conn:
+        # 检查用户名是否已存在
+        existing_user = conn.execute(
+            text("SELECT user_id FROM users WHERE username = :username"),
+            {"username": user.username}
+        ).fetchone()
+
+        if existing_user:
+            raise HTTPException(status_code=400, detail="用户名已存在")
+
+        # 检查邮箱是否已存在（如果提供了邮箱）
+        if user.email:
+            existing_email = conn.execute(
+                text("SELECT user_id FROM users WHERE email = :email"),
+                {"email": user.email}
+            ).fetchone()
+
+            if existing_email:
+                raise HTTPException(status_code=400, detail="邮箱已被使用")
+
+        # 创建新用户
+        password_hash = hash_password(user.password)
+        result = conn.execute(
+            text("""
+            INSERT INTO users (username, password_hash, email, role)
+            VALUES (:username, :password_hash, :email, 'teacher')
+            """),
+            {
+                "username": user.username,
+                "password_hash": password_hash,
+                "email": user.email
+            }
+        )
+        conn.commit()
+        return result.lastrowid
+
 @router.post("/api/register")
 async def register_user(user: UserRegisterRequest):
     """用户注册"""
@@ -57,53 +96,47 @@ async def register_user(user: UserRegisterRequest):
         if len(user.password) < 1 or len(user.password) > 255:
             raise HTTPException(status_code=400, detail="密码长度必须在1-255字符之间")
 
-        with engine.connect() as conn:
-            # 检查用户名是否已存在
-            existing_user = conn.execute(
-                text("SELECT user_id FROM users WHERE username = :username"),
-                {"username": user.username}
-            ).fetchone()
+        user_id = await run_db_task(_create_user, user)
 
-            if existing_user:
-                raise HTTPException(status_code=400, detail="用户名已存在")
-
-            # 检查邮箱是否已存在（如果提供了邮箱）
-            if user.email:
-                existing_email = conn.execute(
-                    text("SELECT user_id FROM users WHERE email = :email"),
-                    {"email": user.email}
-                ).fetchone()
-
-                if existing_email:
-                    raise HTTPException(status_code=400, detail="邮箱已被使用")
-
-            # 创建新用户
-            password_hash = hash_password(user.password)
-            result = conn.execute(
-                text("""
-                INSERT INTO users (username, password_hash, email, role)
-                VALUES (:username, :password_hash, :email, 'teacher')
-                """),
-                {
-                    "username": user.username,
-                    "password_hash": password_hash,
-                    "email": user.email
-                }
-            )
-            conn.commit()
-            user_id = result.lastrowid
-
-            return {
-                "code": 1,
-                "msg": "注册成功",
-                "data": {"user_id": user_id}
-            }
+        return {
+            "code": 1,
+            "msg": "注册成功",
+            "data": {"user_id": user_id}
+        }
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"用户注册失败: {str(e)}")
         raise HTTPException(status_code=500, detail="注册失败，请重试")
 
+def _authenticate_user(username: str, password: str) -> dict:
+    """校验用户名密码（同步，查询和密码哈希计算都在数据库线程池中执行）"""
+    with engine.connect() as conn:
+        # 查找用户
+        result = conn.execute(
+            text("""
+            SELECT user_id, username, password_hash, email, role, is_active, last_login
+            FROM users WHERE username = :username
+            """),
+            {"username": username}
+        )
+        user_data = result.fetchone()
+
+        if not user_data:
+            raise HTTPException(status_code=401, detail="用户名或密码错误")
+
+        user_dict = dict(zip(result.keys(), user_data))
+
+        # 检查用户是否激活
+        if not user_dict['is_active']:
+            raise HTTPException(status_code=401, detail="用户账号已被禁用")
+
+        # 验证密码
+        if not verify_password(password, user_dict['password_hash']):
+            raise HTTPException(status_code=401, detail="用户名或密码错误")
+
+        return user_dict
+
 @router.post("/api/login")
 async def login_user(user: UserLoginRequest):
     """用户登录"""
@@ -111,50 +144,52 @@ async def login_user(user: UserLoginRequest):
         if not user.username or not user.password:
             raise HTTPException(status_code=400, detail="用户名和密码不能为空")
 
-        with engine.connect() as conn:
-            # 查找用户
-            result = conn.execute(
-                text("""
-                SELECT user_id, username, password_hash, email, role, is_active, last_login
-                FROM users WHERE username = :username
-                """),
-                {"username": user.username}
-            )
-            user_data = result.fetchone()
-
-            if not user_data:
-                raise HTTPException(status_code=401, detail="用户名或密码错误")
-
-            user_dict = dict(zip(result.keys(), user_data))
-
-            # 检查用户是否激活
-            if not user_dict['is_active']:
-                raise HTTPException(status_code=401, detail="用户账号已被禁用")
-
-            # 验证密码
-            if not verify_password(user.password, user_dict['password_hash']):
-                raise HTTPException(status_code=401, detail="用户名或密码错误")
-
-            # 更新最后登录时间
-            conn.execute(
-                text("UPDATE users SET last_login = CURRENT_TIMESTAMP WHERE user_id = :user_id"),
-                {"user_id": user_dict['user_id']}
-            )
-            conn.commit()
-
-            # 返回用户信息（不包含密码）
-            return {
-                "code": 1,
-                "msg": "登录成功",
-                "data": {
-                    "user_id": user_dict['user_id'],
-                    "username": user_dict['username'],
-                    "email": user_dict['email'],
-                    "role": user_dict['role']
-                }
+        user_dict = await run_db_task(_authenticate_user, user.username, user.password)
+
+        # 最后登录时间由后台线程批量写入
+        last_login_flusher.record(user_dict['user_id'])
+        session = create_session(user_dict)
+
+        # 返回用户信息（不包含密码）和会话令牌
+        return {
+            "code": 1,
+            "msg": "登录成功",
+            "data": {
+                "user_id": user_dict['user_id'],
+                "username": user_dict['username'],
+                "email": user_dict['email'],
+                "role": user_dict['role'],
+                "token": session['token'],
+                "expires_at": session['expires_at']
             }
+        }
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"用户登录失败: {str(e)}")
         raise HTTPException(status_code=500, detail="登录失败，请重试")
+
+@router.get("/api/session")
+def get_session(session: dict = Depends(get_current_session)):
+    """获取当前登录用户"""
+    return {
+        "code": 1,
+        "msg": "获取成功",
+        "data": {
+            "user_id": session['user_id'],
+            "username": session['username'],
+            "email": session['email'],
+            "role": session['role'],
+            "expires_at": session['expires_at']
+        }
+    }
+
+@router.post("/api/logout")
+def logout_user(session: dict = Depends(get_current_session)):
+    """注销当前会话"""
+    try:
+        revoke_session(session)
+        return {"code": 1, "msg": "已退出登录"}
+    except Exception as e:
+        logger.error(f"退出登录失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"退出登录失败: {str(e)}")
@@ -1,6 +1,7 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Query, Request
 from pydantic import BaseModel
 from typing import Optional, List
+from datetime import datetime
 from sqlalchemy import text
 import logging
 import os
@@ -8,6 +9,9 @@ import shutil
 import time
 
 from backend.database import engine
+from backend.services.pagination import encode_cursor, decode_cursor
+from backend.services.serialization import ROWS_FORMAT, LIST_FORMAT_PATTERN, encode_rows
+from backend.services.response_cache import EXAMS_SCOPE, exam_scope, bump_versions, cached_json_response
 
 
 # 配置日志
@@ -34,37 +38,83 @@ class ExamUpdate(BaseModel):
 
 # ==================== 考试管理API ====================
 
+def _list_exams(status: Optional[str], date_from: Optional[str], date_to: Optional[str],
+                cursor: Optional[str], limit: Optional[int], list_format: str = ROWS_FORMAT) -> dict:
+    """查询考试列表（单条SQL关联学生人数）"""
+    conditions = []
+    params = {}
+
+    if status:
+        conditions.append("status = :status")
+        params["status"] = status
+    if date_from:
+        conditions.append("exam_date >= :date_from")
+        params["date_from"] = date_from
+    if date_to:
+        conditions.append("exam_date <= :date_to")
+        params["date_to"] = date_to
+    if cursor:
+        cursor_created_at, cursor_exam_id = decode_cursor(cursor, datetime, int)
+        conditions.append(
+            "(created_at < :cursor_created_at OR (created_at = :cursor_created_at AND exam_id < :cursor_exam_id))"
+        )
+        params["cursor_created_at"] = cursor_created_at
+        params["cursor_exam_id"] = cursor_exam_id
+
+    where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    limit_clause = ""
+    if limit is not None:
+        # 多取一条用于判断是否还有下一页
+        limit_clause = "LIMIT :limit"
+        params["limit"] = limit + 1
+
+    # 先在索引上按游标取出当前页的exam_id，再一次性关联学生数量，避免逐个考试COUNT
+    query = f"""
+        SELECT e.exam_id, e.exam_name, e.description, e.exam_date, e.created_at, e.updated_at,
+               e.status, e.total_questions, e.total_score,
+               COUNT(es.exam_student_id) AS student_count
+        FROM (
+            SELECT exam_id FROM exams
+            {where_clause}
+            ORDER BY created_at DESC, exam_id DESC
+            {limit_clause}
+        ) page
+        JOIN exams e ON e.exam_id = page.exam_id
+        LEFT JOIN exam_students es ON es.exam_id = e.exam_id
+        GROUP BY e.exam_id
+        ORDER BY e.created_at DESC, e.exam_id DESC
+    """
+
+    with engine.connect() as conn:
+        result = conn.execute(text(query), params)
+        columns = list(result.keys())
+        rows = result.fetchall()
+
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].exam_id)
+
+    return {"code": 1, "msg": "获取成功", "data": encode_rows(rows, columns, list_format), "next_cursor": next_cursor}
+
 @router.get("/api/exams")
-def get_exams():
-    """获取所有考试列表"""
+def get_exams(
+    request: Request,
+    status: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    format: str = Query(ROWS_FORMAT, pattern=LIST_FORMAT_PATTERN)
+):
+    """获取考试列表（支持状态/日期筛选和游标分页，按版本号缓存并支持ETag）"""
     try:
-        with engine.connect() as conn:
-            result = conn.execute(text("SELECT * FROM exams ORDER BY created_at DESC"))
-            rows = result.fetchall()
-            exams = []
-            for row in rows:
-                exam = {
-                    'exam_id': row.exam_id,
-                    'exam_name': row.exam_name,
-                    'description': row.description,
-                    'exam_date': row.exam_date.isoformat() if row.exam_date else None,
-                    'created_at': row.created_at.isoformat() if row.created_at else None,
-                    'updated_at': row.updated_at.isoformat() if row.updated_at else None,
-                    'status': row.status,
-                    'total_questions': row.total_questions,
-                    'total_score': row.total_score
-                }
-                exams.append(exam)
-
-            # 获取每个考试的学生数量
-            for exam in exams:
-                student_count = conn.execute(
-                    text("SELECT COUNT(*) as count FROM exam_students WHERE exam_id = :exam_id"),
-                    {"exam_id": exam['exam_id']}
-                ).scalar()
-                exam['student_count'] = student_count
-
-            return {"code": 1, "msg": "获取成功", "data": exams}
+        return cached_json_response(
+            request, [EXAMS_SCOPE],
+            lambda: _list_exams(status, date_from, date_to, cursor, limit, format)
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"获取考试列表失败: {str(e)}")
         raise HTTPException(status_code=500, detail=f"获取考试列表失败: {str(e)}")
@@ -89,6 +139,7 @@ def create_exam(exam: ExamRequest):
             )
             conn.commit()
             exam_id = result.lastrowid
+            bump_versions(EXAMS_SCOPE)
 
             return {"code": 1, "msg": "创建成功", "data": {"exam_id": exam_id}}
     except Exception as e:
@@ -130,6 +181,7 @@ def update_exam(exam_id: int, exam: ExamUpdate):
             query = f"UPDATE exams SET {', '.join(update_fields)} WHERE exam_id = :exam_id"
             conn.execute(text(query), update_params)
             conn.commit()
+            bump_versions(EXAMS_SCOPE, exam_scope(exam_id))
 
             return {"code": 1, "msg": "更新成功"}
     except Exception as e:
@@ -143,6 +195,7 @@ def delete_exam(exam_id: int):
         with engine.connect() as conn:
             conn.execute(text("DELETE FROM exams WHERE exam_id = :exam_id"), {"exam_id": exam_id})
             conn.commit()
+            bump_versions(EXAMS_SCOPE, exam_scope(exam_id))
             return {"code": 1, "msg": "删除成功"}
     except Exception as e:
         logger.error(f"删除考试失败: {str(e)}")
@@ -1,13 +1,99 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException
 import logging
 
+from backend.database import engine, run_db_task
+from backend.services.grading.jobs import (
+    GradingJobError, create_job, cancel_job, resume_job, get_job_status, get_exam_cache_stats
+)
+from sqlalchemy import text
+
 # 配置日志
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+def _check_exam_exists(exam_id: int):
+    """检查考试是否存在，不存在时抛出404"""
+    with engine.connect() as conn:
+        exam_result = conn.execute(text("SELECT exam_id FROM exams WHERE exam_id = :exam_id"), {"exam_id": exam_id}).fetchone()
+        if not exam_result:
+            raise HTTPException(status_code=404, detail=f"考试 {exam_id} 不存在")
+
 @router.post("/api/exams/{exam_id}/grade")
-def start_grading(exam_id: int):
-    """开始AI阅卷"""
-    # 占位符实现
-    return {"code": 1, "msg": "阅卷任务已启动", "data": {"task_id": "mock_task_id"}}
+async def start_grading(exam_id: int):
+    """开始AI阅卷：为每个学生的每道题创建子任务，由后台工作进程执行"""
+    try:
+        await run_db_task(_check_exam_exists, exam_id)
+        job = await run_db_task(create_job, exam_id)
+        msg = "阅卷任务已启动" if job["created"] else "阅卷任务正在进行中"
+        return {"code": 1, "msg": msg, "data": {"task_id": job["job_id"], **job}}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"启动阅卷失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"启动阅卷失败: {str(e)}")
+
+@router.get("/api/exams/{exam_id}/grade/status")
+def get_exam_grading_status(exam_id: int):
+    """获取考试最近一次阅卷任务的进度"""
+    try:
+        status = get_job_status(exam_id=exam_id)
+        if status is None:
+            raise HTTPException(status_code=404, detail=f"考试 {exam_id} 尚未开始阅卷")
+        return {"code": 1, "msg": "获取成功", "data": status}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"获取阅卷进度失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"获取阅卷进度失败: {str(e)}")
+
+@router.get("/api/exams/{exam_id}/grade/cache-stats")
+def get_exam_grading_cache_stats(exam_id: int):
+    """获取考试阅卷结果缓存的命中率（累计全部阅卷任务）"""
+    try:
+        return {"code": 1, "msg": "获取成功", "data": get_exam_cache_stats(exam_id)}
+    except Exception as e:
+        logger.error(f"获取阅卷缓存统计失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"获取阅卷缓存统计失败: {str(e)}")
+
+@router.get("/api/grading/jobs/{job_id}")
+def get_grading_job(job_id: int):
+    """获取阅卷任务进度（完成/失败/待处理数量、速率和预计剩余时间）"""
+    try:
+        status = get_job_status(job_id=job_id)
+        if status is None:
+            raise HTTPException(status_code=404, detail=f"阅卷任务 {job_id} 不存在")
+        return {"code": 1, "msg": "获取成功", "data": status}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"获取阅卷进度失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"获取阅卷进度失败: {str(e)}")
+
+@router.post("/api/grading/jobs/{job_id}/cancel")
+def cancel_grading_job(job_id: int):
+    """取消阅卷任务（已完成的子任务结果保留）"""
+    try:
+        cancelled = cancel_job(job_id)
+        return {"code": 1, "msg": "阅卷任务已取消", "data": {"job_id": job_id, "cancelled": cancelled}}
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"阅卷任务 {job_id} 不存在")
+    except GradingJobError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        logger.error(f"取消阅卷任务失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"取消阅卷任务失败: {str(e)}")
+
+@router.post("/api/grading/jobs/{job_id}/resume")
+def resume_grading_job(job_id: int):
+    """恢复已取消或失败的阅卷任务，只重新执行未完成的子任务"""
+    try:
+        requeued = resume_job(job_id)
+        return {"code": 1, "msg": "阅卷任务已恢复", "data": {"job_id": job_id, "requeued": requeued}}
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"阅卷任务 {job_id} 不存在")
+    except GradingJobError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        logger.error(f"恢复阅卷任务失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"恢复阅卷任务失败: {str(e)}")
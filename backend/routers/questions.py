@@ -1,21 +1,31 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Body
+from fastapi import APIRouter, HTTPException, UploadFile, File, Body, Query, Request
 from pydantic import BaseModel
 from typing import Optional, List
-from sqlalchemy import text
+from decimal import Decimal
+from itertools import chain
+from sqlalchemy import text, bindparam
 import logging
 import os
-import io
-import re
-import pandas as pd
-import docx
 
-from backend.database import engine
+from backend.database import engine, run_db_task
+from backend.services.pagination import encode_cursor, decode_cursor
+from backend.services.serialization import ROWS_FORMAT, LIST_FORMAT_PATTERN, encode_rows, json_response
+from backend.services.response_cache import QUESTIONS_SCOPE, exam_scope, bump_versions, cached_json_response
+from backend.services.ordering import EXAM_QUESTIONS_ORDER, ORDER_GAP, reorder_items, move_item_before
+from backend.services.question_import import (
+    iter_question_file, is_supported_question_file, bulk_insert_exam_questions, lock_next_question_order, QuestionParseError
+)
+from backend.services.grading import result_cache
+from backend.services.score_summary import remove_results, bump_question_exams
 
 # 配置日志
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# 与MySQL ngram_token_size一致：短于该长度的关键词无法命中全文索引
+FULLTEXT_MIN_TOKEN = 2
+
 # ==================== Pydantic模型定义 ====================
 
 class QuestionRequest(BaseModel):
@@ -33,6 +43,10 @@ class QuestionUpdate(BaseModel):
     reference_answer: Optional[str] = None
     scoring_rules: Optional[str] = None
 
+class MoveQuestionRequest(BaseModel):
+    """移动题目请求模型"""
+    before_id: Optional[int] = None
+
 # ==================== 题目管理API ====================
 
 @router.post("/api/exams/{exam_id}/questions")
@@ -60,14 +74,10 @@ def create_question(exam_id: int, question: QuestionRequest):
                 question_id = result.lastrowid
 
                 # 2. 插入考试题目关联
-                # 如果没有提供序号，则放在最后
+                # 如果没有提供序号，则放在最后（锁定考试行，避免并发分配到相同序号）
                 final_order = question.question_order
                 if final_order is None:
-                    max_order = conn.execute(
-                        text("SELECT MAX(question_order) FROM exam_questions WHERE exam_id = :exam_id"),
-                        {"exam_id": exam_id}
-                    ).scalar()
-                    final_order = (max_order or 0) + 1
+                    final_order = lock_next_question_order(conn, exam_id)
 
                 conn.execute(
                     text("""
@@ -82,6 +92,7 @@ def create_question(exam_id: int, question: QuestionRequest):
                 )
                 
                 trans.commit()
+                bump_versions(exam_scope(exam_id))
                 return {"code": 1, "msg": "添加成功", "data": {"question_id": question_id}}
             except Exception as e:
                 trans.rollback()
@@ -90,43 +101,48 @@ def create_question(exam_id: int, question: QuestionRequest):
         logger.error(f"添加题目失败: {str(e)}")
         raise HTTPException(status_code=500, detail=f"添加题目失败: {str(e)}")
 
+# 题目列表接口的输出字段（与SQL列顺序一致）
+QUESTION_LIST_COLUMNS = ["id", "type", "content", "score", "reference_answer", "scoring_rules", "created_at"]
+
+def _list_exam_questions(exam_id: int, list_format: str = ROWS_FORMAT) -> dict:
+    """查询考试题目列表"""
+    with engine.connect() as conn:
+        result = conn.execute(
+            text("""
+            SELECT q.id, eq.question_order, q.type, q.content, COALESCE(q.score, 0) AS score,
+                   q.reference_answer, q.scoring_rules, q.created_at
+            FROM questions q
+            JOIN exam_questions eq ON q.id = eq.question_id
+            WHERE eq.exam_id = :exam_id 
+            ORDER BY eq.question_order
+            """),
+            {"exam_id": exam_id}
+        )
+        columns = list(result.keys())
+        return {"code": 1, "msg": "获取成功", "data": encode_rows(result.fetchall(), columns, list_format)}
+
 @router.get("/api/exams/{exam_id}/questions")
-def get_exam_questions(exam_id: int):
-    """获取考试题目列表"""
+def get_exam_questions(exam_id: int, request: Request, format: str = Query(ROWS_FORMAT, pattern=LIST_FORMAT_PATTERN)):
+    """获取考试题目列表（按版本号缓存并支持ETag）"""
     try:
-        with engine.connect() as conn:
-            result = conn.execute(
-                text("""
-                SELECT q.*, eq.question_order 
-                FROM questions q
-                JOIN exam_questions eq ON q.id = eq.question_id
-                WHERE eq.exam_id = :exam_id 
-                ORDER BY eq.question_order
-                """),
-                {"exam_id": exam_id}
-            )
-            questions = []
-            for row in result.fetchall():
-                q = {
-                    "id": row.id,
-                    "question_order": row.question_order,
-                    "type": row.type,
-                    "content": row.content,
-                    "score": float(row.score) if row.score is not None else 0,
-                    "reference_answer": row.reference_answer,
-                    "scoring_rules": row.scoring_rules,
-                    "created_at": row.created_at.isoformat() if row.created_at else None
-                }
-                questions.append(q)
-
-            return {"code": 1, "msg": "获取成功", "data": questions}
+        return cached_json_response(
+            request, [exam_scope(exam_id), QUESTIONS_SCOPE],
+            lambda: _list_exam_questions(exam_id, format)
+        )
     except Exception as e:
         logger.error(f"获取考试题目失败: {str(e)}")
         raise HTTPException(status_code=500, detail=f"获取考试题目失败: {str(e)}")
 
 @router.get("/api/exams/{exam_id}/available-questions")
-def get_available_questions(exam_id: int, search: Optional[str] = None):
-    """获取未分配到该考试的题目列表"""
+def get_available_questions(
+    exam_id: int,
+    search: Optional[str] = None,
+    types: Optional[List[str]] = Query(None),
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    format: str = Query(ROWS_FORMAT, pattern=LIST_FORMAT_PATTERN)
+):
+    """获取未分配到该考试的题目列表（全文检索，按相关度排序，游标分页）"""
     try:
         with engine.connect() as conn:
             # 检查考试是否存在
@@ -134,38 +150,69 @@ def get_available_questions(exam_id: int, search: Optional[str] = None):
             if not exam_result:
                 raise HTTPException(status_code=404, detail=f"考试 {exam_id} 不存在")
 
-            # 构建查询条件
-            where_clause = "WHERE q.id NOT IN (SELECT eq.question_id FROM exam_questions eq WHERE eq.exam_id = :exam_id)"
-            params = {"exam_id": exam_id}
-
-            if search:
-                where_clause += " AND (q.content LIKE :search OR q.type LIKE :search)"
-                params.update({"search": f"%{search}%"})
-
-            # 获取未分配到该考试的题目
-            result = conn.execute(
-                text(f"""
-                SELECT q.*
+            # 用反连接排除已在考试中的题目
+            conditions = ["eq.question_id IS NULL"]
+            params = {"exam_id": exam_id, "limit": limit + 1}
+
+            if types:
+                conditions.append("q.type IN :types")
+                params["types"] = types
+
+            search = search.strip() if search else ""
+            use_fulltext = len(search) >= FULLTEXT_MIN_TOKEN
+            if use_fulltext:
+                # 基于ngram全文索引检索，按相关度排序
+                match = "MATCH(q.content) AGAINST (:search IN NATURAL LANGUAGE MODE)"
+                conditions.append(match)
+                # 相关度为浮点数，转为定点小数后再排序和比较，避免游标往返时精度误差导致漏行或重复
+                relevance = f"CAST({match} AS DECIMAL(20, 6))"
+                params["search"] = search
+                order_clause = "relevance DESC, q.id DESC"
+                if cursor:
+                    cursor_relevance, cursor_id = decode_cursor(cursor, Decimal, int)
+                    conditions.append(f"({relevance} < :cursor_relevance OR ({relevance} = :cursor_relevance AND q.id < :cursor_id))")
+                    params.update({"cursor_relevance": cursor_relevance, "cursor_id": cursor_id})
+            else:
+                # 单字无法使用ngram索引，退化为模糊匹配
+                relevance = "0"
+                if search:
+                    conditions.append("q.content LIKE :search")
+                    params["search"] = f"%{search}%"
+                order_clause = "q.id DESC"
+                if cursor:
+                    (cursor_id,) = decode_cursor(cursor, int)
+                    conditions.append("q.id < :cursor_id")
+                    params["cursor_id"] = cursor_id
+
+            query = text(f"""
+                SELECT q.id, q.type, q.content, COALESCE(q.score, 0) AS score, q.reference_answer, q.scoring_rules,
+                       q.created_at, {relevance} AS relevance
                 FROM questions q
-                {where_clause}
-                ORDER BY q.created_at DESC
-                """),
-                params
-            )
-            questions = []
-            for row in result.fetchall():
-                q = {
-                    "id": row.id,
-                    "type": row.type,
-                    "content": row.content,
-                    "score": float(row.score) if row.score is not None else 0,
-                    "reference_answer": row.reference_answer,
-                    "scoring_rules": row.scoring_rules,
-                    "created_at": row.created_at.isoformat() if row.created_at else None
-                }
-                questions.append(q)
-
-            return {"code": 1, "msg": "获取成功", "data": questions}
+                LEFT JOIN exam_questions eq ON eq.question_id = q.id AND eq.exam_id = :exam_id
+                WHERE {' AND '.join(conditions)}
+                ORDER BY {order_clause}
+                LIMIT :limit
+            """)
+            if types:
+                query = query.bindparams(bindparam("types", expanding=True))
+
+            rows = conn.execute(query, params).fetchall()
+
+            next_cursor = None
+            if len(rows) > limit:
+                rows = rows[:limit]
+                last = rows[-1]
+                next_cursor = encode_cursor(str(last.relevance), last.id) if use_fulltext else encode_cursor(last.id)
+
+            # relevance列只用于游标，不输出
+            return json_response({
+                "code": 1,
+                "msg": "获取成功",
+                "data": encode_rows(rows, QUESTION_LIST_COLUMNS, format),
+                "next_cursor": next_cursor
+            })
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"获取可用题目失败: {str(e)}")
         raise HTTPException(status_code=500, detail=f"获取可用题目失败: {str(e)}")
@@ -182,12 +229,8 @@ def add_existing_questions_to_exam(exam_id: int, question_ids: List[int] = Body(
 
             added_count = 0
             
-            # 获取当前最大序号
-            max_order = conn.execute(
-                text("SELECT MAX(question_order) FROM exam_questions WHERE exam_id = :exam_id"),
-                {"exam_id": exam_id}
-            ).scalar()
-            current_order = (max_order or 0) + 1
+            # 获取追加位置（锁定考试行，避免并发分配到相同序号）
+            current_order = lock_next_question_order(conn, exam_id)
 
             for question_id in question_ids:
                 try:
@@ -221,7 +264,7 @@ def add_existing_questions_to_exam(exam_id: int, question_ids: List[int] = Body(
                             "question_order": current_order
                         }
                     )
-                    current_order += 1
+                    current_order += ORDER_GAP
                     added_count += 1
 
                 except Exception as e:
@@ -229,6 +272,7 @@ def add_existing_questions_to_exam(exam_id: int, question_ids: List[int] = Body(
                     continue
 
             conn.commit()
+            bump_versions(exam_scope(exam_id))
 
             return {"code": 1, "msg": f"成功添加 {added_count} 道题目", "data": {"added_count": added_count}}
     except Exception as e:
@@ -248,8 +292,11 @@ def remove_questions_batch(exam_id: int, question_ids: List[int] = Body(...)):
                 )
                 if result.rowcount > 0:
                     removed_count += 1
-            
+
+            # 已有得分从成绩汇总中扣除
+            remove_results(conn, exam_id=exam_id, question_ids=question_ids)
             conn.commit()
+            bump_versions(exam_scope(exam_id))
             return {"code": 1, "msg": "移除成功", "data": {"removed_count": removed_count}}
     except Exception as e:
         logger.error(f"批量移除题目失败: {str(e)}")
@@ -260,8 +307,10 @@ def delete_question(question_id: int):
     """彻底删除题目"""
     try:
         with engine.connect() as conn:
+            remove_results(conn, question_ids=[question_id])
             conn.execute(text("DELETE FROM questions WHERE id = :question_id"), {"question_id": question_id})
             conn.commit()
+            bump_versions(QUESTIONS_SCOPE)
             return {"code": 1, "msg": "删除成功"}
     except Exception as e:
         logger.error(f"删除题目失败: {str(e)}")
@@ -299,7 +348,13 @@ def update_question(question_id: int, question: QuestionUpdate):
             
             query = f"UPDATE questions SET {', '.join(update_fields)} WHERE id = :question_id"
             conn.execute(text(query), update_params)
+            # 评分标准变化后，该题已缓存的阅卷结果不再适用
+            if any(field in update_params for field in result_cache.RUBRIC_FIELDS):
+                result_cache.invalidate_question(conn, question_id)
+            if "score" in update_params:
+                bump_question_exams(conn, question_id)
             conn.commit()
+            bump_versions(QUESTIONS_SCOPE)
 
             return {"code": 1, "msg": "更新成功"}
     except Exception as e:
@@ -311,260 +366,86 @@ def reorder_exam_questions(exam_id: int, question_ids: List[int] = Body(...)):
     """重新排序考试题目"""
     try:
         with engine.connect() as conn:
-            # 检查考试是否存在
-            exam_result = conn.execute(text("SELECT exam_id FROM exams WHERE exam_id = :exam_id"), {"exam_id": exam_id}).fetchone()
+            # 检查考试是否存在（锁定考试行，串行化同一考试的排序修改）
+            exam_result = conn.execute(text("SELECT exam_id FROM exams WHERE exam_id = :exam_id FOR UPDATE"), {"exam_id": exam_id}).fetchone()
             if not exam_result:
                 raise HTTPException(status_code=404, detail=f"考试 {exam_id} 不存在")
 
-            # 批量更新排序
-            for index, question_id in enumerate(question_ids):
-                conn.execute(
-                    text("UPDATE exam_questions SET question_order = :question_order WHERE exam_id = :exam_id AND question_id = :question_id"),
-                    {"question_order": index + 1, "exam_id": exam_id, "question_id": question_id}
-                )
-            
+            # 只更新位置发生变化的题目
+            updated_count = reorder_items(conn, EXAM_QUESTIONS_ORDER, exam_id, question_ids)
+
             conn.commit()
-            return {"code": 1, "msg": "排序更新成功"}
+            bump_versions(exam_scope(exam_id))
+            return {"code": 1, "msg": "排序更新成功", "data": {"updated_count": updated_count}}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"更新题目排序失败: {str(e)}")
         raise HTTPException(status_code=500, detail=f"更新题目排序失败: {str(e)}")
 
-@router.post("/api/exams/{exam_id}/import-questions")
-async def import_questions_from_file(exam_id: int, file: UploadFile = File(...)):
-    """从文件导入题目"""
+@router.post("/api/exams/{exam_id}/questions/{question_id}/move")
+def move_exam_question(exam_id: int, question_id: int, request: MoveQuestionRequest):
+    """将题目移动到指定题目之前（before_id为空时移到末尾）"""
     try:
-        # 验证考试是否存在
         with engine.connect() as conn:
-            exam_result = conn.execute(text("SELECT exam_id FROM exams WHERE exam_id = :exam_id"), {"exam_id": exam_id}).fetchone()
+            exam_result = conn.execute(text("SELECT exam_id FROM exams WHERE exam_id = :exam_id FOR UPDATE"), {"exam_id": exam_id}).fetchone()
             if not exam_result:
                 raise HTTPException(status_code=404, detail=f"考试 {exam_id} 不存在")
-            
-            # 获取当前最大序号，用于追加
-            max_order_res = conn.execute(text("SELECT MAX(question_order) FROM exam_questions WHERE exam_id = :exam_id"), {"exam_id": exam_id}).scalar()
-            current_max_order = max_order_res if max_order_res is not None else 0
-
-        filename = file.filename.lower()
-        file_ext = os.path.splitext(filename)[1]
-        content = await file.read()
-        questions_to_add = []
-
-        # 定义分隔符
-        SEPARATOR = "@@@"
-
-        try:
-            if file_ext == '.docx':
-                # 处理 Word 文档
-                doc = docx.Document(io.BytesIO(content))
-                for para in doc.paragraphs:
-                    if 'w:drawing' in para._p.xml or 'w:object' in para._p.xml:
-                        logger.info(f"跳过包含图片的段落: {para.text[:20]}...")
-                        continue
 
-                    text_content = para.text.strip()
-                    if not text_content:
-                        continue
-                    
-                    parts = text_content.split(SEPARATOR)
-                    parts = [p.strip() for p in parts]
-                    
-                    if len(parts) < 4:
-                        continue
-
-                    try:
-                        q_type = ""
-                        content_str = ""
-                        score = 0.0
-                        ref_answer = ""
-                        rules = ""
-
-                        # 尝试解析，不再强制要求第一列是序号
-                        # 兼容带序号和不带序号的格式
-                        # 如果第一列看起来像数字，我们忽略它（使用自动排序），但内容往后移
-                        # 如果不是数字，我们假设它不是序号
-
-                        # 简单起见，我们假设用户可能提供序号，也可能不提供
-                        # 重要的是提取内容、分值等
-                        
-                        # 策略：从后往前解析确定字段
-                        # [可选序号] [可选题型] 内容 分值 答案 [可选规则] 
-                        
-                        # 为了简化，我们沿用之前的逻辑但忽略order字段
-                        
-                        if len(parts) >= 6:
-                            # 完整格式：(序号), 题型, 内容, 分值, 答案, 规则
-                            q_type = parts[1]
-                            content_str = parts[2]
-                            score = float(re.sub(r'[^\d.]', '', parts[3]) or 0)
-                            ref_answer = parts[4]
-                            rules = parts[5]
-                        elif len(parts) == 5:
-                            # 5个字段: (序号), 题型, 内容, 分值, 答案
-                            q_type = parts[1]
-                            content_str = parts[2]
-                            score = float(re.sub(r'[^\d.]', '', parts[3]) or 0)
-                            ref_answer = parts[4]
-                        else: # len == 4
-                            # 4个字段: (序号), 内容, 分值, 答案 (无题型)
-                            content_str = parts[1]
-                            score = float(re.sub(r'[^\d.]', '', parts[2]) or 0)
-                            ref_answer = parts[3]
-                        
-                        if not content_str or score <= 0:
-                            continue
-
-                        type_map = {
-                            "选择题": "choice", "选择": "choice",
-                            "填空题": "fill_blank", "填空": "fill_blank",
-                            "主观题": "essay", "简答题": "essay", "解答题": "essay", "问答题": "essay",
-                            "计算题": "calculation", "计算": "calculation",
-                            "判断题": "true_false", "判断": "true_false"
-                        }
-                        final_type = type_map.get(q_type, q_type if q_type else "essay")
+            try:
+                updated_count = move_item_before(conn, EXAM_QUESTIONS_ORDER, exam_id, question_id, request.before_id)
+            except KeyError as missing:
+                raise HTTPException(status_code=404, detail=f"题目 {missing.args[0]} 不在该考试中")
 
-                        questions_to_add.append({
-                            "question_type": final_type,
-                            "content": content_str,
-                            "score": score,
-                            "reference_answer": ref_answer,
-                            "scoring_rules": rules
-                        })
+            conn.commit()
+            bump_versions(exam_scope(exam_id))
+            return {"code": 1, "msg": "移动成功", "data": {"updated_count": updated_count}}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"移动题目失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"移动题目失败: {str(e)}")
+
+def _check_exam_exists(exam_id: int):
+    """检查考试是否存在，不存在时抛出404"""
+    with engine.connect() as conn:
+        exam_result = conn.execute(text("SELECT exam_id FROM exams WHERE exam_id = :exam_id"), {"exam_id": exam_id}).fetchone()
+        if not exam_result:
+            raise HTTPException(status_code=404, detail=f"考试 {exam_id} 不存在")
+
+def _import_question_file(exam_id: int, file_ext: str, fileobj) -> int:
+    """边解析边分批写入题目（同步，在数据库线程池中执行）"""
+    questions = iter_question_file(file_ext, fileobj)
+    try:
+        first_question = next(questions, None)
+    except QuestionParseError as parse_error:
+        logger.error(f"解析文件失败: {str(parse_error)}")
+        raise HTTPException(status_code=400, detail=f"解析文件失败: {str(parse_error)}")
 
-                    except ValueError:
-                        continue
+    if first_question is None:
+        raise HTTPException(status_code=400, detail="未解析到有效题目数据")
 
-            elif file_ext in {'.xlsx', '.xls'}:
-                # 处理 Excel
-                df = pd.read_excel(io.BytesIO(content))
-                for _, row in df.iterrows():
-                    # 至少要有内容, 分值
-                    if pd.isna(row.iloc[2]) or pd.isna(row.iloc[3]):
-                        continue
-                    
-                    # 忽略第一列序号 row.iloc[0]
-                    
-                    raw_type = str(row.iloc[1]) if len(row) > 1 and pd.notna(row.iloc[1]) else ""
-                    type_map = {
-                            "选择题": "choice", "选择": "choice",
-                            "填空题": "fill_blank", "填空": "fill_blank",
-                            "主观题": "essay", "简答题": "essay", "解答题": "essay", "问答题": "essay",
-                            "计算题": "calculation", "计算": "calculation",
-                            "判断题": "true_false", "判断": "true_false"
-                    }
-                    final_type = type_map.get(raw_type, raw_type if raw_type else "essay")
-
-                    questions_to_add.append({
-                        "question_type": final_type,
-                        "content": str(row.iloc[2]),
-                        "score": float(row.iloc[3]),
-                        "reference_answer": str(row.iloc[4]),
-                        "scoring_rules": str(row.iloc[5]) if len(row) > 5 and pd.notna(row.iloc[5]) else ""
-                    })
-
-            elif file_ext in {'.txt', '.csv'}:
-                # 处理文本/CSV
-                text_content = content.decode('utf-8')
-                lines = text_content.strip().split('\n')
-                for line in lines:
-                    line = line.strip()
-                    if not line: continue
-                    
-                    parts = line.split(SEPARATOR)
-                    parts = [p.strip() for p in parts]
-                    
-                    if len(parts) < 4: continue
-                    
-                    try:
-                        q_type = ""
-                        content_str = ""
-                        score = 0.0
-                        ref_answer = ""
-                        rules = ""
-
-                        if len(parts) >= 6:
-                            q_type = parts[1]
-                            content_str = parts[2]
-                            score = float(re.sub(r'[^\d.]', '', parts[3]) or 0)
-                            ref_answer = parts[4]
-                            rules = parts[5]
-                        elif len(parts) == 5:
-                            q_type = parts[1]
-                            content_str = parts[2]
-                            score = float(re.sub(r'[^\d.]', '', parts[3]) or 0)
-                            ref_answer = parts[4]
-                        else:
-                            content_str = parts[1]
-                            score = float(re.sub(r'[^\d.]', '', parts[2]) or 0)
-                            ref_answer = parts[3]
-                            
-                        type_map = {
-                            "选择题": "choice", "选择": "choice",
-                            "填空题": "fill_blank", "填空": "fill_blank",
-                            "主观题": "essay", "简答题": "essay", "解答题": "essay", "问答题": "essay",
-                            "计算题": "calculation", "计算": "calculation",
-                            "判断题": "true_false", "判断": "true_false"
-                        }
-                        final_type = type_map.get(q_type, q_type if q_type else "essay")
-
-                        questions_to_add.append({
-                            "question_type": final_type,
-                            "content": content_str,
-                            "score": score,
-                            "reference_answer": ref_answer,
-                            "scoring_rules": rules
-                        })
-                    except:
-                        continue
-            else:
-                raise HTTPException(status_code=400, detail="不支持的文件格式")
+    try:
+        return bulk_insert_exam_questions(exam_id, chain([first_question], questions))
+    except QuestionParseError as parse_error:
+        logger.error(f"解析文件失败: {str(parse_error)}")
+        raise HTTPException(status_code=400, detail=f"解析文件失败: {str(parse_error)}")
+    finally:
+        # 分批提交，中途失败时已写入的批次同样需要使缓存失效
+        bump_versions(exam_scope(exam_id))
 
-        except Exception as parse_error:
-            logger.error(f"解析文件失败: {str(parse_error)}")
-            raise HTTPException(status_code=400, detail=f"解析文件失败: {str(parse_error)}")
+@router.post("/api/exams/{exam_id}/import-questions")
+async def import_questions_from_file(exam_id: int, file: UploadFile = File(...)):
+    """从文件导入题目"""
+    try:
+        # 验证考试是否存在
+        await run_db_task(_check_exam_exists, exam_id)
 
-        if not questions_to_add:
-            raise HTTPException(status_code=400, detail="未解析到有效题目数据")
+        file_ext = os.path.splitext(file.filename.lower())[1]
+        if not is_supported_question_file(file_ext):
+            raise HTTPException(status_code=400, detail="不支持的文件格式")
 
-        imported_count = 0
-        with engine.connect() as conn:
-            trans = conn.begin()
-            try:
-                for q in questions_to_add:
-                    current_max_order += 1
-                    
-                    # 插入题目
-                    res = conn.execute(
-                        text("""
-                        INSERT INTO questions (type, content, score, reference_answer, scoring_rules)
-                        VALUES (:type, :content, :score, :reference_answer, :scoring_rules)
-                        """),
-                        {
-                            "type": q["question_type"],
-                            "content": q["content"],
-                            "score": q["score"],
-                            "reference_answer": q["reference_answer"],
-                            "scoring_rules": q["scoring_rules"]
-                        }
-                    )
-                    qid = res.lastrowid
-                    
-                    # 插入关联
-                    conn.execute(
-                        text("""
-                        INSERT INTO exam_questions (exam_id, question_id, question_order)
-                        VALUES (:exam_id, :question_id, :question_order)
-                        """),
-                        {
-                            "exam_id": exam_id,
-                            "question_id": qid,
-                            "question_order": current_max_order
-                        }
-                    )
-                    imported_count += 1
-                
-                trans.commit()
-            except Exception as db_err:
-                trans.rollback()
-                raise db_err
+        imported_count = await run_db_task(_import_question_file, exam_id, file_ext, file.file)
 
         return {"code": 1, "msg": f"成功导入 {imported_count} 道题目", "data": {"count": imported_count}}
 
@@ -1,13 +1,117 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, Query
+from typing import Optional
+from decimal import Decimal
 import logging
 
+from backend.database import engine
+from backend.services.pagination import encode_cursor, decode_cursor
+from backend.services.serialization import ROWS_FORMAT, LIST_FORMAT_PATTERN, encode_rows, json_response
+from backend.services.score_summary import (
+    STUDENT_SCORE_COLUMNS, QUESTION_STAT_COLUMNS, list_student_scores, list_question_stats, rebuild_exam_summary
+)
+from backend.services.score_analytics import SCORE_HISTOGRAM_BINS, get_exam_analytics
+from backend.services.score_export import XLSX_FORMAT, EXPORT_FORMAT_PATTERN, list_export_questions, export_scores_response
+from sqlalchemy import text
+
 # 配置日志
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+def _check_exam_exists(conn, exam_id: int):
+    """检查考试是否存在，不存在时抛出404"""
+    exam_result = conn.execute(text("SELECT exam_id FROM exams WHERE exam_id = :exam_id"), {"exam_id": exam_id}).fetchone()
+    if not exam_result:
+        raise HTTPException(status_code=404, detail=f"考试 {exam_id} 不存在")
+
 @router.get("/api/exams/{exam_id}/scores")
-def get_exam_scores(exam_id: int):
-    """获取考试成绩"""
-    # 占位符实现
-    return {"code": 1, "msg": "获取成功", "data": []}
+def get_exam_scores(
+    exam_id: int,
+    class_name: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    format: str = Query(ROWS_FORMAT, pattern=LIST_FORMAT_PATTERN)
+):
+    """获取考试成绩（按总分从高到低游标分页，含排名；指定班级时为班级排名）"""
+    try:
+        page_cursor = tuple(decode_cursor(cursor, Decimal, int)) if cursor else None
+        with engine.connect() as conn:
+            _check_exam_exists(conn, exam_id)
+            rows, has_more = list_student_scores(conn, exam_id, class_name, page_cursor, limit)
+
+        next_cursor = None
+        if has_more:
+            last = rows[-1]
+            next_cursor = encode_cursor(str(last.total_score), last.student_id)
+
+        return json_response({
+            "code": 1, "msg": "获取成功",
+            "data": encode_rows(rows, STUDENT_SCORE_COLUMNS, format), "next_cursor": next_cursor
+        })
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"获取考试成绩失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"获取考试成绩失败: {str(e)}")
+
+@router.get("/api/exams/{exam_id}/scores/questions")
+def get_exam_question_scores(exam_id: int, format: str = Query(ROWS_FORMAT, pattern=LIST_FORMAT_PATTERN)):
+    """获取考试各题的平均分和得分率"""
+    try:
+        with engine.connect() as conn:
+            _check_exam_exists(conn, exam_id)
+            rows = list_question_stats(conn, exam_id)
+        return json_response({"code": 1, "msg": "获取成功", "data": encode_rows(rows, QUESTION_STAT_COLUMNS, format)})
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"获取题目得分统计失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"获取题目得分统计失败: {str(e)}")
+
+@router.get("/api/exams/{exam_id}/scores/analytics")
+def get_exam_score_analytics(exam_id: int, bins: int = Query(SCORE_HISTOGRAM_BINS, ge=1, le=100)):
+    """获取考试成绩分析：总分分布、百分位数、各班平均分、各题难度与区分度（有新得分前复用缓存结果）"""
+    try:
+        with engine.connect() as conn:
+            _check_exam_exists(conn, exam_id)
+            analytics = get_exam_analytics(conn, exam_id, bins)
+        return json_response({"code": 1, "msg": "获取成功", "data": analytics})
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"获取成绩分析失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"获取成绩分析失败: {str(e)}")
+
+@router.get("/api/exams/{exam_id}/scores/export")
+def export_exam_scores(
+    exam_id: int,
+    format: str = Query(XLSX_FORMAT, pattern=EXPORT_FORMAT_PATTERN),
+    include_questions: bool = False,
+    class_name: Optional[str] = None
+):
+    """导出考试成绩（xlsx/csv，按总分排序流式输出；include_questions=true时附带各题得分列）"""
+    try:
+        with engine.connect() as conn:
+            _check_exam_exists(conn, exam_id)
+            questions = list_export_questions(conn, exam_id) if include_questions else []
+        return export_scores_response(exam_id, format, questions, class_name)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"导出成绩失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"导出成绩失败: {str(e)}")
+
+@router.post("/api/exams/{exam_id}/scores/rebuild")
+def rebuild_exam_scores(exam_id: int):
+    """按单题得分重新计算考试的总分和题目统计"""
+    try:
+        with engine.connect() as conn:
+            _check_exam_exists(conn, exam_id)
+            rebuild_exam_summary(conn, exam_id)
+            conn.commit()
+        return {"code": 1, "msg": "重建成功"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"重建成绩汇总失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"重建成绩汇总失败: {str(e)}")
@@ -1,13 +1,18 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Body
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Body, Query, Request
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Optional, List, Tuple
+from itertools import chain
 from sqlalchemy import text
 import logging
 import os
-import pandas as pd
-import io
 
-from backend.database import engine
+from backend.database import engine, run_db_task
+from backend.services.serialization import ROWS_FORMAT, LIST_FORMAT_PATTERN, encode_rows, json_response
+from backend.services.response_cache import EXAMS_SCOPE, STUDENTS_SCOPE, exam_scope, bump_versions, cached_json_response
+from backend.services.ordering import EXAM_STUDENTS_ORDER, reorder_items, move_item_before
+from backend.services.student_search import AVAILABLE_STUDENT_COLUMNS, index_students, search_available_students
+from backend.services.student_import import bulk_add_students_to_exam, iter_roster_batches, RosterParseError
+from backend.services.score_summary import remove_results, update_student_class
 
 # 配置日志
 logger = logging.getLogger(__name__)
@@ -32,16 +37,24 @@ class BatchStudentRequest(BaseModel):
     """批量添加学生请求模型"""
     students: List[StudentRequest]
 
+class MoveStudentRequest(BaseModel):
+    """移动学生请求模型"""
+    before_id: Optional[int] = None
+
 # ==================== 学生管理API ====================
 
+def _list_students(list_format: str = ROWS_FORMAT) -> dict:
+    """查询全部学生"""
+    with engine.connect() as conn:
+        result = conn.execute(text("SELECT * FROM students ORDER BY name"))
+        columns = list(result.keys())
+        return {"code": 1, "msg": "获取成功", "data": encode_rows(result.fetchall(), columns, list_format)}
+
 @router.get("/api/students")
-def get_students():
-    """获取所有学生列表"""
+def get_students(request: Request, format: str = Query(ROWS_FORMAT, pattern=LIST_FORMAT_PATTERN)):
+    """获取所有学生列表（按版本号缓存并支持ETag）"""
     try:
-        with engine.connect() as conn:
-            result = conn.execute(text("SELECT * FROM students ORDER BY name"))
-            students = [dict(row._mapping) for row in result.fetchall()]
-            return {"code": 1, "msg": "获取成功", "data": students}
+        return cached_json_response(request, [STUDENTS_SCOPE], lambda: _list_students(format))
     except Exception as e:
         logger.error(f"获取学生列表失败: {str(e)}")
         raise HTTPException(status_code=500, detail=f"获取学生列表失败: {str(e)}")
@@ -63,8 +76,10 @@ def create_student(student: StudentRequest):
                     "contact_info": student.contact_info
                 }
             )
-            conn.commit()
             student_id = result.lastrowid
+            index_students(conn, [(student_id, student.name, student.class_name)])
+            conn.commit()
+            bump_versions(STUDENTS_SCOPE)
 
             return {"code": 1, "msg": "添加成功", "data": {"student_id": student_id}}
     except Exception as e:
@@ -106,7 +121,19 @@ def update_student(student_id: int, student: StudentUpdate):
 
             query = f"UPDATE students SET {', '.join(update_fields)} WHERE student_id = :student_id"
             conn.execute(text(query), update_params)
+
+            # 姓名或班级变化时重建该学生的检索索引
+            if student.name is not None or student.class_name is not None:
+                row = conn.execute(
+                    text("SELECT student_id, name, class AS class_name FROM students WHERE student_id = :student_id"),
+                    {"student_id": student_id}
+                ).fetchone()
+                if row:
+                    index_students(conn, [(row.student_id, row.name, row.class_name)])
+            if student.class_name is not None:
+                update_student_class(conn, student_id, student.class_name)
             conn.commit()
+            bump_versions(STUDENTS_SCOPE)
 
             return {"code": 1, "msg": "更新成功"}
     except HTTPException:
@@ -120,8 +147,11 @@ def delete_student(student_id: int):
     """删除学生"""
     try:
         with engine.connect() as conn:
+            # 检索索引词随外键级联删除；已有得分先从成绩汇总中扣除
+            remove_results(conn, student_ids=[student_id])
             conn.execute(text("DELETE FROM students WHERE student_id = :student_id"), {"student_id": student_id})
             conn.commit()
+            bump_versions(STUDENTS_SCOPE, EXAMS_SCOPE)
             return {"code": 1, "msg": "删除成功"}
     except Exception as e:
         logger.error(f"删除学生失败: {str(e)}")
@@ -129,85 +159,37 @@ def delete_student(student_id: int):
 
 # ==================== 考试学生关联API ====================
 
+def _check_exam_exists(exam_id: int):
+    """检查考试是否存在，不存在时抛出404"""
+    with engine.connect() as conn:
+        exam_result = conn.execute(text("SELECT exam_id FROM exams WHERE exam_id = :exam_id"), {"exam_id": exam_id}).fetchone()
+        if not exam_result:
+            raise HTTPException(status_code=404, detail=f"考试 {exam_id} 不存在")
+
+def _batch_add_students(exam_id: int, students: List[StudentRequest]):
+    """批量添加学生到考试（同步，在数据库线程池中执行），返回(添加数量, 错误列表)"""
+    # 验证考试是否存在
+    _check_exam_exists(exam_id)
+
+    rows = [
+        {
+            "student_number": student.student_number,
+            "name": student.name,
+            "class": student.class_name,
+            "contact_info": student.contact_info
+        }
+        for student in students
+    ]
+    try:
+        return bulk_add_students_to_exam(exam_id, rows)
+    finally:
+        bump_versions(STUDENTS_SCOPE, EXAMS_SCOPE, exam_scope(exam_id))
+
 @router.post("/api/exams/{exam_id}/batch-add-students")
 async def batch_add_students_to_exam(exam_id: int, request: BatchStudentRequest):
     """批量添加学生到考试"""
     try:
-        # 验证考试是否存在
-        with engine.connect() as conn:
-            exam_result = conn.execute(text("SELECT exam_id FROM exams WHERE exam_id = :exam_id"), {"exam_id": exam_id}).fetchone()
-            if not exam_result:
-                raise HTTPException(status_code=404, detail=f"考试 {exam_id} 不存在")
-
-        added_count = 0
-        errors = []
-
-        with engine.connect() as conn:
-            for student_data in request.students:
-                try:
-                    student_number = student_data.student_number
-                    name = student_data.name
-                    class_name = student_data.class_name
-                    contact_info = student_data.contact_info
-
-                    if not student_number:
-                        errors.append(f"学号缺失: {student_data.name or '未知姓名'}")
-                        continue
-                    
-                    if not name:
-                        errors.append(f"姓名缺失: 学号 {student_number}")
-                        continue
-
-                    # 检查学生是否已存在
-                    existing_student = conn.execute(
-                        text("SELECT student_id, name FROM students WHERE student_number = :student_number"),
-                        {"student_number": student_number}
-                    ).fetchone()
-
-                    if existing_student:
-                        # 存在同名学号，检查姓名是否一致
-                        db_student_id, db_name = existing_student
-                        if db_name != name:
-                            errors.append(f"学号冲突: 学号 {student_number} 已存在且属于学生 {db_name}，与当前 {name} 不符")
-                            continue
-                        student_id = db_student_id
-                    else:
-                        # 创建新学生
-                        insert_result = conn.execute(
-                            text("""
-                                INSERT INTO students (name, student_number, class, contact_info)
-                                VALUES (:name, :student_number, :class_name, :contact_info)
-                            """),
-                            {
-                                "name": name,
-                                "student_number": student_number,
-                                "class_name": class_name,
-                                "contact_info": contact_info
-                            }
-                        )
-                        student_id = insert_result.lastrowid
-
-                    # 检查是否已经在考试中
-                    existing_exam_student = conn.execute(
-                        text("SELECT * FROM exam_students WHERE exam_id = :exam_id AND student_id = :student_id"),
-                        {"exam_id": exam_id, "student_id": student_id}
-                    ).fetchone()
-
-                    if not existing_exam_student:
-                        # 添加学生到考试
-                        conn.execute(
-                           text("INSERT INTO exam_students (exam_id, student_id) VALUES (:exam_id, :student_id)"),
-                            {"exam_id": exam_id, "student_id": student_id}
-                        )
-                        added_count += 1
-                    else:
-                        errors.append(f"重复添加: 学生 {name} ({student_number}) 已在考试中")
-
-                except Exception as e:
-                    errors.append(f"系统错误 {name}: {str(e)}")
-                    continue
-
-            conn.commit()
+        added_count, errors = await run_db_task(_batch_add_students, exam_id, request.students)
 
         return {
             "code": 1,
@@ -246,6 +228,7 @@ def add_student_to_exam(exam_id: int, student_id: int = Body(...)):
                     {"exam_id": exam_id, "student_id": student_id}
                 )
                 conn.commit()
+                bump_versions(EXAMS_SCOPE, exam_scope(exam_id))
                 return {"code": 1, "msg": "添加成功"}
             except:
                 # 如果已存在，返回成功
@@ -263,48 +246,44 @@ def remove_student_from_exam(exam_id: int, student_id: int):
                 text("DELETE FROM exam_students WHERE exam_id = :exam_id AND student_id = :student_id"),
                 {"exam_id": exam_id, "student_id": student_id}
             )
+            remove_results(conn, exam_id=exam_id, student_ids=[student_id])
             conn.commit()
+            bump_versions(EXAMS_SCOPE, exam_scope(exam_id))
             return {"code": 1, "msg": "移除成功"}
     except Exception as e:
         logger.error(f"移除学生从考试失败: {str(e)}")
         raise HTTPException(status_code=500, detail=f"移除学生从考试失败: {str(e)}")
 
+def _list_exam_students(exam_id: int, list_format: str = ROWS_FORMAT) -> dict:
+    """查询考试的学生列表"""
+    with engine.connect() as conn:
+        # 检查考试是否存在
+        exam_result = conn.execute(text("SELECT exam_id FROM exams WHERE exam_id = :exam_id"), {"exam_id": exam_id}).fetchone()
+        if not exam_result:
+            raise HTTPException(status_code=404, detail=f"考试 {exam_id} 不存在")
+
+        # 获取考试的所有学生
+        result = conn.execute(
+            text("""
+            SELECT s.student_id, s.name, s.student_number, s.class as class_name, s.contact_info, s.created_at, s.updated_at, es.sort_order
+            FROM students s
+            INNER JOIN exam_students es ON s.student_id = es.student_id
+            WHERE es.exam_id = :exam_id
+            ORDER BY es.sort_order ASC, s.student_number ASC
+            """),
+            {"exam_id": exam_id}
+        )
+        columns = list(result.keys())
+        return {"code": 1, "msg": "获取成功", "data": encode_rows(result.fetchall(), columns, list_format)}
+
 @router.get("/api/exams/{exam_id}/students")
-def get_exam_students(exam_id: int):
-    """获取考试的学生列表"""
+def get_exam_students(exam_id: int, request: Request, format: str = Query(ROWS_FORMAT, pattern=LIST_FORMAT_PATTERN)):
+    """获取考试的学生列表（按版本号缓存并支持ETag）"""
     try:
-        with engine.connect() as conn:
-            # 检查考试是否存在
-            exam_result = conn.execute(text("SELECT exam_id FROM exams WHERE exam_id = :exam_id"), {"exam_id": exam_id}).fetchone()
-            if not exam_result:
-                raise HTTPException(status_code=404, detail=f"考试 {exam_id} 不存在")
-
-            # 获取考试的所有学生
-            result = conn.execute(
-                text("""
-                SELECT s.student_id, s.name, s.student_number, s.class as class_name, s.contact_info, s.created_at, s.updated_at, es.sort_order
-                FROM students s
-                INNER JOIN exam_students es ON s.student_id = es.student_id
-                WHERE es.exam_id = :exam_id
-                ORDER BY es.sort_order ASC, s.student_number ASC
-                """),
-                {"exam_id": exam_id}
-            )
-            students = []
-            for row in result.fetchall():
-                student = {
-                    'student_id': row.student_id,
-                    'name': row.name,
-                    'student_number': row.student_number,
-                    'class_name': row.class_name,
-                    'contact_info': row.contact_info,
-                    'created_at': row.created_at.isoformat() if row.created_at else None,
-                    'updated_at': row.updated_at.isoformat() if row.updated_at else None,
-                    'sort_order': row.sort_order
-                }
-                students.append(student)
-
-            return {"code": 1, "msg": "获取成功", "data": students}
+        return cached_json_response(
+            request, [exam_scope(exam_id), STUDENTS_SCOPE],
+            lambda: _list_exam_students(exam_id, format)
+        )
     except HTTPException:
         raise
     except Exception as e:
@@ -316,79 +295,104 @@ def reorder_exam_students(exam_id: int, student_ids: List[int] = Body(...)):
     """重新排序考试学生"""
     try:
         with engine.connect() as conn:
-            # 检查考试是否存在
-            exam_result = conn.execute(text("SELECT exam_id FROM exams WHERE exam_id = :exam_id"), {"exam_id": exam_id}).fetchone()
+            # 检查考试是否存在（锁定考试行，串行化同一考试的排序修改）
+            exam_result = conn.execute(text("SELECT exam_id FROM exams WHERE exam_id = :exam_id FOR UPDATE"), {"exam_id": exam_id}).fetchone()
             if not exam_result:
                 raise HTTPException(status_code=404, detail=f"考试 {exam_id} 不存在")
 
-            # 批量更新排序
-            for index, student_id in enumerate(student_ids):
-                conn.execute(
-                    text("UPDATE exam_students SET sort_order = :sort_order WHERE exam_id = :exam_id AND student_id = :student_id"),
-                    {"sort_order": index + 1, "exam_id": exam_id, "student_id": student_id}
-                )
-            
+            # 只更新位置发生变化的学生
+            updated_count = reorder_items(conn, EXAM_STUDENTS_ORDER, exam_id, student_ids)
+
             conn.commit()
-            return {"code": 1, "msg": "排序更新成功"}
+            bump_versions(exam_scope(exam_id))
+            return {"code": 1, "msg": "排序更新成功", "data": {"updated_count": updated_count}}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"更新学生排序失败: {str(e)}")
         raise HTTPException(status_code=500, detail=f"更新学生排序失败: {str(e)}")
 
-@router.get("/api/exams/{exam_id}/available-students")
-def get_available_students(exam_id: int, search: Optional[str] = None):
-    """获取未分配到该考试的学生列表"""
+@router.post("/api/exams/{exam_id}/students/{student_id}/move")
+def move_exam_student(exam_id: int, student_id: int, request: MoveStudentRequest):
+    """将学生移动到指定学生之前（before_id为空时移到末尾）"""
     try:
         with engine.connect() as conn:
-            # 检查考试是否存在
-            exam_result = conn.execute(text("SELECT exam_id FROM exams WHERE exam_id = :exam_id"), {"exam_id": exam_id}).fetchone()
+            exam_result = conn.execute(text("SELECT exam_id FROM exams WHERE exam_id = :exam_id FOR UPDATE"), {"exam_id": exam_id}).fetchone()
             if not exam_result:
                 raise HTTPException(status_code=404, detail=f"考试 {exam_id} 不存在")
 
-            # 构建查询条件
-            where_clause = "WHERE s.student_id NOT IN (SELECT es.student_id FROM exam_students es WHERE es.exam_id = :exam_id)"
-            params = {"exam_id": exam_id}
+            try:
+                updated_count = move_item_before(conn, EXAM_STUDENTS_ORDER, exam_id, student_id, request.before_id)
+            except KeyError as missing:
+                raise HTTPException(status_code=404, detail=f"学生 {missing.args[0]} 不在该考试中")
 
-            if search:
-                where_clause += " AND (s.name LIKE :search OR s.student_number LIKE :search OR s.class LIKE :search)"
-                params.update({"search": f"%{search}%"})
+            conn.commit()
+            bump_versions(exam_scope(exam_id))
+            return {"code": 1, "msg": "移动成功", "data": {"updated_count": updated_count}}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"移动学生失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"移动学生失败: {str(e)}")
 
-            # 获取未分配到该考试的学生
-            result = conn.execute(
-                text(f"""
-                SELECT s.student_id, s.name, s.student_number, s.class as class_name, s.contact_info
-                FROM students s
-                {where_clause}
-                ORDER BY s.name
-                """),
-                params
-            )
-            students = []
-            for row in result.fetchall():
-                student = {
-                    'student_id': row.student_id,
-                    'name': row.name,
-                    'student_number': row.student_number,
-                    'class_name': row.class_name,
-                    'contact_info': row.contact_info
-                }
-                students.append(student)
+@router.get("/api/exams/{exam_id}/available-students")
+def get_available_students(
+    exam_id: int,
+    search: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    format: str = Query(ROWS_FORMAT, pattern=LIST_FORMAT_PATTERN)
+):
+    """获取未分配到该考试的学生列表（学号前缀/姓名班级n-gram检索，游标分页）"""
+    try:
+        with engine.connect() as conn:
+            # 检查考试是否存在
+            exam_result = conn.execute(text("SELECT exam_id FROM exams WHERE exam_id = :exam_id"), {"exam_id": exam_id}).fetchone()
+            if not exam_result:
+                raise HTTPException(status_code=404, detail=f"考试 {exam_id} 不存在")
 
-            return {"code": 1, "msg": "获取成功", "data": students}
+            rows, next_cursor = search_available_students(conn, exam_id, search, cursor, limit)
+            return json_response({
+                "code": 1,
+                "msg": "获取成功",
+                "data": encode_rows(rows, AVAILABLE_STUDENT_COLUMNS, format),
+                "next_cursor": next_cursor
+            })
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"获取可用学生失败: {str(e)}")
         raise HTTPException(status_code=500, detail=f"获取可用学生失败: {str(e)}")
 
+def _import_student_file(exam_id: int, file_extension: str, fileobj) -> Tuple[int, List[str]]:
+    """流式解析名单文件并逐批写入数据库（同步，在数据库线程池中执行）"""
+    skipped = []
+    batches = iter_roster_batches(file_extension, fileobj, errors=skipped)
+    try:
+        first_batch = next(batches, None)
+    except RosterParseError as parse_error:
+        raise HTTPException(status_code=400, detail=f"文件解析失败: {str(parse_error)}")
+
+    if not first_batch:
+        raise HTTPException(status_code=400, detail="文件中没有找到有效的学生信息")
+
+    rows = chain(first_batch, chain.from_iterable(batches))
+    try:
+        # 已存在的学号直接关联，不校验姓名
+        imported_count, errors = bulk_add_students_to_exam(exam_id, rows, reject_name_mismatch=False)
+        return imported_count, skipped + errors
+    except RosterParseError as parse_error:
+        raise HTTPException(status_code=400, detail=f"文件解析失败: {str(parse_error)}")
+    finally:
+        # 分批提交，中途失败时已写入的批次同样需要使缓存失效
+        bump_versions(STUDENTS_SCOPE, EXAMS_SCOPE, exam_scope(exam_id))
+
 @router.post("/api/exams/{exam_id}/import-students")
 async def import_students_from_file(exam_id: int, file: UploadFile = File(...)):
     """从文件导入学生信息到考试"""
     try:
         # 验证考试是否存在
-        with engine.connect() as conn:
-            exam_result = conn.execute(text("SELECT exam_id FROM exams WHERE exam_id = :exam_id"), {"exam_id": exam_id}).fetchone()
-            if not exam_result:
-                raise HTTPException(status_code=404, detail=f"考试 {exam_id} 不存在")
+        await run_db_task(_check_exam_exists, exam_id)
 
         # 验证文件类型
         file_extension = os.path.splitext(file.filename)[1].lower()
@@ -396,99 +400,10 @@ async def import_students_from_file(exam_id: int, file: UploadFile = File(...)):
         if file_extension not in allowed_extensions:
             raise HTTPException(status_code=400, detail="不支持的文件格式。支持: xlsx, xls, txt, csv")
 
-        # 读取文件内容
-        content = await file.read()
-        students_to_add = []
-
-        try:
-            if file_extension in {'.xlsx', '.xls'}:
-                # 处理Excel文件
-                df = pd.read_excel(io.BytesIO(content))
-                # 假设列顺序为：学号, 班级, 姓名, 联系方式
-                for _, row in df.iterrows():
-                    if len(row) >= 3 and pd.notna(row.iloc[0]) and pd.notna(row.iloc[2]):
-                        students_to_add.append({
-                            "student_number": str(row.iloc[0]).strip(),
-                            "class": str(row.iloc[1]).strip() if pd.notna(row.iloc[1]) else "",
-                            "name": str(row.iloc[2]).strip(),
-                            "contact_info": str(row.iloc[3]).strip() if len(row) > 3 and pd.notna(row.iloc[3]) else ""
-                        })
-            else:
-                # 处理文本文件
-                text_content = content.decode('utf-8')
-                lines = text_content.strip().split('\n')
-
-                for line in lines:
-                    line = line.strip()
-                    if not line:
-                        continue
-
-                    # 支持逗号和制表符分隔
-                    if '\t' in line:
-                        parts = line.split('\t')
-                    else:
-                        parts = line.split(',')
-
-                    if len(parts) >= 3 and parts[0].strip() and parts[2].strip():
-                        students_to_add.append({
-                            "student_number": parts[0].strip(),
-                            "class": parts[1].strip(),
-                            "name": parts[2].strip(),
-                            "contact_info": parts[3].strip() if len(parts) > 3 else ""
-                        })
-        except Exception as parse_error:
-            raise HTTPException(status_code=400, detail=f"文件解析失败: {str(parse_error)}")
-
-        if not students_to_add:
-            raise HTTPException(status_code=400, detail="文件中没有找到有效的学生信息")
-
-        # 添加学生到数据库
-        imported_count = 0
-        with engine.connect() as conn:
-            for student_data in students_to_add:
-                try:
-                    # 检查学号是否已存在
-                    existing = conn.execute(
-                        text("SELECT student_id FROM students WHERE student_number = :student_number"),
-                        {"student_number": student_data["student_number"]}
-                    ).fetchone()
-
-                    student_id = None
-                    if not existing:
-                        # 创建新学生
-                        result = conn.execute(
-                            text("""INSERT INTO students (name, student_number, class, contact_info)
-                                 VALUES (:name, :student_number, :class, :contact_info)"""),
-                            {
-                                "name": student_data["name"],
-                                "student_number": student_data["student_number"],
-                                "class": student_data.get("class", ""),
-                                "contact_info": student_data.get("contact_info", "")
-                            }
-                        )
-                        student_id = result.lastrowid
-                    else:
-                        student_id = existing[0]
-
-                    # 将学生添加到考试（如果还没有）
-                    existing_relation = conn.execute(
-                       text("SELECT * FROM exam_students WHERE exam_id = :exam_id AND student_id = :student_id"),
-                        {"exam_id": exam_id, "student_id": student_id}
-                    ).fetchone()
-
-                    if not existing_relation:
-                        conn.execute(
-                            text("INSERT INTO exam_students (exam_id, student_id) VALUES (:exam_id, :student_id)"),
-                            {"exam_id": exam_id, "student_id": student_id}
-                        )
-                        imported_count += 1
-
-                    conn.commit()
-                except Exception as student_error:
-                    logger.warning(f"添加学生失败 {student_data}: {str(student_error)}")
-                    continue
+        # 边解析边写入，不将整个文件读入内存
+        imported_count, errors = await run_db_task(_import_student_file, exam_id, file_extension, file.file)
 
-        return {"code": 1, "msg": "导入成功", "data": {"imported_count": imported_count}}
+        return {"code": 1, "msg": "导入成功", "data": {"imported_count": imported_count, "errors": errors}}
 
     except HTTPException:
         raise
@@ -543,6 +458,7 @@ def add_existing_students_to_exam(exam_id: int, student_ids: List[int] = Body(..
                     continue
 
             conn.commit()
+            bump_versions(EXAMS_SCOPE, exam_scope(exam_id))
 
             return {"code": 1, "msg": f"成功添加 {added_count} 个学生", "data": {"added_count": added_count}}
     except HTTPException:
@@ -577,7 +493,9 @@ def remove_students_batch(exam_id: int, student_ids: List[int] = Body(...)):
                     logger.warning(f"删除学生失败 {student_id}: {str(student_error)}")
                     continue
 
+            remove_results(conn, exam_id=exam_id, student_ids=student_ids)
             conn.commit()
+            bump_versions(EXAMS_SCOPE, exam_scope(exam_id))
 
             return {"code": 1, "msg": "删除成功", "data": {"removed_count": removed_count}}
     except HTTPException:
@@ -0,0 +1,154 @@
+from typing import BinaryIO, List, Optional, Tuple
+from sqlalchemy import text, bindparam
+import hashlib
+import logging
+import os
+import tempfile
+
+from backend.config import UPLOAD_DIR, MAX_UPLOAD_BYTES
+from backend.database import engine
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 流式写入时每次读取的字节数
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# 允许上传的答题卡图片格式
+ALLOWED_IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".webp"}
+
+# 内容寻址存储：objects/<哈希前2位>/<哈希><扩展名>，相同内容只保存一份
+OBJECTS_DIR = os.path.join(UPLOAD_DIR, "objects")
+TMP_DIR = os.path.join(UPLOAD_DIR, "tmp")
+
+_SELECT_IMAGES_BY_HASH_SQL = text("""
+    SELECT image_id, content_hash FROM answer_images
+    WHERE exam_id = :exam_id AND content_hash IN :hashes
+""").bindparams(bindparam("hashes", expanding=True))
+
+_INSERT_IMAGE_SQL = text("""
+    INSERT IGNORE INTO answer_images (exam_id, content_hash, storage_path, original_filename, content_type, file_size)
+    VALUES (:exam_id, :content_hash, :storage_path, :original_filename, :content_type, :file_size)
+""")
+
+
+class UploadRejected(ValueError):
+    """上传文件不符合要求（格式或大小）"""
+
+
+class StoredObject:
+    """已写入存储目录的文件"""
+
+    def __init__(self, content_hash: str, storage_path: str, file_size: int):
+        self.content_hash = content_hash
+        # 相对UPLOAD_DIR的路径
+        self.storage_path = storage_path
+        self.file_size = file_size
+
+
+def object_path(storage_path: str) -> str:
+    """存储路径对应的磁盘绝对路径"""
+    return os.path.join(UPLOAD_DIR, storage_path)
+
+
+def store_stream(fileobj: BinaryIO, extension: str, chunk_size: int = UPLOAD_CHUNK_SIZE,
+                 max_bytes: int = MAX_UPLOAD_BYTES) -> StoredObject:
+    """
+    按固定大小分块将文件流写入临时文件，边写边计算SHA-256，完成后移动到内容寻址路径
+
+    相同内容的文件已存在时丢弃临时文件，直接复用已有文件。超过max_bytes时抛出 UploadRejected。
+    """
+    os.makedirs(TMP_DIR, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=TMP_DIR, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = fileobj.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadRejected(f"文件超过大小上限 {max_bytes // (1024 * 1024)}MB")
+                digest.update(chunk)
+                out.write(chunk)
+        if size == 0:
+            raise UploadRejected("文件为空")
+
+        content_hash = digest.hexdigest()
+        storage_path = os.path.join("objects", content_hash[:2], content_hash + extension)
+        final_path = object_path(storage_path)
+        if os.path.exists(final_path):
+            os.remove(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            os.replace(tmp_path, final_path)
+        return StoredObject(content_hash, storage_path, size)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def ingest_uploads(exam_id: int, uploads: List[Tuple[str, Optional[str], BinaryIO]]) -> Tuple[List[dict], List[str]]:
+    """
+    保存一批上传的答题卡并登记到 answer_images（同步，在线程池中执行）
+
+    uploads为(原文件名, content_type, 文件流)。同一考试中内容相同的图片只登记一次。
+    返回(每个成功文件的 {image_id, filename, content_hash, duplicate}, 错误列表)。
+    """
+    stored = []
+    errors = []
+    for filename, content_type, fileobj in uploads:
+        extension = os.path.splitext(filename or "")[1].lower()
+        if extension not in ALLOWED_IMAGE_EXTENSIONS:
+            errors.append(f"{filename}: 不支持的图片格式")
+            continue
+        try:
+            stored.append((filename, content_type, store_stream(fileobj, extension)))
+        except UploadRejected as e:
+            errors.append(f"{filename}: {str(e)}")
+
+    if not stored:
+        return [], errors
+
+    with engine.connect() as conn:
+        hashes = list({obj.content_hash for _, _, obj in stored})
+        existing = {r.content_hash: r.image_id for r in conn.execute(
+            _SELECT_IMAGES_BY_HASH_SQL, {"exam_id": exam_id, "hashes": hashes}
+        )}
+
+        new_rows = {}
+        for filename, content_type, obj in stored:
+            if obj.content_hash not in existing and obj.content_hash not in new_rows:
+                new_rows[obj.content_hash] = {
+                    "exam_id": exam_id,
+                    "content_hash": obj.content_hash,
+                    "storage_path": obj.storage_path,
+                    "original_filename": filename,
+                    "content_type": content_type,
+                    "file_size": obj.file_size
+                }
+        if new_rows:
+            conn.execute(_INSERT_IMAGE_SQL, list(new_rows.values()))
+            ids = {r.content_hash: r.image_id for r in conn.execute(
+                _SELECT_IMAGES_BY_HASH_SQL, {"exam_id": exam_id, "hashes": list(new_rows)}
+            )}
+        else:
+            ids = {}
+        conn.commit()
+
+    results = []
+    inserted = set()
+    for filename, _, obj in stored:
+        # 本批次中首次出现且新登记的为新图片，其余视为重复
+        duplicate = obj.content_hash in existing or obj.content_hash in inserted
+        inserted.add(obj.content_hash)
+        results.append({
+            "image_id": existing.get(obj.content_hash) or ids.get(obj.content_hash),
+            "filename": filename,
+            "content_hash": obj.content_hash,
+            "duplicate": duplicate
+        })
+    return results, errors
@@ -0,0 +1,179 @@
+from typing import Dict, Optional, Tuple
+from collections import OrderedDict
+import logging
+import os
+import threading
+import cv2
+
+from backend.config import UPLOAD_DIR, get_setting
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 派生图片磁盘缓存的容量上限（字节），超出后按最近最少使用淘汰
+DERIVED_CACHE_BYTES = get_setting("DERIVED_CACHE_BYTES", 1024 * 1024 * 1024, int)
+
+# 派生图片规格：名称 -> (最长边像素, JPEG质量)
+DERIVED_VARIANTS: Dict[str, Tuple[int, int]] = {
+    "thumb": (256, 75),
+    "preview": (1280, 85),
+}
+
+DERIVED_DIR = os.path.join(UPLOAD_DIR, "derived")
+
+# JPEG可在解码时直接缩小（1/2、1/4、1/8），省去全分辨率解码
+_REDUCED_READ_FLAGS = [
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+]
+
+
+class DerivedImageError(ValueError):
+    """无法生成派生图片"""
+
+
+def _read_scaled(source_path: str, max_side: int, source_size: Optional[Tuple[int, int]] = None):
+    """按目标尺寸选择解码缩放倍数，解码后再缩放到最长边不超过max_side"""
+    image = None
+    if source_size is not None:
+        longest = max(source_size)
+        for factor, flag in _REDUCED_READ_FLAGS:
+            if longest // factor >= max_side:
+                image = cv2.imread(source_path, flag)
+                break
+    if image is None:
+        image = cv2.imread(source_path, cv2.IMREAD_COLOR)
+    if image is None:
+        raise DerivedImageError(f"无法解码图片: {os.path.basename(source_path)}")
+
+    height, width = image.shape[:2]
+    scale = max_side / max(height, width)
+    if scale < 1.0:
+        image = cv2.resize(image, (max(1, int(width * scale)), max(1, int(height * scale))),
+                           interpolation=cv2.INTER_AREA)
+    return image
+
+
+def _probe_size(source_path: str) -> Optional[Tuple[int, int]]:
+    """读取图片头部获取尺寸（仅JPEG/PNG，失败时返回None）"""
+    try:
+        with open(source_path, "rb") as f:
+            head = f.read(64 * 1024)
+    except OSError:
+        return None
+    if head[:8] == b"\x89PNG\r\n\x1a\n" and len(head) >= 24:
+        return int.from_bytes(head[16:20], "big"), int.from_bytes(head[20:24], "big")
+    if head[:2] == b"\xff\xd8":
+        i = 2
+        while i + 9 < len(head):
+            if head[i] != 0xFF:
+                i += 1
+                continue
+            marker = head[i + 1]
+            if marker in (0xC0, 0xC1, 0xC2):
+                return int.from_bytes(head[i + 7:i + 9], "big"), int.from_bytes(head[i + 5:i + 7], "big")
+            i += 2 + int.from_bytes(head[i + 2:i + 4], "big")
+    return None
+
+
+class DerivedImageCache:
+    """
+    派生图片的磁盘缓存
+
+    文件按 <规格>/<哈希前2位>/<哈希>.jpg 存放；索引在内存中按访问顺序维护，
+    首次使用时扫描缓存目录重建。写入新文件后总大小超过max_bytes时淘汰最久未访问的文件。
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._total_bytes = 0
+        self._loaded = False
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _load_index(self):
+        """按修改时间从旧到新扫描已有缓存文件"""
+        files = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if filename.endswith(".part"):
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, path, stat.st_size))
+        for _, path, size in sorted(files):
+            self._entries[path] = size
+            self._total_bytes += size
+        self._loaded = True
+
+    def path_for(self, variant: str, content_hash: str) -> str:
+        return os.path.join(self.root, variant, content_hash[:2], content_hash + ".jpg")
+
+    def get_or_create(self, variant: str, content_hash: str, source_path: str) -> str:
+        """返回派生图片路径，不存在时从原图生成"""
+        if variant not in DERIVED_VARIANTS:
+            raise DerivedImageError(f"未知的图片规格: {variant}")
+        path = self.path_for(variant, content_hash)
+
+        with self._lock:
+            if not self._loaded:
+                self._load_index()
+            if path in self._entries and os.path.exists(path):
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return path
+            self.misses += 1
+
+        max_side, quality = DERIVED_VARIANTS[variant]
+        image = _read_scaled(source_path, max_side, _probe_size(source_path))
+        ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if not ok:
+            raise DerivedImageError("派生图片编码失败")
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.part"
+        with open(tmp_path, "wb") as f:
+            f.write(encoded.tobytes())
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._total_bytes -= self._entries.pop(path, 0)
+            self._entries[path] = len(encoded)
+            self._total_bytes += len(encoded)
+            self._evict()
+        return path
+
+    def _evict(self):
+        # 最新写入的文件不淘汰，保证本次请求可以返回
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            path, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.warning(f"删除派生图片缓存失败 {path}: {str(e)}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / requests, 4) if requests else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "total_bytes": self._total_bytes,
+                "max_bytes": self.max_bytes
+            }
+
+
+derived_image_cache = DerivedImageCache(DERIVED_DIR, DERIVED_CACHE_BYTES)
@@ -0,0 +1,211 @@
+from typing import Dict, Optional, Sequence, Tuple
+from collections import Counter
+import re
+import time
+import unicodedata
+import numpy as np
+
+from backend.config import get_setting
+
+# 相似度不低于该值判为正确
+BLANK_ACCEPT_THRESHOLD = get_setting("BLANK_ACCEPT_THRESHOLD", 0.85, float)
+# 相似度介于两者之间时给0分并标记人工复核（多为OCR识别误差）
+BLANK_REVIEW_THRESHOLD = get_setting("BLANK_REVIEW_THRESHOLD", 0.6, float)
+
+# 参考答案中多个可接受答案的分隔符
+_ALTERNATIVE_SPLIT_RE = re.compile(r"[|｜;；]|\s+或\s+")
+_NUMBER_RE = re.compile(r"[+-]?(?:\d+\.?\d*|\.\d+)")
+# 数值、分数、百分数中有意义的符号
+_KEPT_SYMBOLS = set(".-+/%")
+_TOKEN_RE = re.compile(r"[a-z0-9.]+|[^\sa-z0-9.]+")
+
+
+def normalize_text(value: Optional[str]) -> str:
+    """NFKC规范化（全角转半角、兼容字符统一），转小写，去除空白和标点（保留数值中的符号）"""
+    value = unicodedata.normalize("NFKC", value or "").lower()
+    return "".join(
+        c for c in value
+        if c in _KEPT_SYMBOLS or (not c.isspace() and unicodedata.category(c)[0] not in "PZ")
+    )
+
+
+def _tokens(value: str) -> Counter:
+    """字母数字按整词、其余（中文等）按相邻二字切分，用于不受词序影响的相似度"""
+    tokens = Counter()
+    for run in _TOKEN_RE.findall(value):
+        if run[0].isascii() or len(run) == 1:
+            tokens[run] += 1
+        else:
+            tokens.update(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def _as_number(value: str) -> Optional[float]:
+    if _NUMBER_RE.fullmatch(value):
+        return float(value)
+    return None
+
+
+class _CompiledAnswer:
+    """预处理后的单个可接受答案：位并行编辑距离所需的字符位图、分词结果"""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.length = len(text)
+        self.mask = (1 << self.length) - 1
+        self.last_bit = 1 << (self.length - 1) if self.length else 0
+        self.peq: Dict[str, int] = {}
+        for i, c in enumerate(text):
+            self.peq[c] = self.peq.get(c, 0) | (1 << i)
+        self.tokens = _tokens(text)
+        self.token_total = sum(self.tokens.values())
+        self.number = _as_number(text)
+
+    def edit_distance(self, other: str) -> int:
+        """Myers/Hyyrö 位并行Levenshtein距离，每个字符只需常数次整数位运算"""
+        if not self.length:
+            return len(other)
+        mask, last_bit, peq = self.mask, self.last_bit, self.peq
+        pv, mv, distance = mask, 0, self.length
+        for c in other:
+            eq = peq.get(c, 0)
+            xv = eq | mv
+            xh = (((eq & pv) + pv) ^ pv) | eq
+            ph = mv | (~(xh | pv) & mask)
+            mh = pv & xh
+            if ph & last_bit:
+                distance += 1
+            elif mh & last_bit:
+                distance -= 1
+            ph = ((ph << 1) | 1) & mask
+            mh = (mh << 1) & mask
+            pv = mh | (~(xv | ph) & mask)
+            mv = ph & xv
+        return distance
+
+    def similarity(self, other: str, other_tokens: Counter) -> float:
+        if other == self.text:
+            return 1.0
+        # 数值答案必须数值相等（"0.50" 与 "0.5" 相同，"12" 与 "13" 不同）
+        if self.number is not None:
+            number = _as_number(other)
+            return 1.0 if number is not None and number == self.number else 0.0
+        longest = max(self.length, len(other))
+        if not longest:
+            return 1.0
+        edit = 1.0 - self.edit_distance(other) / longest
+        total = self.token_total + sum(other_tokens.values())
+        token = 2 * sum((self.tokens & other_tokens).values()) / total if total else 0.0
+        return max(edit, token)
+
+
+class BlankMatcher:
+    """
+    单道填空题的容错匹配器
+
+    构造时一次性处理参考答案（规范化、拆分多个可接受答案、预计算字符位图和分词），
+    之后可反复对大量作答调用 similarities() / score_many()。
+    """
+
+    def __init__(self, reference_answer: Optional[str], accept_threshold: float = BLANK_ACCEPT_THRESHOLD,
+                 review_threshold: float = BLANK_REVIEW_THRESHOLD):
+        alternatives = {normalize_text(part) for part in _ALTERNATIVE_SPLIT_RE.split(reference_answer or "")}
+        alternatives.discard("")
+        self.answers = [_CompiledAnswer(text) for text in sorted(alternatives)]
+        self.exact = {answer.text for answer in self.answers}
+        self.accept_threshold = accept_threshold
+        self.review_threshold = review_threshold
+
+    def similarity(self, answer: Optional[str]) -> float:
+        """作答与最接近的可接受答案的相似度（0~1）"""
+        text = normalize_text(answer)
+        if text in self.exact:
+            return 1.0
+        if not text or not self.answers:
+            return 0.0
+        tokens = _tokens(text)
+        return max(candidate.similarity(text, tokens) for candidate in self.answers)
+
+    def similarities(self, answers: Sequence[Optional[str]]) -> np.ndarray:
+        """批量计算相似度，相同作答只计算一次"""
+        memo: Dict[Optional[str], float] = {}
+        result = np.empty(len(answers), dtype=np.float64)
+        for i, answer in enumerate(answers):
+            value = memo.get(answer)
+            if value is None:
+                value = memo[answer] = self.similarity(answer)
+            result[i] = value
+        return result
+
+    def score_many(self, answers: Sequence[Optional[str]], full_score: float) -> Tuple[np.ndarray, np.ndarray]:
+        """返回 (得分, 是否需要复核)：达到接受阈值得满分，介于复核阈值和接受阈值之间为0分并标记复核"""
+        similarity = self.similarities(answers)
+        accepted = similarity >= self.accept_threshold
+        review = ~accepted & (similarity >= self.review_threshold)
+        return np.where(accepted, full_score, 0.0), review
+
+
+def match_blanks(matchers: Dict[int, BlankMatcher], full_scores: Dict[int, float],
+                 question_ids: Sequence[int], answers: Sequence[Optional[str]]) -> Tuple[np.ndarray, np.ndarray]:
+    """按题目分组批量评分多道填空题的作答，返回与输入顺序一致的 (得分, 是否需要复核)"""
+    question_ids = np.asarray(question_ids)
+    scores = np.zeros(len(question_ids), dtype=np.float64)
+    review = np.zeros(len(question_ids), dtype=bool)
+    for question_id in np.unique(question_ids):
+        rows = np.flatnonzero(question_ids == question_id)
+        matcher = matchers[int(question_id)]
+        scores[rows], review[rows] = matcher.score_many([answers[i] for i in rows], full_scores[int(question_id)])
+    return scores, review
+
+
+def _add_ocr_noise(rng, text: str) -> str:
+    """模拟OCR误差：随机替换、删除、插入字符，或插入全角空格/标点"""
+    chars = list(text)
+    for _ in range(int(rng.integers(0, 3))):
+        op = int(rng.integers(0, 4))
+        pos = int(rng.integers(0, len(chars) + 1))
+        if op == 0 and pos < len(chars):
+            chars[pos] = chr(0x4E00 + int(rng.integers(0, 2000)))
+        elif op == 1 and pos < len(chars) and len(chars) > 1:
+            del chars[pos]
+        elif op == 2:
+            chars.insert(pos, chr(0x4E00 + int(rng.integers(0, 2000))))
+        else:
+            chars.insert(pos, "　" if rng.random() < 0.5 else "，")
+    return "".join(chars)
+
+
+def benchmark(students: int = 1000, blanks: int = 20, seed: int = 0) -> dict:
+    """模拟一场考试的全部填空：每题一个参考答案（部分带备选），作答带OCR噪声"""
+    rng = np.random.default_rng(seed)
+    references = {}
+    for question_id in range(blanks):
+        length = int(rng.integers(2, 12))
+        text = "".join(chr(0x4E00 + int(rng.integers(0, 2000))) for _ in range(length))
+        references[question_id] = text + ("｜" + text[::-1] if question_id % 4 == 0 else "")
+
+    question_ids, answers = [], []
+    for _ in range(students):
+        for question_id, reference in references.items():
+            correct = reference.split("｜")[0]
+            question_ids.append(question_id)
+            answers.append(_add_ocr_noise(rng, correct) if rng.random() < 0.6 else correct)
+
+    start = time.perf_counter()
+    matchers = {question_id: BlankMatcher(reference) for question_id, reference in references.items()}
+    compile_seconds = time.perf_counter() - start
+    scores, review = match_blanks(matchers, {q: 1.0 for q in references}, question_ids, answers)
+    total_seconds = time.perf_counter() - start
+    return {
+        "answers": len(answers),
+        "compile_ms": round(compile_seconds * 1000, 2),
+        "seconds": round(total_seconds, 3),
+        "answers_per_second": round(len(answers) / total_seconds),
+        "accepted": int((scores > 0).sum()),
+        "needs_review": int(review.sum())
+    }
+
+
+if __name__ == "__main__":
+    # 基准测试：python -m backend.services.grading.blank_match
+    print(benchmark())
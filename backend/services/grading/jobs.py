@@ -0,0 +1,497 @@
+from typing import List, Optional
+from datetime import datetime
+from sqlalchemy import text, bindparam
+import logging
+import multiprocessing
+import os
+import threading
+import time
+
+from backend.config import get_setting
+from backend.database import engine
+from backend.services.grading import result_cache
+from backend.services.grading.llm_client import configure_process_share, close_process_client
+from backend.services.grading.pipeline import OBJECTIVE_TYPES, grade_tasks
+from backend.services.response_cache import EXAMS_SCOPE, exam_scope, bump_versions
+from backend.services.score_summary import apply_results
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 每个API进程内启动的阅卷工作进程数。多进程部署（多个uvicorn worker）时每个进程都会启动一组，
+# 应设为0并用 python -m backend.services.grading.jobs --workers N 单独运行工作进程
+GRADING_WORKERS = get_setting("GRADING_WORKERS", 2, int)
+# 每个工作进程每次领取的主观题任务数
+GRADING_BATCH_SIZE = get_setting("GRADING_BATCH_SIZE", 50, int)
+# 客观题向量化评分，每次领取更大的批次
+GRADING_OBJECTIVE_BATCH_SIZE = get_setting("GRADING_OBJECTIVE_BATCH_SIZE", 5000, int)
+# 任务租约（秒）：工作进程崩溃后，超过租约仍未完成的任务会被重新领取
+GRADING_LEASE_SECONDS = get_setting("GRADING_LEASE_SECONDS", 300, int)
+# 单个任务的最大尝试次数
+GRADING_MAX_ATTEMPTS = get_setting("GRADING_MAX_ATTEMPTS", 3, int)
+# 没有可领取任务时的等待间隔（秒）
+GRADING_POLL_INTERVAL = get_setting("GRADING_POLL_INTERVAL", 2, float)
+
+ACTIVE_JOB_STATUSES = ("pending", "running")
+
+
+class GradingJobError(ValueError):
+    """阅卷任务状态不允许当前操作"""
+
+
+# ==================== 任务创建与控制（API进程） ====================
+
+_INSERT_TASKS_SQL = text("""
+    INSERT INTO grading_tasks (job_id, exam_id, student_id, question_id)
+    SELECT :job_id, es.exam_id, es.student_id, eq.question_id
+    FROM exam_students es
+    JOIN exam_questions eq ON eq.exam_id = es.exam_id
+    WHERE es.exam_id = :exam_id
+""")
+
+
+def create_job(exam_id: int) -> dict:
+    """
+    为考试创建阅卷任务，每个学生×题目生成一个子任务
+
+    考试已有进行中的任务时直接返回该任务。返回 {job_id, total_tasks, created}。
+    """
+    with engine.connect() as conn:
+        # 锁定考试行，避免同一考试并发创建多个任务
+        conn.execute(text("SELECT exam_id FROM exams WHERE exam_id = :exam_id FOR UPDATE"), {"exam_id": exam_id})
+        active = conn.execute(
+            text("""
+            SELECT job_id, total_tasks FROM grading_jobs
+            WHERE exam_id = :exam_id AND status IN :statuses
+            ORDER BY job_id DESC LIMIT 1
+            """).bindparams(bindparam("statuses", expanding=True)),
+            {"exam_id": exam_id, "statuses": list(ACTIVE_JOB_STATUSES)}
+        ).fetchone()
+        if active:
+            conn.rollback()
+            return {"job_id": active.job_id, "total_tasks": active.total_tasks, "created": False}
+
+        job_id = conn.execute(
+            text("INSERT INTO grading_jobs (exam_id, status) VALUES (:exam_id, 'pending')"),
+            {"exam_id": exam_id}
+        ).lastrowid
+        total = conn.execute(_INSERT_TASKS_SQL, {"job_id": job_id, "exam_id": exam_id}).rowcount
+        conn.execute(
+            text("""
+            UPDATE grading_jobs SET status = 'running', total_tasks = :total, started_at = NOW()
+            WHERE job_id = :job_id
+            """),
+            {"job_id": job_id, "total": total}
+        )
+        conn.execute(text("UPDATE exams SET status = 'processing' WHERE exam_id = :exam_id"), {"exam_id": exam_id})
+        conn.commit()
+
+    bump_versions(EXAMS_SCOPE, exam_scope(exam_id))
+    return {"job_id": job_id, "total_tasks": total, "created": True}
+
+
+def _lock_job(conn, job_id: int):
+    job = conn.execute(
+        text("SELECT job_id, exam_id, status FROM grading_jobs WHERE job_id = :job_id FOR UPDATE"),
+        {"job_id": job_id}
+    ).fetchone()
+    if job is None:
+        raise KeyError(job_id)
+    return job
+
+
+def cancel_job(job_id: int) -> int:
+    """取消阅卷任务：未开始的子任务标记为已取消，正在执行的子任务完成后不再写入结果，返回取消的子任务数"""
+    with engine.connect() as conn:
+        job = _lock_job(conn, job_id)
+        if job.status not in ACTIVE_JOB_STATUSES:
+            raise GradingJobError(f"任务状态为 {job.status}，无法取消")
+        cancelled = conn.execute(
+            text("""
+            UPDATE grading_tasks SET status = 'cancelled'
+            WHERE job_id = :job_id AND status IN ('pending', 'running')
+            """),
+            {"job_id": job_id}
+        ).rowcount
+        conn.execute(
+            text("UPDATE grading_jobs SET status = 'cancelled', finished_at = NOW() WHERE job_id = :job_id"),
+            {"job_id": job_id}
+        )
+        conn.commit()
+    return cancelled
+
+
+def resume_job(job_id: int) -> int:
+    """恢复已取消或失败的阅卷任务：未完成和失败的子任务重新排队，返回重新排队的子任务数"""
+    with engine.connect() as conn:
+        job = _lock_job(conn, job_id)
+        if job.status not in ("cancelled", "failed"):
+            raise GradingJobError(f"任务状态为 {job.status}，无需恢复")
+        requeued = conn.execute(
+            text("""
+            UPDATE grading_tasks SET status = 'pending', attempts = 0, error_message = NULL
+            WHERE job_id = :job_id AND status IN ('cancelled', 'failed')
+            """),
+            {"job_id": job_id}
+        ).rowcount
+        conn.execute(
+            text("UPDATE grading_jobs SET status = 'running', finished_at = NULL WHERE job_id = :job_id"),
+            {"job_id": job_id}
+        )
+        conn.execute(text("UPDATE exams SET status = 'processing' WHERE exam_id = :exam_id"), {"exam_id": job.exam_id})
+        conn.commit()
+
+    bump_versions(EXAMS_SCOPE, exam_scope(job.exam_id))
+    return requeued
+
+
+def get_job_status(job_id: Optional[int] = None, exam_id: Optional[int] = None) -> Optional[dict]:
+    """获取阅卷任务进度（按job_id，或该考试最近一次任务），包含各状态数量和预计剩余时间"""
+    with engine.connect() as conn:
+        if job_id is not None:
+            job = conn.execute(text("SELECT * FROM grading_jobs WHERE job_id = :job_id"), {"job_id": job_id}).fetchone()
+        else:
+            job = conn.execute(
+                text("SELECT * FROM grading_jobs WHERE exam_id = :exam_id ORDER BY job_id DESC LIMIT 1"),
+                {"exam_id": exam_id}
+            ).fetchone()
+        if job is None:
+            return None
+
+        counts = {"pending": 0, "running": 0, "done": 0, "failed": 0, "cancelled": 0}
+        needs_review = 0
+        for row in conn.execute(
+            text("""
+            SELECT status, COUNT(*) AS task_count, SUM(needs_review) AS review_count
+            FROM grading_tasks WHERE job_id = :job_id GROUP BY status
+            """),
+            {"job_id": job.job_id}
+        ):
+            counts[row.status] = row.task_count
+            needs_review += int(row.review_count or 0)
+
+    finished = counts["done"] + counts["failed"]
+    remaining = counts["pending"] + counts["running"]
+    rate = None
+    eta_seconds = None
+    if job.started_at and finished:
+        end = job.finished_at or datetime.now()
+        elapsed = max((end - job.started_at).total_seconds(), 1.0)
+        rate = finished / elapsed
+        if job.status == "running":
+            eta_seconds = round(remaining / rate)
+
+    return {
+        "job_id": job.job_id,
+        "exam_id": job.exam_id,
+        "status": job.status,
+        "total": job.total_tasks,
+        "completed": counts["done"],
+        "failed": counts["failed"],
+        "pending": counts["pending"],
+        "running": counts["running"],
+        "cancelled": counts["cancelled"],
+        "needs_review": needs_review,
+        "cache": _cache_stats(job.cache_hits, job.cache_misses),
+        "progress": round(finished / job.total_tasks, 4) if job.total_tasks else 1.0,
+        "tasks_per_second": round(rate, 3) if rate else None,
+        "eta_seconds": eta_seconds,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at
+    }
+
+
+def _cache_stats(hits: int, misses: int) -> dict:
+    hits, misses = int(hits or 0), int(misses or 0)
+    lookups = hits + misses
+    return {"hits": hits, "misses": misses, "hit_rate": round(hits / lookups, 4) if lookups else 0.0}
+
+
+def get_exam_cache_stats(exam_id: int) -> dict:
+    """考试全部阅卷任务累计的结果缓存命中情况"""
+    with engine.connect() as conn:
+        row = conn.execute(
+            text("""
+            SELECT SUM(cache_hits) AS hits, SUM(cache_misses) AS misses
+            FROM grading_jobs WHERE exam_id = :exam_id
+            """),
+            {"exam_id": exam_id}
+        ).fetchone()
+    return {"exam_id": exam_id, **_cache_stats(row.hits, row.misses)}
+
+
+# 租约已过期且尝试次数用尽的任务（工作进程反复崩溃或卡死）不再重新领取，直接标记失败
+_FAIL_EXHAUSTED_SQL = text("""
+    UPDATE grading_tasks
+    SET status = 'failed', error_message = '超过最大尝试次数（工作进程异常退出或执行超时）',
+        finished_at = NOW(), lease_expires_at = NULL
+    WHERE status = 'running' AND lease_expires_at < NOW() AND attempts >= :max_attempts
+""")
+
+_FINISHED_JOBS_SQL = text("""
+    SELECT j.job_id, j.exam_id,
+           EXISTS(SELECT 1 FROM grading_tasks t WHERE t.job_id = j.job_id AND t.status = 'failed') AS has_failed,
+           EXISTS(SELECT 1 FROM grading_tasks t WHERE t.job_id = j.job_id AND t.needs_review) AS has_review
+    FROM grading_jobs j
+    WHERE j.status = 'running'
+      AND NOT EXISTS (
+          SELECT 1 FROM grading_tasks t WHERE t.job_id = j.job_id AND t.status IN ('pending', 'running')
+      )
+""")
+
+
+def finalize_jobs() -> int:
+    """
+    将子任务全部结束的任务标记为完成（有失败子任务时标记为失败），并更新考试状态，返回处理的任务数
+
+    只有全部子任务都已给出确定分数（无失败、无待复核）时考试才标记为已阅卷，否则保持处理中。
+    """
+    with engine.connect() as conn:
+        exhausted = conn.execute(_FAIL_EXHAUSTED_SQL, {"max_attempts": GRADING_MAX_ATTEMPTS}).rowcount
+        if exhausted:
+            logger.warning(f"{exhausted} 个阅卷子任务超过最大尝试次数，已标记失败")
+        finished = conn.execute(_FINISHED_JOBS_SQL).fetchall()
+        for job in finished:
+            conn.execute(
+                text("UPDATE grading_jobs SET status = :status, finished_at = NOW() WHERE job_id = :job_id AND status = 'running'"),
+                {"job_id": job.job_id, "status": "failed" if job.has_failed else "completed"}
+            )
+            if job.has_review and not job.has_failed:
+                logger.info(f"阅卷任务 {job.job_id} 已完成，但有子任务需要人工复核，考试 {job.exam_id} 保持处理中")
+            if not job.has_failed and not job.has_review:
+                conn.execute(text("UPDATE exams SET status = 'graded' WHERE exam_id = :exam_id"), {"exam_id": job.exam_id})
+        conn.commit()
+
+        if finished:
+            # 每完成一批任务检查一次缓存容量
+            evicted = result_cache.prune(conn)
+            conn.commit()
+            if evicted:
+                logger.info(f"阅卷结果缓存淘汰 {evicted} 条")
+
+    for job in finished:
+        bump_versions(EXAMS_SCOPE, exam_scope(job.exam_id))
+    return len(finished)
+
+
+# ==================== 任务领取与执行（工作进程） ====================
+
+def _claim_sql(type_condition: str):
+    return text(f"""
+    SELECT t.task_id, t.job_id, t.exam_id, t.student_id, t.question_id, t.answer_text, t.attempts
+    FROM grading_tasks t
+    JOIN grading_jobs j ON j.job_id = t.job_id AND j.status = 'running'
+    JOIN questions q ON q.id = t.question_id
+    WHERE t.status IN ('pending', 'running')
+      AND (t.status = 'pending' OR (t.lease_expires_at < NOW() AND t.attempts < :max_attempts))
+      AND q.type {type_condition} :types
+    ORDER BY t.task_id
+    LIMIT :limit
+    FOR UPDATE OF t SKIP LOCKED
+    """).bindparams(bindparam("types", expanding=True))
+
+
+# 客观题与主观题分开领取：前者大批量向量化评分，后者按小批次进入较慢的评分路径
+_CLAIM_OBJECTIVE_SQL = _claim_sql("IN")
+_CLAIM_SUBJECTIVE_SQL = _claim_sql("NOT IN")
+
+_MARK_RUNNING_SQL = text("""
+    UPDATE grading_tasks
+    SET status = 'running', worker_id = :worker_id, attempts = attempts + 1,
+        lease_expires_at = NOW() + INTERVAL :lease SECOND
+    WHERE task_id IN :task_ids
+""").bindparams(bindparam("task_ids", expanding=True))
+
+# 只写回仍处于running状态的任务（期间被取消的任务保持cancelled）
+_SAVE_RESULT_SQL = text("""
+    UPDATE grading_tasks
+    SET status = :status, score = :score, needs_review = :needs_review, detail = :detail,
+        error_message = :error, finished_at = IF(:status = 'pending', NULL, NOW()), lease_expires_at = NULL
+    WHERE task_id = :task_id AND status = 'running'
+""")
+
+_COUNT_CACHE_SQL = text("""
+    UPDATE grading_jobs SET cache_hits = cache_hits + :hits, cache_misses = cache_misses + :misses
+    WHERE job_id = :job_id
+""")
+
+
+def claim_tasks(worker_id: str, limit: int = GRADING_BATCH_SIZE, lease: int = GRADING_LEASE_SECONDS,
+                objective: bool = False) -> List:
+    """领取一批待执行（或租约已过期）的客观题或主观题子任务"""
+    claim_sql = _CLAIM_OBJECTIVE_SQL if objective else _CLAIM_SUBJECTIVE_SQL
+    with engine.connect() as conn:
+        tasks = conn.execute(claim_sql, {
+            "limit": limit, "types": sorted(OBJECTIVE_TYPES), "max_attempts": GRADING_MAX_ATTEMPTS
+        }).fetchall()
+        if tasks:
+            conn.execute(_MARK_RUNNING_SQL, {
+                "worker_id": worker_id, "lease": lease, "task_ids": [t.task_id for t in tasks]
+            })
+        conn.commit()
+    return tasks
+
+
+def run_tasks(tasks: List) -> int:
+    """评分并写回一批子任务，完成的得分同时计入成绩汇总，返回写回的数量"""
+    attempts = {t.task_id: t.attempts + 1 for t in tasks}
+    by_id = {t.task_id: t for t in tasks}
+    with engine.connect() as conn:
+        results = grade_tasks(conn, tasks)
+        rows = []
+        cache_counts = {}
+        for result in results:
+            if result.cached is not None:
+                counts = cache_counts.setdefault(by_id[result.task_id].job_id, {"hits": 0, "misses": 0})
+                counts["hits" if result.cached else "misses"] += 1
+            if result.error is None:
+                status = "done"
+            elif attempts[result.task_id] < GRADING_MAX_ATTEMPTS:
+                status = "pending"
+            else:
+                status = "failed"
+            rows.append({
+                "task_id": result.task_id,
+                "status": status,
+                "score": result.score,
+                "needs_review": result.needs_review,
+                "detail": result.detail,
+                "error": result.error[:500] if result.error else None
+            })
+        # 逐条写回以确认哪些任务仍归本进程所有（期间被取消或重新领取的不计入成绩）
+        written, saved = 0, []
+        for row in rows:
+            if not conn.execute(_SAVE_RESULT_SQL, row).rowcount:
+                continue
+            written += 1
+            if row["status"] == "done":
+                task = by_id[row["task_id"]]
+                saved.append({
+                    "exam_id": task.exam_id, "student_id": task.student_id, "question_id": task.question_id,
+                    "task_id": task.task_id, "score": row["score"], "needs_review": row["needs_review"]
+                })
+        if saved:
+            apply_results(conn, saved)
+        if cache_counts:
+            conn.execute(_COUNT_CACHE_SQL, [{"job_id": job_id, **counts} for job_id, counts in cache_counts.items()])
+        conn.commit()
+    return written
+
+
+def worker_main(worker_id: str, stop_event=None, batch_size: int = GRADING_BATCH_SIZE,
+                objective_batch_size: int = GRADING_OBJECTIVE_BATCH_SIZE, poll_interval: float = GRADING_POLL_INTERVAL,
+                process_count: int = 1):
+    """
+    工作进程主循环：优先领取客观题，没有时领取主观题，直到stop_event被设置
+
+    process_count为同时运行的工作进程数，大模型评分的并发数和token限额按此平分。
+    """
+    logger.info(f"阅卷工作进程 {worker_id} 启动")
+    configure_process_share(process_count)
+    try:
+        _worker_loop(worker_id, stop_event, batch_size, objective_batch_size, poll_interval)
+    finally:
+        close_process_client()
+
+
+def _worker_loop(worker_id: str, stop_event, batch_size: int, objective_batch_size: int, poll_interval: float):
+    while stop_event is None or not stop_event.is_set():
+        try:
+            tasks = claim_tasks(worker_id, objective_batch_size, objective=True) or claim_tasks(worker_id, batch_size)
+        except Exception as e:
+            logger.error(f"领取阅卷任务失败: {str(e)}")
+            tasks = []
+        if not tasks:
+            if stop_event is not None:
+                stop_event.wait(poll_interval)
+            else:
+                time.sleep(poll_interval)
+            continue
+        try:
+            run_tasks(tasks)
+        except Exception as e:
+            # 任务保持running，租约过期后会被重新领取
+            logger.error(f"执行阅卷任务失败: {str(e)}")
+
+
+class GradingWorkerPool:
+    """
+    本地阅卷工作进程池
+
+    工作进程通过数据库领取任务，与API进程互不阻塞；监督线程负责重启意外退出的进程，
+    并在子任务全部结束后完成任务、更新考试状态（缓存版本号在API进程内递增）。
+    """
+
+    def __init__(self, workers: int, supervise_interval: float = GRADING_POLL_INTERVAL):
+        self.workers = workers
+        self.supervise_interval = supervise_interval
+        # spawn：子进程重新创建数据库连接池，不继承父进程的连接
+        self._context = multiprocessing.get_context("spawn")
+        self._stop_event = None
+        self._processes = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _spawn(self, index: int):
+        worker_id = f"{os.getpid()}-{index}"
+        process = self._context.Process(
+            target=worker_main, args=(worker_id, self._stop_event), kwargs={"process_count": self.workers},
+            name=f"grading-worker-{index}", daemon=True
+        )
+        process.start()
+        self._processes[index] = process
+
+    def _supervise(self):
+        while not self._stop.wait(self.supervise_interval):
+            for index, process in list(self._processes.items()):
+                if not process.is_alive():
+                    logger.warning(f"阅卷工作进程 {process.name} 已退出（exitcode={process.exitcode}），重新启动")
+                    self._spawn(index)
+            try:
+                finalize_jobs()
+            except Exception as e:
+                logger.error(f"更新阅卷任务状态失败: {str(e)}")
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop_event = self._context.Event()
+        for index in range(self.workers):
+            self._spawn(index)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._supervise, name="grading-supervisor", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10):
+        """通知工作进程在当前批次结束后退出，超时未退出的进程强制终止（其任务在租约过期后重新领取）"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._stop_event is not None:
+            self._stop_event.set()
+        for process in self._processes.values():
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        self._processes = {}
+
+
+grading_worker_pool = GradingWorkerPool(GRADING_WORKERS)
+
+
+if __name__ == "__main__":
+    # 单独运行阅卷工作进程（API进程设置 GRADING_WORKERS=0 时使用）：python -m backend.services.grading.jobs --workers 4
+    import argparse
+
+    parser = argparse.ArgumentParser(description="阅卷工作进程")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    pool = GradingWorkerPool(args.workers)
+    pool.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pool.stop()
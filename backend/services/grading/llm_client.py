@@ -0,0 +1,410 @@
+from typing import Dict, List, Optional, Sequence
+import asyncio
+import json
+import logging
+import random
+import re
+import threading
+import time
+import httpx
+
+from backend.config import get_setting
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 是否对主观题调用大模型评分（关闭时主观题全部标记人工复核）
+LLM_GRADING_ENABLED = get_setting("LLM_GRADING_ENABLED", False, bool)
+# OpenAI兼容接口地址，默认指向本地模拟服务（python -m backend.services.grading.llm_mock）
+LLM_API_BASE = get_setting("LLM_API_BASE", "http://127.0.0.1:8011/v1")
+LLM_API_KEY = get_setting("LLM_API_KEY", "")
+LLM_MODEL = get_setting("LLM_MODEL", "grading-mock")
+# 同时进行的请求数（也是连接池大小）与每分钟token上限（提示词估算值，收到响应后按实际用量校正）。
+# 两者均为全部阅卷工作进程的总量，每个工作进程按进程数平分
+LLM_MAX_CONCURRENCY = get_setting("LLM_MAX_CONCURRENCY", 8, int)
+LLM_TOKENS_PER_MINUTE = get_setting("LLM_TOKENS_PER_MINUTE", 90000, int)
+LLM_TIMEOUT = get_setting("LLM_TIMEOUT", 60, float)
+LLM_MAX_RETRIES = get_setting("LLM_MAX_RETRIES", 4, int)
+LLM_BACKOFF_BASE = get_setting("LLM_BACKOFF_BASE", 0.5, float)
+LLM_BACKOFF_MAX = get_setting("LLM_BACKOFF_MAX", 20, float)
+# 同一道题的短答案合并到一个提示词中评分：每个提示词最多的答案数，以及视为短答案的最大字数
+LLM_PACK_SIZE = get_setting("LLM_PACK_SIZE", 8, int)
+LLM_PACK_MAX_CHARS = get_setting("LLM_PACK_MAX_CHARS", 300, int)
+# 为模型输出预留的token数（计入限流）
+LLM_COMPLETION_TOKENS_PER_ANSWER = 60
+
+_CJK_RE = re.compile(r"[\u3000-\u9fff\uff00-\uffef]")
+
+_SYSTEM_PROMPT = (
+    "你是阅卷老师。根据题目、参考答案和评分规则，对每份学生作答给出得分（0到满分之间，可以有小数）"
+    "和一句简短评语。只输出JSON：{\"results\": [{\"id\": 作答编号, \"score\": 得分, \"comment\": \"评语\"}]}"
+)
+
+
+class LLMGradingError(RuntimeError):
+    """大模型评分失败（重试后仍失败，或返回内容无法解析）"""
+
+
+class _RetryableError(Exception):
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class GradingRequest:
+    """一份待评分的主观题作答"""
+
+    def __init__(self, key, question: dict, answer: str):
+        self.key = key
+        self.question = question
+        self.answer = answer
+
+
+class GradingResponse:
+    """评分结果；error非空表示该作答评分失败"""
+
+    def __init__(self, key, score: Optional[float] = None, comment: Optional[str] = None, error: Optional[str] = None):
+        self.key = key
+        self.score = score
+        self.comment = comment
+        self.error = error
+
+
+def estimate_tokens(value: str) -> int:
+    """粗略估算token数：中文约每字1个，其余约每4个字符1个"""
+    cjk = len(_CJK_RE.findall(value))
+    return cjk + (len(value) - cjk + 3) // 4
+
+
+class TokenBucket:
+    """按每分钟token数限流的令牌桶（单个事件循环内使用）"""
+
+    def __init__(self, tokens_per_minute: int):
+        self.capacity = float(tokens_per_minute)
+        self.rate = tokens_per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, tokens: int):
+        # 单个请求超过容量时按容量计，避免永远等待
+        tokens = min(float(tokens), self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+
+    def adjust(self, delta: int):
+        """按实际用量校正（delta为实际值减估算值，可为负）"""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - delta)
+
+
+def build_messages(question: dict, answers: Sequence[tuple]) -> List[dict]:
+    """构造评分提示词：同一道题的多份作答以编号列出，要求模型按编号返回"""
+    payload = {
+        "question": question.get("content") or "",
+        "full_score": float(question.get("score") or 0),
+        "reference_answer": question.get("reference_answer") or "",
+        "scoring_rules": question.get("scoring_rules") or "",
+        "answers": [{"id": answer_id, "text": text} for answer_id, text in answers]
+    }
+    return [
+        {"role": "system", "content": _SYSTEM_PROMPT},
+        {"role": "user", "content": json.dumps(payload, ensure_ascii=False)}
+    ]
+
+
+def parse_results(content: str, answer_ids: Sequence[int], full_score: float) -> Dict[int, tuple]:
+    """解析模型输出，返回 {作答编号: (得分, 评语)}；得分截断到 [0, 满分]，缺失的编号不返回"""
+    match = re.search(r"\{.*\}", content or "", re.S)
+    if not match:
+        raise LLMGradingError("模型输出中没有JSON")
+    try:
+        items = json.loads(match.group(0))["results"]
+    except (ValueError, KeyError, TypeError):
+        raise LLMGradingError("模型输出格式错误")
+    if not isinstance(items, list):
+        raise LLMGradingError("模型输出格式错误")
+
+    wanted = set(answer_ids)
+    parsed = {}
+    for item in items:
+        try:
+            answer_id = int(item["id"])
+            score = float(item["score"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        if answer_id in wanted:
+            parsed[answer_id] = (min(max(score, 0.0), full_score), str(item.get("comment") or "")[:500])
+    return parsed
+
+
+class LLMStats:
+    """请求统计：次数、重试、失败和延迟分位数"""
+
+    def __init__(self):
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.latencies: List[float] = []
+
+    def snapshot(self) -> dict:
+        latencies = sorted(self.latencies)
+
+        def percentile(p):
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 1)
+
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "failures": self.failures,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "p50_ms": percentile(0.50),
+            "p95_ms": percentile(0.95),
+            "p99_ms": percentile(0.99),
+        }
+
+
+class LLMGradingClient:
+    """
+    异步大模型评分客户端
+
+    使用共享连接池的 httpx.AsyncClient；并发数由信号量限制，token用量由令牌桶限制。
+    同一道题的短答案按 pack_size 合并为一个请求，长答案单独请求。
+    可重试的错误（网络错误、超时、429、5xx）按带抖动的指数退避重试，429优先遵循Retry-After。
+    """
+
+    def __init__(self, api_base: str = LLM_API_BASE, api_key: str = LLM_API_KEY, model: str = LLM_MODEL,
+                 concurrency: int = LLM_MAX_CONCURRENCY, tokens_per_minute: int = LLM_TOKENS_PER_MINUTE,
+                 max_retries: int = LLM_MAX_RETRIES, pack_size: int = LLM_PACK_SIZE,
+                 pack_max_chars: int = LLM_PACK_MAX_CHARS, timeout: float = LLM_TIMEOUT):
+        self.api_base = api_base.rstrip("/")
+        self.model = model
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self.pack_size = max(1, pack_size)
+        self.pack_max_chars = pack_max_chars
+        self.stats = LLMStats()
+        headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self._client = httpx.AsyncClient(
+            headers=headers,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        )
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._bucket = TokenBucket(tokens_per_minute)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def close(self):
+        await self._client.aclose()
+
+    def _backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        if retry_after is not None:
+            return retry_after + random.uniform(0, LLM_BACKOFF_BASE)
+        # 全抖动：在 [0, min(上限, 基数×2^n)] 内随机，避免大量请求同时重试
+        return random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * (2 ** attempt)))
+
+    async def _post_once(self, messages: List[dict], max_tokens: int) -> dict:
+        response = await self._client.post(
+            f"{self.api_base}/chat/completions",
+            json={"model": self.model, "messages": messages, "temperature": 0, "max_tokens": max_tokens}
+        )
+        if response.status_code == 429 or response.status_code >= 500:
+            retry_after = response.headers.get("Retry-After")
+            raise _RetryableError(
+                f"HTTP {response.status_code}",
+                float(retry_after) if retry_after and retry_after.replace(".", "", 1).isdigit() else None
+            )
+        if response.status_code >= 400:
+            raise LLMGradingError(f"HTTP {response.status_code}: {response.text[:200]}")
+        # 网关等返回的2xx非JSON响应只影响本次请求，不能让异常冒到gather中拖垮整批
+        try:
+            data = response.json()
+        except ValueError:
+            raise LLMGradingError(f"大模型响应不是JSON: {response.text[:200]}")
+        if not isinstance(data, dict):
+            raise LLMGradingError("大模型响应格式错误")
+        return data
+
+    async def complete(self, messages: List[dict], max_tokens: int) -> str:
+        """发送一次对话请求（含限流与重试），返回模型输出文本"""
+        estimated = sum(estimate_tokens(m["content"]) for m in messages) + max_tokens
+        for attempt in range(self.max_retries + 1):
+            await self._bucket.acquire(estimated)
+            try:
+                async with self._semaphore:
+                    # 延迟只统计请求本身，不含排队等待并发名额的时间
+                    start = time.perf_counter()
+                    data = await self._post_once(messages, max_tokens)
+                    latency = time.perf_counter() - start
+            except (_RetryableError, httpx.TransportError) as e:
+                retry_after = getattr(e, "retry_after", None)
+                if attempt >= self.max_retries:
+                    self.stats.failures += 1
+                    raise LLMGradingError(f"大模型请求失败（已重试{attempt}次）: {str(e) or type(e).__name__}")
+                self.stats.retries += 1
+                await asyncio.sleep(self._backoff(attempt, retry_after))
+                continue
+            except LLMGradingError:
+                self.stats.failures += 1
+                raise
+
+            self.stats.requests += 1
+            self.stats.latencies.append(latency)
+            usage = data.get("usage") or {}
+            if usage.get("total_tokens"):
+                self._bucket.adjust(int(usage["total_tokens"]) - estimated)
+            self.stats.prompt_tokens += int(usage.get("prompt_tokens") or 0)
+            self.stats.completion_tokens += int(usage.get("completion_tokens") or 0)
+            try:
+                return data["choices"][0]["message"]["content"]
+            except (KeyError, IndexError, TypeError):
+                raise LLMGradingError("大模型响应格式错误")
+
+    def _pack(self, requests: Sequence[GradingRequest]) -> List[List[GradingRequest]]:
+        """按题目分组，短答案每 pack_size 份合并为一组，长答案单独一组"""
+        by_question: Dict[int, List[GradingRequest]] = {}
+        for request in requests:
+            by_question.setdefault(request.question["id"], []).append(request)
+        packs = []
+        for group in by_question.values():
+            short = [r for r in group if len(r.answer or "") <= self.pack_max_chars]
+            packs.extend([r] for r in group if len(r.answer or "") > self.pack_max_chars)
+            packs.extend(short[i:i + self.pack_size] for i in range(0, len(short), self.pack_size))
+        return packs
+
+    async def _grade_pack(self, pack: List[GradingRequest]) -> List[GradingResponse]:
+        question = pack[0].question
+        full_score = float(question.get("score") or 0)
+        messages = build_messages(question, [(i, r.answer) for i, r in enumerate(pack)])
+        try:
+            content = await self.complete(messages, LLM_COMPLETION_TOKENS_PER_ANSWER * len(pack))
+            parsed = parse_results(content, range(len(pack)), full_score)
+        except LLMGradingError as e:
+            return [GradingResponse(r.key, error=str(e)) for r in pack]
+        return [
+            GradingResponse(r.key, *parsed[i]) if i in parsed else GradingResponse(r.key, error="模型未返回该作答的评分")
+            for i, r in enumerate(pack)
+        ]
+
+    async def grade(self, requests: Sequence[GradingRequest]) -> List[GradingResponse]:
+        """并发评分一批作答，结果顺序与输入一致"""
+        packs = self._pack(requests)
+        results = await asyncio.gather(*(self._grade_pack(pack) for pack in packs))
+        by_key = {response.key: response for pack_results in results for response in pack_results}
+        return [by_key[request.key] for request in requests]
+
+
+class _ProcessClient:
+    """
+    工作进程内常驻的评分客户端
+
+    事件循环运行在后台线程中，连接池和令牌桶跨批次复用；并发数和每分钟token数按工作进程数平分，
+    使所有进程合计不超过配置的上限。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._client: Optional[LLMGradingClient] = None
+        self.process_count = 1
+
+    def configure(self, process_count: int):
+        """设置共享上限的工作进程数（需在首次评分前调用）"""
+        self.process_count = max(1, process_count)
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="llm-grading-loop", daemon=True).start()
+
+                async def create():
+                    return LLMGradingClient(
+                        concurrency=max(1, LLM_MAX_CONCURRENCY // self.process_count),
+                        tokens_per_minute=max(1, LLM_TOKENS_PER_MINUTE // self.process_count)
+                    )
+
+                self._client = asyncio.run_coroutine_threadsafe(create(), loop).result()
+                self._loop = loop
+            return self._loop, self._client
+
+    def grade(self, requests: Sequence[GradingRequest]) -> List[GradingResponse]:
+        loop, client = self._ensure_started()
+        return asyncio.run_coroutine_threadsafe(client.grade(requests), loop).result()
+
+    def close(self):
+        with self._lock:
+            if self._loop is None:
+                return
+            asyncio.run_coroutine_threadsafe(self._client.close(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop, self._client = None, None
+
+
+_process_client = _ProcessClient()
+
+
+def configure_process_share(process_count: int):
+    """阅卷工作进程启动时调用：按进程总数平分并发数和token限额"""
+    _process_client.configure(process_count)
+
+
+def close_process_client():
+    """阅卷工作进程退出时关闭连接池"""
+    _process_client.close()
+
+
+def grade_with_llm(requests: Sequence[GradingRequest]) -> List[GradingResponse]:
+    """同步入口（供阅卷工作进程调用）：提交到本进程常驻的客户端完成一批评分"""
+    return _process_client.grade(requests)
+
+
+async def _benchmark(total: int, concurrency: int, pack_size: int, tokens_per_minute: int) -> dict:
+    question = {"id": 1, "content": "简述光合作用的过程", "score": 10,
+                "reference_answer": "光反应和暗反应两个阶段", "scoring_rules": "答出两个阶段各得5分"}
+    requests = [GradingRequest(i, question, f"作答{i}：光合作用分为光反应和暗反应") for i in range(total)]
+    async with LLMGradingClient(concurrency=concurrency, pack_size=pack_size, tokens_per_minute=tokens_per_minute) as client:
+        start = time.perf_counter()
+        responses = await client.grade(requests)
+        elapsed = time.perf_counter() - start
+        return {
+            "answers": total,
+            "seconds": round(elapsed, 2),
+            "answers_per_second": round(total / elapsed, 1),
+            "failed_answers": sum(1 for r in responses if r.error),
+            **client.stats.snapshot()
+        }
+
+
+if __name__ == "__main__":
+    # 吞吐量与尾延迟测试（先启动模拟服务：python -m backend.services.grading.llm_mock）
+    # python -m backend.services.grading.llm_client --answers 500 --concurrency 16 --pack-size 8
+    import argparse
+
+    parser = argparse.ArgumentParser(description="大模型评分客户端基准测试")
+    parser.add_argument("--answers", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=LLM_MAX_CONCURRENCY)
+    parser.add_argument("--pack-size", type=int, default=LLM_PACK_SIZE)
+    parser.add_argument("--tokens-per-minute", type=int, default=LLM_TOKENS_PER_MINUTE)
+    args = parser.parse_args()
+    print(asyncio.run(_benchmark(args.answers, args.concurrency, args.pack_size, args.tokens_per_minute)))
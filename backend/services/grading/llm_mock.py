@@ -0,0 +1,98 @@
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+import asyncio
+import hashlib
+import json
+import logging
+import random
+
+from backend.config import get_setting
+from backend.services.grading.llm_client import estimate_tokens
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 模拟参数（配置项或命令行参数设置）
+MOCK_LATENCY_MS = get_setting("LLM_MOCK_LATENCY_MS", 800, float)
+# 每个作答额外增加的生成耗时
+MOCK_PER_ANSWER_MS = get_setting("LLM_MOCK_PER_ANSWER_MS", 120, float)
+# 对数正态分布的形状参数，越大长尾越明显
+MOCK_LATENCY_SIGMA = get_setting("LLM_MOCK_LATENCY_SIGMA", 0.5, float)
+MOCK_ERROR_RATE = get_setting("LLM_MOCK_ERROR_RATE", 0.03, float)
+MOCK_RATE_LIMIT_RATE = get_setting("LLM_MOCK_RATE_LIMIT_RATE", 0.03, float)
+
+app = FastAPI(title="大模型评分模拟服务")
+
+
+def _mock_score(answer: str, reference: str, full_score: float) -> float:
+    """与参考答案的字符重合率决定得分，同样的输入得到同样的分数"""
+    if not answer:
+        return 0.0
+    overlap = len(set(answer) & set(reference)) / max(len(set(reference)), 1)
+    # 按作答内容加入确定性的小扰动，模拟模型打分的差异
+    jitter = int(hashlib.md5(answer.encode("utf-8")).hexdigest()[:4], 16) / 0xFFFF * 0.1
+    return round(min(1.0, overlap + jitter) * full_score * 2) / 2
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(body: dict):
+    """OpenAI兼容的对话接口：解析评分提示词中的作答，按模拟延迟返回评分JSON"""
+    messages = body.get("messages") or []
+    try:
+        payload = json.loads(messages[-1]["content"])
+        answers = payload.get("answers") or []
+    except (ValueError, KeyError, IndexError, TypeError):
+        payload, answers = {}, []
+
+    delay = random.lognormvariate(0, MOCK_LATENCY_SIGMA) * (MOCK_LATENCY_MS + MOCK_PER_ANSWER_MS * len(answers)) / 1000
+    roll = random.random()
+    if roll < MOCK_RATE_LIMIT_RATE:
+        await asyncio.sleep(0.01)
+        return JSONResponse(status_code=429, content={"error": "rate limited"}, headers={"Retry-After": "1"})
+    if roll < MOCK_RATE_LIMIT_RATE + MOCK_ERROR_RATE:
+        await asyncio.sleep(delay / 2)
+        return JSONResponse(status_code=random.choice([500, 502, 503]), content={"error": "upstream error"})
+    await asyncio.sleep(delay)
+
+    full_score = float(payload.get("full_score") or 0)
+    reference = payload.get("reference_answer") or ""
+    results = [
+        {"id": a.get("id"), "score": _mock_score(a.get("text") or "", reference, full_score), "comment": "模拟评分"}
+        for a in answers
+    ]
+    content = json.dumps({"results": results}, ensure_ascii=False)
+    prompt_tokens = sum(estimate_tokens(m.get("content") or "") for m in messages)
+    completion_tokens = estimate_tokens(content)
+    return {
+        "id": "mock",
+        "object": "chat.completion",
+        "model": body.get("model"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+    }
+
+
+if __name__ == "__main__":
+    # python -m backend.services.grading.llm_mock --port 8011 --latency-ms 800 --error-rate 0.03 --rate-limit-rate 0.03
+    import argparse
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="大模型评分模拟服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8011)
+    parser.add_argument("--latency-ms", type=float, default=MOCK_LATENCY_MS)
+    parser.add_argument("--per-answer-ms", type=float, default=MOCK_PER_ANSWER_MS)
+    parser.add_argument("--latency-sigma", type=float, default=MOCK_LATENCY_SIGMA)
+    parser.add_argument("--error-rate", type=float, default=MOCK_ERROR_RATE)
+    parser.add_argument("--rate-limit-rate", type=float, default=MOCK_RATE_LIMIT_RATE)
+    args = parser.parse_args()
+    MOCK_LATENCY_MS = args.latency_ms
+    MOCK_PER_ANSWER_MS = args.per_answer_ms
+    MOCK_LATENCY_SIGMA = args.latency_sigma
+    MOCK_ERROR_RATE = args.error_rate
+    MOCK_RATE_LIMIT_RATE = args.rate_limit_rate
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,173 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+import json
+import re
+import numpy as np
+
+from backend.services.grading.blank_match import BlankMatcher, match_blanks
+
+# 选择题/判断题答案编码为位掩码：A~Z占第0~25位，无法识别的内容置最高位（必然判错）
+INVALID_BIT = np.uint32(1 << 31)
+TRUE_MASK = 1
+FALSE_MASK = 2
+
+# 选项之间允许出现的分隔符
+_CHOICE_SEPARATORS = set(" \t\r\n,，、;；/")
+
+_TRUE_WORDS = {"T", "TRUE", "Y", "YES", "对", "正确", "是", "√", "✓", "✔"}
+_FALSE_WORDS = {"F", "FALSE", "N", "NO", "错", "错误", "否", "×", "✗", "✘", "X"}
+
+# 多选题部分得分规则，例如“少选得2分”“漏选给一半分”“每选对一项得1分”
+_NUMBER = r"(\d+(?:\.\d+)?)"
+_PER_OPTION_RE = re.compile(r"每(?:选对|对|个正确选项|项正确)?一?(?:项|个)?\s*(?:得|给|记)\s*" + _NUMBER + r"\s*分")
+_PARTIAL_RE = re.compile(r"(?:少选|漏选|选不全|选对但不全|部分选对|部分正确)[^，。；,;\d]*?" + _NUMBER + r"\s*分")
+_PARTIAL_HALF_RE = re.compile(r"(?:少选|漏选|选不全|选对但不全|部分选对|部分正确)[^，。；,;]*?(?:一半|半数|半分)")
+
+# 8位查表计算popcount（numpy 1.x没有bitwise_count）
+_POPCOUNT8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _popcount(values: np.ndarray) -> np.ndarray:
+    return _POPCOUNT8[values.astype(np.uint32).view(np.uint8)].reshape(-1, 4).sum(axis=1)
+
+
+def _to_half_width(value: str) -> str:
+    return "".join(chr(ord(c) - 0xFEE0) if 0xFF01 <= ord(c) <= 0xFF5E else c for c in value)
+
+
+def encode_choice(value: Optional[str]) -> int:
+    """选择题答案转为选项位掩码，如 "A, C" -> 0b101"""
+    mask = 0
+    for c in _to_half_width(value or "").upper():
+        if "A" <= c <= "Z":
+            mask |= 1 << (ord(c) - ord("A"))
+        elif c not in _CHOICE_SEPARATORS:
+            mask |= int(INVALID_BIT)
+    return mask
+
+
+def encode_true_false(value: Optional[str]) -> int:
+    """判断题答案转为 TRUE_MASK / FALSE_MASK，空白为0，无法识别时置INVALID_BIT"""
+    word = "".join(_to_half_width(value or "").split()).upper()
+    if not word:
+        return 0
+    if word in _TRUE_WORDS:
+        return TRUE_MASK
+    if word in _FALSE_WORDS:
+        return FALSE_MASK
+    return int(INVALID_BIT)
+
+
+def parse_partial_credit(scoring_rules: Optional[str], full_score: float) -> Tuple[float, float]:
+    """
+    从评分规则中解析多选题的部分得分，返回 (少选固定得分, 每选对一项得分)
+
+    支持JSON（{"partial_score": 2} 或 {"per_option_score": 1}）和常见中文表述；
+    未写明时少选不得分。错选（含任一错误选项）一律不得分。
+    """
+    rules = (scoring_rules or "").strip()
+    if not rules:
+        return 0.0, 0.0
+    if rules.startswith("{"):
+        try:
+            config = json.loads(rules)
+            return float(config.get("partial_score", 0) or 0), float(config.get("per_option_score", 0) or 0)
+        except (ValueError, TypeError, AttributeError):
+            pass
+    match = _PER_OPTION_RE.search(rules)
+    if match:
+        return 0.0, float(match.group(1))
+    match = _PARTIAL_RE.search(rules)
+    if match:
+        return min(float(match.group(1)), full_score), 0.0
+    if _PARTIAL_HALF_RE.search(rules):
+        return full_score / 2, 0.0
+    return 0.0, 0.0
+
+
+class ObjectiveScorer:
+    """
+    客观题向量化评分
+
+    构造时把一场考试的客观题预处理为数组（参考答案位掩码、满分、部分得分规则）并为填空题编译匹配器，
+    score() 对任意多条作答一次性比较：选择/判断题以numpy运算完成，填空题按题批量容错匹配。
+    """
+
+    def __init__(self, questions: Sequence[dict]):
+        self.index: Dict[int, int] = {}
+        count = len(questions)
+        self.types: List[str] = []
+        self.ref_masks = np.zeros(count, dtype=np.uint32)
+        self.full_scores = np.zeros(count, dtype=np.float64)
+        self.partial_scores = np.zeros(count, dtype=np.float64)
+        self.per_option_scores = np.zeros(count, dtype=np.float64)
+        self.blank_matchers: Dict[int, BlankMatcher] = {}
+        self.blank_full_scores: Dict[int, float] = {}
+
+        for i, question in enumerate(questions):
+            self.index[question["id"]] = i
+            self.types.append(question["type"])
+            full_score = float(question["score"] or 0)
+            self.full_scores[i] = full_score
+            if question["type"] == "choice":
+                self.ref_masks[i] = encode_choice(question["reference_answer"])
+                self.partial_scores[i], self.per_option_scores[i] = parse_partial_credit(
+                    question.get("scoring_rules"), full_score
+                )
+            elif question["type"] == "true_false":
+                self.ref_masks[i] = encode_true_false(question["reference_answer"])
+            elif question["type"] == "fill_blank":
+                self.blank_matchers[i] = BlankMatcher(question["reference_answer"])
+                self.blank_full_scores[i] = full_score
+
+        self.is_blank = np.array([t == "fill_blank" for t in self.types], dtype=bool)
+        self.multi_select = _popcount(self.ref_masks) > 1 if count else np.zeros(0, dtype=bool)
+
+    def _encode(self, qidx: np.ndarray, answers: Sequence[str]) -> np.ndarray:
+        """选择/判断题作答转位掩码（填空题为0），相同作答只编码一次"""
+        masks = np.zeros(len(answers), dtype=np.uint32)
+        memo = {}
+        for n, (i, answer) in enumerate(zip(qidx, answers)):
+            q_type = self.types[i]
+            if q_type == "fill_blank":
+                continue
+            key = (q_type, answer)
+            encoded = memo.get(key)
+            if encoded is None:
+                encoded = memo[key] = encode_choice(answer) if q_type == "choice" else encode_true_false(answer)
+            masks[n] = encoded
+        return masks
+
+    def score(self, question_ids: Sequence[int], answers: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        返回每条作答的 (得分, 是否需要复核)；question_ids中的题目必须都在构造时传入
+
+        只有填空题会因相似度介于复核阈值和接受阈值之间而标记复核。
+        """
+        if not len(answers):
+            return np.zeros(0, dtype=np.float64), np.zeros(0, dtype=bool)
+        qidx = np.fromiter((self.index[qid] for qid in question_ids), dtype=np.int64, count=len(question_ids))
+        masks = self._encode(qidx, answers)
+
+        ref = self.ref_masks[qidx]
+        full = self.full_scores[qidx]
+        exact = (masks == ref) & (ref != 0)
+
+        # 多选题：无错误选项且至少选对一项时按规则给部分分
+        no_wrong = (masks & ~ref) == 0
+        hit_count = _popcount(masks & ref)
+        partial = np.where(
+            self.per_option_scores[qidx] > 0,
+            np.minimum(hit_count * self.per_option_scores[qidx], full),
+            self.partial_scores[qidx]
+        )
+        partial_ok = self.multi_select[qidx] & no_wrong & (hit_count > 0) & ~exact
+        scores = np.where(exact, full, np.where(partial_ok, partial, 0.0))
+        review = np.zeros(len(answers), dtype=bool)
+
+        # 填空题按题分组交给预编译的容错匹配器
+        blank_rows = np.flatnonzero(self.is_blank[qidx])
+        if len(blank_rows):
+            scores[blank_rows], review[blank_rows] = match_blanks(
+                self.blank_matchers, self.blank_full_scores, qidx[blank_rows], [answers[n] for n in blank_rows]
+            )
+        return scores, review
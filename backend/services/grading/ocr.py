@@ -0,0 +1,255 @@
+from typing import Callable, Dict, List, Optional, Sequence
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import logging
+import threading
+import time
+import numpy as np
+
+from backend.config import get_setting
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 使用的OCR引擎名称（见 OCR_ENGINES）
+OCR_ENGINE = get_setting("OCR_ENGINE", "local", str)
+# 每次推理提交的作答区域数
+OCR_BATCH_SIZE = get_setting("OCR_BATCH_SIZE", 32, int)
+# 并行推理的线程数（每个线程持有独立的引擎实例）
+OCR_WORKERS = get_setting("OCR_WORKERS", 2, int)
+# 本地替身引擎模拟的推理耗时：每批固定开销 + 每个区域的耗时（毫秒）
+OCR_STANDIN_BATCH_MS = get_setting("OCR_STANDIN_BATCH_MS", 20.0, float)
+OCR_STANDIN_REGION_MS = get_setting("OCR_STANDIN_REGION_MS", 2.0, float)
+
+
+class OCRError(RuntimeError):
+    """OCR识别失败"""
+
+
+class OCRRegion:
+    """待识别的作答区域（已从答题卡上裁剪的灰度或彩色图像）"""
+
+    def __init__(self, region_id, image: np.ndarray):
+        self.region_id = region_id
+        self.image = image
+
+
+class OCRResult:
+    """单个区域的识别结果"""
+
+    def __init__(self, region_id, text: str, confidence: float):
+        self.region_id = region_id
+        self.text = text
+        # 0~1，越低越需要人工复核
+        self.confidence = confidence
+
+
+class OCREngine(ABC):
+    """
+    OCR引擎接口
+
+    子类必须实现 recognize_batch：输入一批区域图像，按相同顺序返回 (文本, 置信度)；
+    未实现时在创建实例时即报错。一个实例只会被一个线程使用，不要求线程安全。
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def recognize_batch(self, images: Sequence[np.ndarray]) -> List[tuple]:
+        """识别一批区域图像，返回与输入顺序一致的 (文本, 置信度) 列表"""
+
+    def close(self):
+        """释放模型等资源"""
+
+
+def _to_gray(image: np.ndarray) -> np.ndarray:
+    if image.ndim == 3:
+        return image.mean(axis=2).astype(np.uint8)
+    return image
+
+
+class LocalStandInEngine(OCREngine):
+    """
+    本地替身引擎：不依赖外部服务，结果完全由图像内容决定
+
+    按列投影切分“字符”，每个字符由其像素哈希映射到固定字符表；置信度取墨迹与背景的对比度。
+    推理耗时按 batch_ms + region_ms × 区域数 模拟（sleep期间释放GIL，与原生推理库一致），
+    用于在没有真实模型时测试流程并调优批大小和并发数。
+    """
+
+    name = "local"
+    ALPHABET = "ABCD0123456789对错"
+
+    def __init__(self, batch_ms: float = OCR_STANDIN_BATCH_MS, region_ms: float = OCR_STANDIN_REGION_MS):
+        self.batch_ms = batch_ms
+        self.region_ms = region_ms
+
+    def _recognize_one(self, image: np.ndarray) -> tuple:
+        gray = _to_gray(image)
+        ink = gray < 128
+        if not ink.any():
+            return "", 1.0
+
+        # 连续有墨迹的列视为一个字符
+        columns = ink.any(axis=0).astype(np.int8)
+        edges = np.flatnonzero(np.diff(np.concatenate(([0], columns, [0]))))
+        chars = []
+        for start, end in zip(edges[::2], edges[1::2]):
+            digest = hashlib.blake2b(np.ascontiguousarray(ink[:, start:end]).tobytes(), digest_size=2).digest()
+            chars.append(self.ALPHABET[int.from_bytes(digest, "big") % len(self.ALPHABET)])
+
+        contrast = (float(gray[~ink].mean()) - float(gray[ink].mean())) / 255 if (~ink).any() else 0.0
+        return "".join(chars), round(min(1.0, max(0.0, contrast)), 4)
+
+    def recognize_batch(self, images: Sequence[np.ndarray]) -> List[tuple]:
+        results = [self._recognize_one(image) for image in images]
+        delay = (self.batch_ms + self.region_ms * len(images)) / 1000
+        if delay > 0:
+            time.sleep(delay)
+        return results
+
+
+# 引擎名称 -> 无参工厂函数
+OCR_ENGINES: Dict[str, Callable[[], OCREngine]] = {
+    LocalStandInEngine.name: LocalStandInEngine,
+}
+
+
+def register_ocr_engine(name: str, factory: Callable[[], OCREngine]):
+    """注册新的OCR引擎（如PaddleOCR、Tesseract封装）"""
+    OCR_ENGINES[name] = factory
+
+
+class OCRRunner:
+    """
+    批量识别调度
+
+    将区域按batch_size分批，由workers个线程并行推理；每个线程懒加载自己的引擎实例。
+    """
+
+    def __init__(self, engine_name: str = OCR_ENGINE, batch_size: int = OCR_BATCH_SIZE, workers: int = OCR_WORKERS):
+        if engine_name not in OCR_ENGINES:
+            raise OCRError(f"未知的OCR引擎: {engine_name}")
+        self.engine_name = engine_name
+        self.batch_size = max(1, batch_size)
+        self.workers = max(1, workers)
+        self._local = threading.local()
+        self._engines: List[OCREngine] = []
+        self._lock = threading.Lock()
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self.regions = 0
+        self.batches = 0
+        self.busy_seconds = 0.0
+
+    def _engine(self) -> OCREngine:
+        engine = getattr(self._local, "engine", None)
+        if engine is None:
+            engine = OCR_ENGINES[self.engine_name]()
+            self._local.engine = engine
+            with self._lock:
+                self._engines.append(engine)
+        return engine
+
+    def _run_batch(self, batch: Sequence[OCRRegion]) -> List[OCRResult]:
+        start = time.perf_counter()
+        outputs = self._engine().recognize_batch([region.image for region in batch])
+        if len(outputs) != len(batch):
+            raise OCRError(f"OCR引擎返回 {len(outputs)} 个结果，期望 {len(batch)} 个")
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.regions += len(batch)
+            self.batches += 1
+            self.busy_seconds += elapsed
+        return [OCRResult(region.region_id, text, confidence) for region, (text, confidence) in zip(batch, outputs)]
+
+    def recognize(self, regions: Sequence[OCRRegion]) -> List[OCRResult]:
+        """识别一组区域，结果顺序与输入一致"""
+        if not regions:
+            return []
+        batches = [regions[i:i + self.batch_size] for i in range(0, len(regions), self.batch_size)]
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ocr")
+        results = []
+        for batch_results in self._pool.map(self._run_batch, batches):
+            results.extend(batch_results)
+        return results
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "engine": self.engine_name,
+                "batch_size": self.batch_size,
+                "workers": self.workers,
+                "regions": self.regions,
+                "batches": self.batches,
+                "avg_batch_ms": round(self.busy_seconds * 1000 / self.batches, 3) if self.batches else 0.0
+            }
+
+    def close(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+            engines, self._engines = self._engines, []
+        if pool is not None:
+            pool.shutdown(wait=True)
+        for engine in engines:
+            engine.close()
+
+
+def synthetic_regions(count: int, height: int = 48, width: int = 320, seed: int = 0) -> List[OCRRegion]:
+    """生成固定随机种子的模拟作答区域（白底黑色笔画），用于基准测试"""
+    rng = np.random.default_rng(seed)
+    regions = []
+    for i in range(count):
+        image = np.full((height, width), 240, dtype=np.uint8)
+        x = int(rng.integers(4, 16))
+        for _ in range(int(rng.integers(1, 8))):
+            w = int(rng.integers(12, 28))
+            if x + w >= width:
+                break
+            top = int(rng.integers(4, height // 3))
+            bottom = int(rng.integers(height * 2 // 3, height - 4))
+            image[top:bottom, x:x + w] = rng.integers(0, 60, size=(bottom - top, w), dtype=np.uint8)
+            x += w + int(rng.integers(6, 16))
+        regions.append(OCRRegion(i, image))
+    return regions
+
+
+def benchmark(engine_name: str, regions: Sequence[OCRRegion], batch_sizes: Sequence[int],
+              worker_counts: Sequence[int]) -> List[dict]:
+    """对每组 (批大小, 线程数) 识别同一批区域，返回吞吐量（区域/秒）"""
+    rows = []
+    for workers in worker_counts:
+        for batch_size in batch_sizes:
+            runner = OCRRunner(engine_name, batch_size, workers)
+            try:
+                start = time.perf_counter()
+                runner.recognize(regions)
+                elapsed = time.perf_counter() - start
+            finally:
+                runner.close()
+            rows.append({
+                "batch_size": batch_size,
+                "workers": workers,
+                "seconds": round(elapsed, 3),
+                "regions_per_second": round(len(regions) / elapsed, 1)
+            })
+    return rows
+
+
+if __name__ == "__main__":
+    # 基准测试：python -m backend.services.grading.ocr --regions 2000 --batch-sizes 8 32 64 --workers 1 2 4
+    import argparse
+
+    parser = argparse.ArgumentParser(description="OCR批量识别吞吐量基准测试")
+    parser.add_argument("--engine", default=OCR_ENGINE)
+    parser.add_argument("--regions", type=int, default=2000)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[8, 32, 64])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    sample = synthetic_regions(args.regions)
+    print(f"{'batch':>6} {'workers':>8} {'seconds':>9} {'regions/s':>10}")
+    for row in benchmark(args.engine, sample, args.batch_sizes, args.workers):
+        print(f"{row['batch_size']:>6} {row['workers']:>8} {row['seconds']:>9} {row['regions_per_second']:>10}")
@@ -0,0 +1,185 @@
+from typing import Dict, List, Optional
+from collections import OrderedDict
+from sqlalchemy import text, bindparam
+import logging
+
+from backend.services.grading import result_cache
+from backend.services.grading.objective import ObjectiveScorer
+from backend.services.grading.llm_client import LLM_GRADING_ENABLED, GradingRequest, grade_with_llm
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 不需要模型即可判分的题型
+OBJECTIVE_TYPES = {"choice", "true_false", "fill_blank"}
+
+_SELECT_QUESTIONS_SQL = text("""
+    SELECT id, type, score, reference_answer, scoring_rules
+    FROM questions WHERE id IN :question_ids
+""").bindparams(bindparam("question_ids", expanding=True))
+
+_SELECT_EXAM_OBJECTIVE_SQL = text("""
+    SELECT q.id, q.type, q.score, q.reference_answer, q.scoring_rules
+    FROM exam_questions eq
+    JOIN questions q ON q.id = eq.question_id
+    WHERE eq.exam_id = :exam_id AND q.type IN :types
+""").bindparams(bindparam("types", expanding=True))
+
+# 每个进程缓存的考试评分器数量：exam_id -> (题目评分标准指纹, ObjectiveScorer)
+SCORER_CACHE_SIZE = 16
+_scorers: "OrderedDict[int, tuple]" = OrderedDict()
+
+
+class TaskResult:
+    """单个阅卷任务的评分结果"""
+
+    def __init__(self, task_id: int, score: Optional[float] = None, needs_review: bool = False,
+                 detail: Optional[str] = None, error: Optional[str] = None, cached: Optional[bool] = None):
+        self.task_id = task_id
+        self.score = score
+        # 无法自动判分，需要人工复核
+        self.needs_review = needs_review
+        self.detail = detail
+        # 非空表示任务失败（可重试）
+        self.error = error
+        # 是否命中结果缓存；None表示未查询缓存
+        self.cached = cached
+
+
+def load_questions(conn, question_ids) -> Dict[int, dict]:
+    """一次性加载本批任务涉及的题目"""
+    if not question_ids:
+        return {}
+    return {
+        row.id: dict(row._mapping)
+        for row in conn.execute(_SELECT_QUESTIONS_SQL, {"question_ids": list(question_ids)})
+    }
+
+
+def normalize_answer(value: Optional[str]) -> str:
+    """去除空白并统一大小写，作为缓存的答案形式"""
+    return "".join((value or "").split()).upper()
+
+
+def get_exam_scorer(conn, exam_id: int, questions: Dict[int, dict]) -> ObjectiveScorer:
+    """
+    返回考试的客观题评分器（每个进程按考试缓存）
+
+    questions为本批涉及的客观题；其中任一题不在缓存的评分器中或评分标准已变化时重新加载整场考试的客观题。
+    """
+    entry = _scorers.get(exam_id)
+    if entry is not None:
+        fingerprints, scorer = entry
+        if all(fingerprints.get(qid) == result_cache.rubric_fingerprint(q) for qid, q in questions.items()):
+            _scorers.move_to_end(exam_id)
+            return scorer
+
+    by_id = {
+        row.id: dict(row._mapping)
+        for row in conn.execute(_SELECT_EXAM_OBJECTIVE_SQL, {"exam_id": exam_id, "types": sorted(OBJECTIVE_TYPES)})
+    }
+    # 本批题目可能已从考试中移除，仍按任务创建时的题目评分
+    by_id.update(questions)
+    scorer = ObjectiveScorer(list(by_id.values()))
+    _scorers[exam_id] = ({qid: result_cache.rubric_fingerprint(q) for qid, q in by_id.items()}, scorer)
+    while len(_scorers) > SCORER_CACHE_SIZE:
+        _scorers.popitem(last=False)
+    return scorer
+
+
+def _score_subjective(misses: Dict[str, tuple]) -> Dict[str, TaskResult]:
+    """对缓存未命中的主观题作答评分：启用大模型时批量并发调用，否则标记人工复核"""
+    if not LLM_GRADING_ENABLED:
+        return {key: TaskResult(None, needs_review=True, detail="主观题待评分") for key in misses}
+    requests = [GradingRequest(key, question, answer_text) for key, (question, answer_text, _) in misses.items()]
+    return {
+        response.key: TaskResult(None, error=response.error) if response.error
+        else TaskResult(None, score=response.score, detail=response.comment)
+        for response in grade_with_llm(requests)
+    }
+
+
+def _grade_slow(conn, pending: List, fingerprints: Dict[int, str]) -> Dict[int, TaskResult]:
+    """
+    主观题（简答、计算等）评分
+
+    先按（题目、评分标准指纹、规范化答案）批量查询结果缓存，未命中的作答去重后才实际评分并写回缓存。
+    """
+    keyed = []
+    for task, question in pending:
+        normalized = normalize_answer(task.answer_text)
+        keyed.append((task, question, result_cache.cache_key(task.question_id, fingerprints[task.question_id], normalized)))
+
+    cached = result_cache.lookup(conn, (key for _, _, key in keyed))
+    # 评分可能需要数秒（调用大模型），先提交以释放刷新缓存使用时间时持有的行锁
+    conn.commit()
+    results = {}
+    # cache_key -> (题目, 作答原文, 相同作答的任务列表)
+    misses: Dict[str, tuple] = {}
+    for task, question, key in keyed:
+        hit = cached.get(key)
+        if hit is not None:
+            results[task.task_id] = TaskResult(task.task_id, hit.score, hit.needs_review, hit.detail, cached=True)
+        else:
+            misses.setdefault(key, (question, task.answer_text, []))[2].append(task)
+
+    new_entries = []
+    for key, scored in _score_subjective(misses).items():
+        question, answer_text, same_tasks = misses[key]
+        for i, task in enumerate(same_tasks):
+            # 同批内重复的作答只评分一次，其余视为命中
+            results[task.task_id] = TaskResult(
+                task.task_id, scored.score, scored.needs_review, scored.detail, scored.error, cached=i > 0
+            )
+        # 只缓存得出分数的结果；待复核或失败的作答下次重新评分
+        if scored.score is not None and scored.error is None:
+            new_entries.append({
+                "cache_key": key,
+                "question_id": question["id"],
+                "rubric_hash": fingerprints[question["id"]],
+                "answer_text": normalize_answer(answer_text),
+                "score": scored.score,
+                "needs_review": scored.needs_review,
+                "detail": scored.detail
+            })
+
+    result_cache.store(conn, new_entries)
+    return results
+
+
+def grade_tasks(conn, tasks: List) -> List[TaskResult]:
+    """
+    对一批阅卷任务评分
+
+    tasks中每项包含 task_id、exam_id、question_id、answer_text。选择、判断、填空题按考试分组，
+    由 ObjectiveScorer 一次性向量化评分；只有简答、计算等主观题进入较慢的评分路径。
+    尚无识别文本的任务标记为需要复核。
+    """
+    questions = load_questions(conn, {task.question_id for task in tasks})
+
+    results: Dict[int, TaskResult] = {}
+    objective: Dict[int, List] = {}
+    slow = []
+    for task in tasks:
+        question = questions.get(task.question_id)
+        if question is None:
+            results[task.task_id] = TaskResult(task.task_id, error=f"题目 {task.question_id} 不存在")
+        elif task.answer_text is None:
+            results[task.task_id] = TaskResult(task.task_id, needs_review=True, detail="缺少作答识别结果")
+        elif question["type"] in OBJECTIVE_TYPES:
+            objective.setdefault(task.exam_id, []).append(task)
+        else:
+            slow.append((task, question))
+
+    for exam_id, exam_tasks in objective.items():
+        scorer = get_exam_scorer(conn, exam_id, {t.question_id: questions[t.question_id] for t in exam_tasks})
+        scores, review = scorer.score([t.question_id for t in exam_tasks], [t.answer_text for t in exam_tasks])
+        for task, score, needs_review in zip(exam_tasks, scores.tolist(), review.tolist()):
+            results[task.task_id] = TaskResult(
+                task.task_id, score=score, needs_review=needs_review, detail="填空答案与参考答案相近，请复核" if needs_review else None
+            )
+
+    if slow:
+        fingerprints = {task.question_id: result_cache.rubric_fingerprint(q) for task, q in slow}
+        results.update(_grade_slow(conn, slow, fingerprints))
+    return [results[task.task_id] for task in tasks]
@@ -0,0 +1,110 @@
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import text, bindparam
+import hashlib
+import logging
+
+from backend.config import get_setting
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 阅卷结果缓存的最大条数，超出后按最近使用时间淘汰
+GRADING_CACHE_MAX_ENTRIES = get_setting("GRADING_CACHE_MAX_ENTRIES", 500000, int)
+# 是否启用阅卷结果缓存
+GRADING_CACHE_ENABLED = get_setting("GRADING_CACHE_ENABLED", True, bool)
+
+# 影响评分结果的题目字段；其中任一变化都会得到新的评分标准指纹
+RUBRIC_FIELDS = ("type", "score", "reference_answer", "scoring_rules")
+
+_SELECT_SQL = text("""
+    SELECT cache_key, score, needs_review, detail
+    FROM grading_result_cache WHERE cache_key IN :keys
+""").bindparams(bindparam("keys", expanding=True))
+
+_TOUCH_SQL = text("""
+    UPDATE grading_result_cache SET hit_count = hit_count + 1, last_used_at = NOW()
+    WHERE cache_key IN :keys
+""").bindparams(bindparam("keys", expanding=True))
+
+# 并发工作进程可能同时写入同一答案，重复时保留先写入的结果
+_INSERT_SQL = text("""
+    INSERT INTO grading_result_cache (cache_key, question_id, rubric_hash, answer_text, score, needs_review, detail)
+    VALUES (:cache_key, :question_id, :rubric_hash, :answer_text, :score, :needs_review, :detail)
+    ON DUPLICATE KEY UPDATE last_used_at = NOW()
+""")
+
+
+def rubric_fingerprint(question: dict) -> str:
+    """题目评分标准指纹：参考答案、评分规则以及题型和分值的哈希"""
+    digest = hashlib.sha256()
+    for field in RUBRIC_FIELDS:
+        value = question.get(field)
+        digest.update(("" if value is None else str(value)).encode("utf-8"))
+        digest.update(b"\x1f")
+    return digest.hexdigest()[:32]
+
+
+def cache_key(question_id: int, rubric_hash: str, normalized_answer: str) -> str:
+    return hashlib.sha256(f"{question_id}:{rubric_hash}:{normalized_answer}".encode("utf-8")).hexdigest()
+
+
+class CachedGrade:
+    """缓存中的评分结果"""
+
+    def __init__(self, score: Optional[float], needs_review: bool, detail: Optional[str]):
+        self.score = score
+        self.needs_review = needs_review
+        self.detail = detail
+
+
+def lookup(conn, keys: Iterable[str]) -> Dict[str, CachedGrade]:
+    """批量查询缓存，命中的条目同时刷新使用时间"""
+    keys = list(set(keys))
+    if not GRADING_CACHE_ENABLED or not keys:
+        return {}
+    found = {
+        row.cache_key: CachedGrade(
+            float(row.score) if row.score is not None else None, bool(row.needs_review), row.detail
+        )
+        for row in conn.execute(_SELECT_SQL, {"keys": keys})
+    }
+    if found:
+        conn.execute(_TOUCH_SQL, {"keys": sorted(found)})
+    return found
+
+
+def store(conn, entries: List[dict]):
+    """
+    批量写入评分结果
+
+    entries中每项包含 cache_key、question_id、rubric_hash、answer_text（规范化后）、
+    score、needs_review、detail。随调用方的事务一起提交。
+    """
+    if not GRADING_CACHE_ENABLED or not entries:
+        return
+    # 按主键排序写入，减少并发写入时的死锁
+    rows = sorted(
+        ({**entry, "answer_text": entry["answer_text"][:255]} for entry in entries),
+        key=lambda entry: entry["cache_key"]
+    )
+    conn.execute(_INSERT_SQL, rows)
+
+
+def invalidate_question(conn, question_id: int) -> int:
+    """删除题目的全部缓存结果（评分标准修改后调用），返回删除条数"""
+    return conn.execute(
+        text("DELETE FROM grading_result_cache WHERE question_id = :question_id"),
+        {"question_id": question_id}
+    ).rowcount
+
+
+def prune(conn, max_entries: int = GRADING_CACHE_MAX_ENTRIES) -> int:
+    """超过容量上限时删除最久未使用的条目，返回删除条数"""
+    total = conn.execute(text("SELECT COUNT(*) FROM grading_result_cache")).scalar()
+    excess = total - max_entries
+    if excess <= 0:
+        return 0
+    return conn.execute(
+        text("DELETE FROM grading_result_cache ORDER BY last_used_at LIMIT :excess"),
+        {"excess": excess}
+    ).rowcount
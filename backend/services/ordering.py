@@ -0,0 +1,192 @@
+from typing import Dict, List, Optional, Sequence
+from bisect import bisect_left
+from sqlalchemy import text
+import logging
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 相邻排序键之间的默认间隔，移动单个条目时可直接插入到间隔中，无需整体重排
+ORDER_GAP = 1024
+
+
+class OrderedList:
+    """考试内有序关联表的描述（exam_questions / exam_students）"""
+
+    def __init__(self, table: str, item_column: str, order_column: str, unique_order: bool, current_order_sql: str):
+        self.table = table
+        self.item_column = item_column
+        self.order_column = order_column
+        # 排序列是否有唯一约束（有则需两阶段更新，避免中途冲突）
+        self.unique_order = unique_order
+        # 按当前展示顺序查询 (item_id, sort_key)
+        self.current_order_sql = current_order_sql
+
+
+EXAM_QUESTIONS_ORDER = OrderedList(
+    table="exam_questions",
+    item_column="question_id",
+    order_column="question_order",
+    unique_order=True,
+    current_order_sql="""
+        SELECT question_id AS item_id, question_order AS sort_key
+        FROM exam_questions
+        WHERE exam_id = :exam_id
+        ORDER BY question_order
+    """
+)
+
+EXAM_STUDENTS_ORDER = OrderedList(
+    table="exam_students",
+    item_column="student_id",
+    order_column="sort_order",
+    unique_order=False,
+    current_order_sql="""
+        SELECT es.student_id AS item_id, es.sort_order AS sort_key
+        FROM exam_students es
+        JOIN students s ON s.student_id = es.student_id
+        WHERE es.exam_id = :exam_id
+        ORDER BY es.sort_order ASC, s.student_number ASC
+    """
+)
+
+
+def _longest_increasing_positions(keys: Sequence[int]) -> List[int]:
+    """返回严格递增子序列最长时所包含的下标（O(n log n)）"""
+    tails = []       # tails[k]: 长度为k+1的递增子序列的最小结尾键
+    tail_pos = []    # 对应结尾键所在下标
+    prev = [-1] * len(keys)
+    for i, key in enumerate(keys):
+        k = bisect_left(tails, key)
+        if k == len(tails):
+            tails.append(key)
+            tail_pos.append(i)
+        else:
+            tails[k] = key
+            tail_pos[k] = i
+        prev[i] = tail_pos[k - 1] if k > 0 else -1
+
+    positions = []
+    i = tail_pos[-1] if tail_pos else -1
+    while i != -1:
+        positions.append(i)
+        i = prev[i]
+    positions.reverse()
+    return positions
+
+
+def _fill_between(lower: Optional[int], upper: Optional[int], count: int) -> Optional[List[int]]:
+    """在(lower, upper)开区间内均匀生成count个正整数键，空间不足时返回None"""
+    if upper is None:
+        base = lower if lower is not None else 0
+        return [base + ORDER_GAP * (i + 1) for i in range(count)]
+    lower = lower if lower is not None else 0
+    step = (upper - lower) // (count + 1)
+    if step < 1:
+        return None
+    return [lower + step * (i + 1) for i in range(count)]
+
+
+def plan_reorder(current_keys: Dict[int, int], desired: Sequence[int]) -> Dict[int, int]:
+    """
+    计算将条目调整为desired顺序所需修改的最少排序键
+
+    保留排序键已处于最长递增子序列中的条目，其余条目插入到相邻保留条目的键间隔中；
+    间隔不足时整体按 ORDER_GAP 重新编号。返回 {item_id: new_key}，只包含需要修改的条目。
+    """
+    keys = [current_keys[item] for item in desired]
+    kept = set(_longest_increasing_positions(keys))
+
+    new_keys = list(keys)
+    i = 0
+    while i < len(desired):
+        if i in kept:
+            i += 1
+            continue
+        j = i
+        while j < len(desired) and j not in kept:
+            j += 1
+        lower = new_keys[i - 1] if i > 0 else None
+        upper = keys[j] if j < len(desired) else None
+        filled = _fill_between(lower, upper, j - i)
+        if filled is None:
+            # 间隔用尽，整体重排
+            new_keys = [ORDER_GAP * (k + 1) for k in range(len(desired))]
+            break
+        new_keys[i:j] = filled
+        i = j
+
+    return {item: key for item, key, old in zip(desired, new_keys, keys) if key != old}
+
+
+def load_current_order(conn, spec: OrderedList, exam_id: int) -> List[tuple]:
+    """按当前展示顺序读取 [(item_id, sort_key)]"""
+    return [(row.item_id, row.sort_key) for row in conn.execute(text(spec.current_order_sql), {"exam_id": exam_id})]
+
+
+def apply_order_changes(conn, spec: OrderedList, exam_id: int, changes: Dict[int, int]):
+    """用CASE语句一次性写入排序键变更"""
+    if not changes:
+        return
+
+    params = {"exam_id": exam_id}
+    cases = []
+    for n, (item, key) in enumerate(changes.items()):
+        params[f"item_{n}"] = item
+        params[f"key_{n}"] = key
+        cases.append(f"WHEN :item_{n} THEN :key_{n}")
+    item_params = ", ".join(f":item_{n}" for n in range(len(changes)))
+    case_sql = f"CASE {spec.item_column} {' '.join(cases)} END"
+    where_sql = f"WHERE exam_id = :exam_id AND {spec.item_column} IN ({item_params})"
+
+    if spec.unique_order:
+        # MySQL逐行检查唯一约束：先写入取反的临时值，再统一翻转为正值
+        conn.execute(text(f"UPDATE {spec.table} SET {spec.order_column} = -({case_sql}) {where_sql}"), params)
+        conn.execute(
+            text(f"UPDATE {spec.table} SET {spec.order_column} = -{spec.order_column} "
+                 f"WHERE exam_id = :exam_id AND {spec.order_column} < 0"),
+            {"exam_id": exam_id}
+        )
+    else:
+        conn.execute(text(f"UPDATE {spec.table} SET {spec.order_column} = {case_sql} {where_sql}"), params)
+
+
+def reorder_items(conn, spec: OrderedList, exam_id: int, item_ids: Sequence[int]) -> int:
+    """
+    按item_ids给出的顺序重排考试内条目，返回实际修改的行数
+
+    未出现在item_ids中的条目保持原有相对顺序排在末尾，不存在的ID会被忽略。
+    需在事务内调用。
+    """
+    current = load_current_order(conn, spec, exam_id)
+    current_keys = dict(current)
+
+    desired = []
+    seen = set()
+    for item in item_ids:
+        if item in current_keys and item not in seen:
+            desired.append(item)
+            seen.add(item)
+    desired.extend(item for item, _ in current if item not in seen)
+
+    changes = plan_reorder(current_keys, desired)
+    apply_order_changes(conn, spec, exam_id, changes)
+    return len(changes)
+
+
+def move_item_before(conn, spec: OrderedList, exam_id: int, item_id: int, before_id: Optional[int]) -> int:
+    """
+    将item_id移动到before_id之前（before_id为None时移动到末尾），返回实际修改的行数
+
+    条目不存在时抛出 KeyError。需在事务内调用。
+    """
+    order = [item for item, _ in load_current_order(conn, spec, exam_id)]
+    if item_id not in order:
+        raise KeyError(item_id)
+    if before_id is not None and before_id not in order:
+        raise KeyError(before_id)
+
+    order.remove(item_id)
+    position = order.index(before_id) if before_id is not None else len(order)
+    order.insert(position, item_id)
+    return reorder_items(conn, spec, exam_id, order)
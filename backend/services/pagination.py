@@ -0,0 +1,28 @@
+from datetime import datetime
+from fastapi import HTTPException
+import base64
+import json
+
+
+def encode_cursor(*values) -> str:
+    """将排序键编码为不透明的分页游标"""
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values], ensure_ascii=False)
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str, *types) -> list:
+    """
+    解析分页游标，types依次给出每个排序键的类型（int/float/str/datetime）
+
+    游标无效时抛出400错误。
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+        if len(values) != len(types):
+            raise ValueError("游标长度不匹配")
+        return [
+            datetime.fromisoformat(v) if t is datetime else t(v)
+            for v, t in zip(values, types)
+        ]
+    except Exception:
+        raise HTTPException(status_code=400, detail="无效的分页游标")
@@ -0,0 +1,315 @@
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from sqlalchemy import text, table, column, insert
+import io
+import logging
+import os
+import re
+import threading
+import docx
+import openpyxl
+import pandas as pd
+
+from backend.config import get_setting
+from backend.database import engine
+from backend.services.ordering import ORDER_GAP
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 题目字段分隔符
+SEPARATOR = "@@@"
+
+# 中文题型名称到内部类型的映射
+QUESTION_TYPE_MAP = {
+    "选择题": "choice", "选择": "choice",
+    "填空题": "fill_blank", "填空": "fill_blank",
+    "主观题": "essay", "简答题": "essay", "解答题": "essay", "问答题": "essay",
+    "计算题": "calculation", "计算": "calculation",
+    "判断题": "true_false", "判断": "true_false"
+}
+
+# 超过该大小的docx文件在进程池中解析，避免长时间占用API工作进程
+DOCX_PROCESS_THRESHOLD = get_setting("QUESTION_DOCX_PROCESS_THRESHOLD", 1024 * 1024, int)
+QUESTION_PARSE_WORKERS = get_setting("QUESTION_PARSE_WORKERS", min(4, os.cpu_count() or 1), int)
+
+# 每批写入的题目数量（一批一个事务）
+QUESTION_CHUNK_SIZE = 500
+
+_NON_NUMERIC_RE = re.compile(r'[^\d.]')
+
+_questions_table = table(
+    "questions",
+    column("type"), column("content"), column("score"), column("reference_answer"), column("scoring_rules")
+)
+
+_INSERT_EXAM_QUESTIONS_SQL = text("""
+    INSERT INTO exam_questions (exam_id, question_id, question_order)
+    VALUES (:exam_id, :question_id, :question_order)
+""")
+
+
+class QuestionParseError(ValueError):
+    """题目文件解析失败"""
+
+
+def normalize_question_type(raw_type: str) -> str:
+    """将题型名称转换为内部类型，未填写时默认为主观题"""
+    return QUESTION_TYPE_MAP.get(raw_type, raw_type if raw_type else "essay")
+
+
+def _build_question(q_type: str, content: str, score: float, reference_answer: str, scoring_rules: str) -> Optional[dict]:
+    if not content or score <= 0:
+        return None
+    return {
+        "question_type": normalize_question_type(q_type),
+        "content": content,
+        "score": score,
+        "reference_answer": reference_answer,
+        "scoring_rules": scoring_rules
+    }
+
+
+def parse_question_line(line: str) -> Optional[dict]:
+    """
+    解析一行 @@@ 分隔的题目
+
+    支持的格式（第一列序号会被忽略，题目按导入顺序追加）：
+    6列及以上：序号, 题型, 内容, 分值, 答案, 规则
+    5列：序号, 题型, 内容, 分值, 答案
+    4列：序号, 内容, 分值, 答案
+    """
+    parts = [p.strip() for p in line.split(SEPARATOR)]
+    if len(parts) < 4:
+        return None
+
+    q_type = ""
+    rules = ""
+    try:
+        if len(parts) >= 6:
+            q_type, content, raw_score, ref_answer, rules = parts[1:6]
+        elif len(parts) == 5:
+            q_type, content, raw_score, ref_answer = parts[1:5]
+        else:
+            content, raw_score, ref_answer = parts[1:4]
+        score = float(_NON_NUMERIC_RE.sub('', raw_score) or 0)
+    except ValueError:
+        return None
+
+    return _build_question(q_type, content, score, ref_answer, rules)
+
+
+# ==================== 各格式读取器 ====================
+
+def iter_docx_questions(fileobj: BinaryIO) -> Iterator[dict]:
+    """逐段解析Word文档，跳过包含图片或嵌入对象的段落"""
+    document = docx.Document(fileobj)
+    for para in document.paragraphs:
+        # 用元素查询判断是否含有图片/对象，避免序列化整个段落XML
+        if para._p.xpath('.//w:drawing | .//w:object'):
+            logger.info(f"跳过包含图片的段落: {para.text[:20]}...")
+            continue
+
+        text_content = para.text.strip()
+        if not text_content:
+            continue
+
+        question = parse_question_line(text_content)
+        if question:
+            yield question
+
+
+def iter_text_questions(fileobj: BinaryIO) -> Iterator[dict]:
+    """逐行解析txt/csv文件"""
+    for raw_line in fileobj:
+        line = raw_line.decode("utf-8").lstrip("\ufeff").strip()
+        if not line:
+            continue
+        question = parse_question_line(line)
+        if question:
+            yield question
+
+
+def _cell_str(value) -> str:
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return ""
+    return str(value)
+
+
+def _question_from_excel_row(row: tuple) -> Optional[dict]:
+    """Excel列顺序：序号, 题型, 内容, 分值, 答案, 规则"""
+    row = tuple(row) + (None,) * (6 - len(row))
+    _, raw_type, content, raw_score, ref_answer, rules = row[:6]
+    if _cell_str(content) == "" or _cell_str(raw_score) == "":
+        return None
+    try:
+        score = float(raw_score)
+    except (TypeError, ValueError):
+        return None
+    return _build_question(_cell_str(raw_type), _cell_str(content), score, _cell_str(ref_answer), _cell_str(rules))
+
+
+def iter_xlsx_questions(fileobj: BinaryIO) -> Iterator[dict]:
+    """以只读模式流式读取xlsx第一个工作表（首行为表头）"""
+    workbook = openpyxl.load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        for row in workbook.worksheets[0].iter_rows(min_row=2, max_col=6, values_only=True):
+            question = _question_from_excel_row(row)
+            if question:
+                yield question
+    finally:
+        workbook.close()
+
+
+def iter_xls_questions(fileobj: BinaryIO) -> Iterator[dict]:
+    """读取xls文件（旧格式不支持流式读取）"""
+    df = pd.read_excel(fileobj, dtype=object)
+    for row in df.itertuples(index=False, name=None):
+        question = _question_from_excel_row(row)
+        if question:
+            yield question
+
+
+# 文件扩展名 -> 读取器，新增格式时注册到这里即可
+QUESTION_READERS: Dict[str, Callable[[BinaryIO], Iterator[dict]]] = {
+    ".docx": iter_docx_questions,
+    ".xlsx": iter_xlsx_questions,
+    ".xls": iter_xls_questions,
+    ".txt": iter_text_questions,
+    ".csv": iter_text_questions,
+}
+
+
+def register_question_reader(file_ext: str, reader: Callable[[BinaryIO], Iterator[dict]]):
+    """注册新的题目文件读取器"""
+    QUESTION_READERS[file_ext.lower()] = reader
+
+
+def is_supported_question_file(file_ext: str) -> bool:
+    return file_ext.lower() in QUESTION_READERS
+
+
+def iter_questions(file_ext: str, fileobj: BinaryIO) -> Iterator[dict]:
+    """按文件类型逐条产出解析后的题目，解析失败时抛出 QuestionParseError"""
+    reader = QUESTION_READERS.get(file_ext.lower())
+    if reader is None:
+        raise QuestionParseError(f"不支持的文件格式: {file_ext}")
+    try:
+        yield from reader(fileobj)
+    except Exception as e:
+        raise QuestionParseError(str(e)) from e
+
+
+# ==================== 大文件进程池解析 ====================
+
+_parse_pool = None
+_parse_pool_lock = threading.Lock()
+
+
+def _get_parse_pool() -> ProcessPoolExecutor:
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is None:
+            _parse_pool = ProcessPoolExecutor(max_workers=QUESTION_PARSE_WORKERS)
+        return _parse_pool
+
+
+def _parse_docx_bytes(content: bytes) -> List[dict]:
+    """进程池任务：解析整个docx文件"""
+    return list(iter_questions(".docx", io.BytesIO(content)))
+
+
+def _file_size(fileobj: BinaryIO) -> int:
+    position = fileobj.tell()
+    fileobj.seek(0, os.SEEK_END)
+    size = fileobj.tell()
+    fileobj.seek(position)
+    return size
+
+
+def iter_question_file(file_ext: str, fileobj: BinaryIO) -> Iterator[dict]:
+    """
+    解析上传的题目文件
+
+    大于 DOCX_PROCESS_THRESHOLD 的docx在独立进程中解析，其余格式在当前线程中逐条解析。
+    """
+    file_ext = file_ext.lower()
+    if file_ext == ".docx" and _file_size(fileobj) > DOCX_PROCESS_THRESHOLD:
+        future = _get_parse_pool().submit(_parse_docx_bytes, fileobj.read())
+        yield from future.result()
+    else:
+        yield from iter_questions(file_ext, fileobj)
+
+
+def shutdown_parse_pool():
+    """关闭解析进程池"""
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is not None:
+            _parse_pool.shutdown(wait=False, cancel_futures=True)
+            _parse_pool = None
+
+
+# ==================== 批量写入 ====================
+
+def lock_next_question_order(conn, exam_id: int) -> int:
+    """
+    锁定考试行并返回追加到末尾时使用的题号
+
+    需在事务内调用：对 exams 行加排他锁，使同一考试的并发写入按顺序分配 question_order，
+    避免 unique_exam_order 冲突。题号之间保留 ORDER_GAP 间隔，便于之后移动题目。
+    """
+    conn.execute(text("SELECT exam_id FROM exams WHERE exam_id = :exam_id FOR UPDATE"), {"exam_id": exam_id})
+    max_order = conn.execute(
+        text("SELECT MAX(question_order) FROM exam_questions WHERE exam_id = :exam_id"),
+        {"exam_id": exam_id}
+    ).scalar()
+    return (max_order or 0) + ORDER_GAP
+
+
+def _insert_question_chunk(conn, exam_id: int, chunk: List[dict], id_step: int) -> int:
+    next_order = lock_next_question_order(conn, exam_id)
+
+    # 单条多行INSERT：InnoDB为同一条语句分配连续的自增ID，可由首个ID推算出全部ID
+    result = conn.execute(insert(_questions_table).values([
+        {
+            "type": q["question_type"],
+            "content": q["content"],
+            "score": q["score"],
+            "reference_answer": q["reference_answer"],
+            "scoring_rules": q["scoring_rules"]
+        }
+        for q in chunk
+    ]))
+    first_id = result.lastrowid
+
+    conn.execute(_INSERT_EXAM_QUESTIONS_SQL, [
+        {"exam_id": exam_id, "question_id": first_id + i * id_step, "question_order": next_order + i * ORDER_GAP}
+        for i in range(len(chunk))
+    ])
+    return len(chunk)
+
+
+def bulk_insert_exam_questions(exam_id: int, questions: Iterable[dict], chunk_size: int = QUESTION_CHUNK_SIZE) -> int:
+    """
+    批量写入题目并按顺序追加到考试末尾
+
+    每批一个事务：题目用一条多行INSERT写入，考试关联用executemany写入。
+    返回写入的题目数量。
+    """
+    imported_count = 0
+    iterator = iter(questions)
+
+    with engine.connect() as conn:
+        id_step = conn.execute(text("SELECT @@auto_increment_increment")).scalar() or 1
+        conn.commit()
+
+        while True:
+            chunk = list(islice(iterator, chunk_size))
+            if not chunk:
+                break
+            with conn.begin():
+                imported_count += _insert_question_chunk(conn, exam_id, chunk, id_step)
+
+    return imported_count
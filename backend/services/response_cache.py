@@ -0,0 +1,155 @@
+from typing import Callable, Optional, Sequence, Tuple
+from collections import OrderedDict
+from fastapi import Request, Response
+import hashlib
+import logging
+import threading
+import uuid
+
+from backend.config import get_setting
+from backend.services.serialization import dumps
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 进程内缓存的响应条数上限
+RESPONSE_CACHE_SIZE = get_setting("RESPONSE_CACHE_SIZE", 512, int)
+# 共享版本号后端（如 redis://localhost:6379/0）；多进程部署时必须配置，否则各进程的版本号互不可见
+RESPONSE_CACHE_REDIS_URL = get_setting("RESPONSE_CACHE_REDIS_URL", "")
+
+# 版本号作用域：写操作提交后递增对应作用域，读接口以所依赖作用域的版本号作为缓存键和ETag
+EXAMS_SCOPE = "exams"          # 考试列表（含学生人数）
+STUDENTS_SCOPE = "students"    # 全局学生库
+QUESTIONS_SCOPE = "questions"  # 全局题库
+
+
+def exam_scope(exam_id: int) -> str:
+    """单个考试的题目/学生关联"""
+    return f"exam:{exam_id}"
+
+
+class LocalVersionStore:
+    """进程内版本号存储（仅适用于单进程部署）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions = {}
+        # 每次启动使用新的纪元，避免重启后版本号归零与客户端旧ETag重合
+        self.epoch = uuid.uuid4().hex[:8]
+
+    def get_many(self, scopes: Sequence[str]) -> Tuple[int, ...]:
+        with self._lock:
+            return tuple(self._versions.get(scope, 0) for scope in scopes)
+
+    def bump(self, *scopes: str):
+        with self._lock:
+            for scope in scopes:
+                self._versions[scope] = self._versions.get(scope, 0) + 1
+
+
+class RedisVersionStore:
+    """基于Redis的共享版本号存储，多个工作进程共用同一组版本号"""
+
+    KEY_PREFIX = "exam_platform:version:"
+
+    def __init__(self, url: str):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("配置了 RESPONSE_CACHE_REDIS_URL，但未安装 redis 包") from e
+        self._client = redis.Redis.from_url(url)
+        # 纪元写入Redis，Redis数据被清空后会生成新的纪元
+        epoch_key = self.KEY_PREFIX + "epoch"
+        self._client.set(epoch_key, uuid.uuid4().hex[:8], nx=True)
+        self.epoch = self._client.get(epoch_key).decode()
+
+    def get_many(self, scopes: Sequence[str]) -> Tuple[int, ...]:
+        values = self._client.mget([self.KEY_PREFIX + scope for scope in scopes])
+        return tuple(int(v) if v is not None else 0 for v in values)
+
+    def bump(self, *scopes: str):
+        pipe = self._client.pipeline(transaction=False)
+        for scope in scopes:
+            pipe.incr(self.KEY_PREFIX + scope)
+        pipe.execute()
+
+
+class LRUCache:
+    """线程安全的LRU缓存"""
+
+    def __init__(self, max_entries: int):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.max_entries = max_entries
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+version_store = RedisVersionStore(RESPONSE_CACHE_REDIS_URL) if RESPONSE_CACHE_REDIS_URL else LocalVersionStore()
+response_cache = LRUCache(RESPONSE_CACHE_SIZE)
+
+
+def bump_versions(*scopes: str):
+    """写操作提交后调用，使依赖这些作用域的缓存响应和ETag失效"""
+    try:
+        version_store.bump(*scopes)
+    except Exception as e:
+        logger.error(f"更新缓存版本号失败: {str(e)}")
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or etag in tags
+
+
+def request_cache_key(request: Request) -> str:
+    """由请求路径和排序后的查询参数生成缓存键"""
+    return f"{request.url.path}?{sorted(request.query_params.multi_items())}"
+
+
+def cached_json_response(request: Request, scopes: Sequence[str], build: Callable[[], dict],
+                         key: Optional[str] = None) -> Response:
+    """
+    按作用域版本号缓存JSON响应
+
+    key默认取请求路径和查询参数。ETag由缓存键和版本号生成：客户端带If-None-Match且版本未变时直接返回304，不访问数据库；
+    否则优先使用进程内缓存的响应体，未命中时调用build生成并缓存。
+    build中抛出的异常（如404）原样向上传递，不会被缓存。
+    """
+    try:
+        versions = version_store.get_many(scopes)
+    except Exception as e:
+        # 版本号后端不可用时不使用缓存
+        logger.error(f"读取缓存版本号失败: {str(e)}")
+        body = dumps(build())
+        return Response(content=body, media_type="application/json")
+
+    key = key or request_cache_key(request)
+    digest = hashlib.sha1(f"{key}|{versions}".encode()).hexdigest()[:16]
+    etag = f'W/"{version_store.epoch}-{digest}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    cache_key = (key, versions)
+    body: Optional[bytes] = response_cache.get(cache_key)
+    if body is None:
+        body = dumps(build())
+        response_cache.put(cache_key, body)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,236 @@
+from typing import List, Optional
+import math
+import time
+import numpy as np
+from sqlalchemy import text
+
+from backend.config import get_setting
+from backend.services.response_cache import LRUCache
+from backend.services.score_summary import get_score_version
+
+# 进程内缓存的分析结果条数（按考试和成绩版本号缓存，有新得分时自动失效）
+SCORE_ANALYTICS_CACHE_SIZE = get_setting("SCORE_ANALYTICS_CACHE_SIZE", 32, int)
+# 总分分布直方图的默认分段数
+SCORE_HISTOGRAM_BINS = get_setting("SCORE_HISTOGRAM_BINS", 10, int)
+
+PERCENTILES = (10, 25, 50, 75, 90)
+# 区分度按总分最高、最低各27%的学生分组计算
+DISCRIMINATION_GROUP_RATIO = 0.27
+
+
+class ScoreMatrix:
+    """
+    一场考试的成绩矩阵（学生×题目）
+
+    scores中未评分的格为NaN；学生按student_id排序，题目按考试内顺序排列，
+    class_codes为学生所属班级在class_names中的下标。
+    """
+
+    def __init__(self, student_ids: np.ndarray, class_codes: np.ndarray, class_names: List[Optional[str]],
+                 question_ids: np.ndarray, full_scores: np.ndarray, scores: np.ndarray):
+        self.student_ids = student_ids
+        self.class_codes = class_codes
+        self.class_names = class_names
+        self.question_ids = question_ids
+        self.full_scores = full_scores
+        self.scores = scores
+
+
+def load_matrix(conn, exam_id: int) -> ScoreMatrix:
+    """一次性读取考试的全部单题得分，组装为成绩矩阵（只包含已有得分的学生）"""
+    questions = conn.execute(text("""
+        SELECT eq.question_id, q.score
+        FROM exam_questions eq
+        JOIN questions q ON q.id = eq.question_id
+        WHERE eq.exam_id = :exam_id
+        ORDER BY eq.question_order, eq.question_id
+    """), {"exam_id": exam_id}).fetchall()
+    students = conn.execute(text("""
+        SELECT student_id, class_name FROM exam_student_totals WHERE exam_id = :exam_id ORDER BY student_id
+    """), {"exam_id": exam_id}).fetchall()
+    results = conn.execute(text("""
+        SELECT student_id, question_id, score FROM exam_question_results
+        WHERE exam_id = :exam_id AND score IS NOT NULL
+    """), {"exam_id": exam_id}).fetchall()
+
+    question_ids = np.array([row.question_id for row in questions], dtype=np.int64)
+    student_ids = np.array([row.student_id for row in students], dtype=np.int64)
+    class_names = sorted({row.class_name for row in students}, key=lambda name: (name is None, name or ""))
+    class_index = {name: i for i, name in enumerate(class_names)}
+
+    scores = np.full((len(student_ids), len(question_ids)), np.nan)
+    if len(results) and len(student_ids) and len(question_ids):
+        data = np.array([(row.student_id, row.question_id, float(row.score)) for row in results], dtype=np.float64)
+        # 题目按ID排序后二分定位列号，学生已按ID排序直接二分定位行号
+        id_order = np.argsort(question_ids)
+        sorted_qids = question_ids[id_order]
+        sids, qids = data[:, 0].astype(np.int64), data[:, 1].astype(np.int64)
+        rows = np.searchsorted(student_ids, sids)
+        cols = np.searchsorted(sorted_qids, qids)
+        # 已移出考试的题目/学生不计入
+        valid = (rows < len(student_ids)) & (cols < len(sorted_qids))
+        valid[valid] &= (student_ids[rows[valid]] == sids[valid]) & (sorted_qids[cols[valid]] == qids[valid])
+        scores[rows[valid], id_order[cols[valid]]] = data[valid, 2]
+
+    return ScoreMatrix(
+        student_ids=student_ids,
+        class_codes=np.array([class_index[row.class_name] for row in students], dtype=np.int64),
+        class_names=class_names,
+        question_ids=question_ids,
+        full_scores=np.array([float(row.score or 0) for row in questions], dtype=np.float64),
+        scores=scores
+    )
+
+
+def _num(value, digits: int = 4):
+    """numpy数值转为JSON可用的浮点数，NaN/无穷转为None"""
+    value = float(value)
+    return round(value, digits) if math.isfinite(value) else None
+
+
+def _nums(values: np.ndarray, digits: int = 4) -> list:
+    return [_num(v, digits) for v in values]
+
+
+def compute_statistics(matrix: ScoreMatrix, bins: int = SCORE_HISTOGRAM_BINS) -> dict:
+    """
+    向量化计算考试的全部统计量
+
+    - summary：人数、满分、平均分、标准差、最高/最低分、百分位数
+    - histogram：总分分布（0~满分等宽分段，最后一段包含满分）
+    - classes：各班人数、平均分、标准差、最高/最低分
+    - questions：按考试内顺序排列，position从1开始；各题平均分、难度（得分率，越高越容易）、区分度（高低分组得分率之差）、
+      题目与其余题总分的相关系数（校正后的题总相关）
+    """
+    scores = matrix.scores
+    students, question_count = scores.shape
+    graded = ~np.isnan(scores)
+    filled = np.where(graded, scores, 0.0)
+    totals = filled.sum(axis=1)
+    full_total = float(matrix.full_scores.sum())
+
+    summary = {
+        "student_count": students,
+        "question_count": question_count,
+        "full_score": _num(full_total, 2),
+        "mean": None, "std": None, "max": None, "min": None,
+        "percentiles": {f"p{p}": None for p in PERCENTILES}
+    }
+    histogram = {"edges": [], "counts": []}
+    if students:
+        summary.update({
+            "mean": _num(totals.mean()), "std": _num(totals.std()),
+            "max": _num(totals.max(), 2), "min": _num(totals.min(), 2),
+            "percentiles": dict(zip((f"p{p}" for p in PERCENTILES), _nums(np.percentile(totals, PERCENTILES))))
+        })
+        top = full_total if full_total > 0 else float(totals.max()) or 1.0
+        edges = np.linspace(0.0, top, bins + 1)
+        counts, _ = np.histogram(np.clip(totals, 0.0, top), bins=edges)
+        histogram = {"edges": _nums(edges, 2), "counts": counts.tolist()}
+
+    # 班级统计：bincount按班级编码一次性求和
+    class_count = len(matrix.class_names)
+    class_sizes = np.bincount(matrix.class_codes, minlength=class_count)
+    class_sums = np.bincount(matrix.class_codes, weights=totals, minlength=class_count)
+    class_squares = np.bincount(matrix.class_codes, weights=totals * totals, minlength=class_count)
+    class_max = np.full(class_count, -np.inf)
+    class_min = np.full(class_count, np.inf)
+    np.maximum.at(class_max, matrix.class_codes, totals)
+    np.minimum.at(class_min, matrix.class_codes, totals)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        class_means = class_sums / class_sizes
+        class_std = np.sqrt(np.maximum(class_squares / class_sizes - class_means ** 2, 0.0))
+    classes = [
+        {"class_name": name, "student_count": int(class_sizes[i]), "mean": _num(class_means[i]),
+         "std": _num(class_std[i]), "max": _num(class_max[i], 2), "min": _num(class_min[i], 2)}
+        for i, name in enumerate(matrix.class_names)
+    ]
+
+    # 题目统计
+    graded_counts = graded.sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = filled.sum(axis=0) / graded_counts
+        difficulty = means / matrix.full_scores
+
+        # 高低分组：按总分排序后取两端各27%
+        group = max(1, int(round(students * DISCRIMINATION_GROUP_RATIO))) if students else 0
+        order = np.argsort(totals, kind="stable")
+        lower = filled[order[:group]].mean(axis=0) if group else np.full(question_count, np.nan)
+        upper = filled[order[students - group:]].mean(axis=0) if group else np.full(question_count, np.nan)
+        discrimination = (upper - lower) / matrix.full_scores
+
+        # 校正后的题总相关：题目得分与去掉该题后总分的Pearson相关系数
+        rest = totals[:, None] - filled
+        item_centered = filled - filled.mean(axis=0)
+        rest_centered = rest - rest.mean(axis=0)
+        correlation = (item_centered * rest_centered).sum(axis=0) / np.sqrt(
+            (item_centered ** 2).sum(axis=0) * (rest_centered ** 2).sum(axis=0)
+        )
+
+    questions = [
+        {"question_id": int(matrix.question_ids[j]), "position": j + 1,
+         "full_score": _num(matrix.full_scores[j], 2), "graded_count": int(graded_counts[j]),
+         "mean": _num(means[j]), "difficulty": _num(difficulty[j]),
+         "discrimination": _num(discrimination[j]), "item_rest_correlation": _num(correlation[j])}
+        for j in range(question_count)
+    ]
+
+    return {"summary": summary, "histogram": histogram, "classes": classes, "questions": questions}
+
+
+analytics_cache = LRUCache(SCORE_ANALYTICS_CACHE_SIZE)
+
+
+def get_exam_analytics(conn, exam_id: int, bins: int = SCORE_HISTOGRAM_BINS) -> dict:
+    """
+    获取考试成绩分析
+
+    以 (考试, 成绩版本号, 分段数) 为键缓存：每次请求只查询一次版本号，
+    阅卷写入新得分后版本号递增，下次请求才重新加载成绩矩阵并计算。
+    """
+    version = get_score_version(conn, exam_id)
+    key = (exam_id, version, bins)
+    result = analytics_cache.get(key)
+    if result is None:
+        result = {"version": version, **compute_statistics(load_matrix(conn, exam_id), bins)}
+        analytics_cache.put(key, result)
+    return result
+
+
+def synthetic_matrix(students: int = 5000, questions: int = 50, classes: int = 20, seed: int = 0) -> ScoreMatrix:
+    """按学生能力和题目难度生成模拟成绩矩阵（约1%未评分），用于基准测试"""
+    rng = np.random.default_rng(seed)
+    full_scores = rng.choice([2.0, 3.0, 5.0, 10.0], size=questions)
+    ability = rng.normal(0.0, 1.0, size=(students, 1))
+    difficulty = rng.normal(0.0, 1.0, size=(1, questions))
+    probability = 1.0 / (1.0 + np.exp(-(ability - difficulty)))
+    scores = np.round(probability * full_scores * 2 + rng.normal(0.0, 0.5, size=(students, questions))) / 2
+    scores = np.clip(scores, 0.0, full_scores)
+    scores[rng.random(size=scores.shape) < 0.01] = np.nan
+    return ScoreMatrix(
+        student_ids=np.arange(1, students + 1, dtype=np.int64),
+        class_codes=rng.integers(0, classes, size=students),
+        class_names=[f"{i + 1}班" for i in range(classes)],
+        question_ids=np.arange(1, questions + 1, dtype=np.int64),
+        full_scores=full_scores,
+        scores=scores
+    )
+
+
+def benchmark(students: int = 5000, questions: int = 50, repeat: int = 20) -> dict:
+    """测量compute_statistics在模拟矩阵上的平均耗时（不含数据库读取）"""
+    matrix = synthetic_matrix(students, questions)
+    compute_statistics(matrix)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        compute_statistics(matrix)
+    return {
+        "students": students,
+        "questions": questions,
+        "milliseconds": round((time.perf_counter() - start) / repeat * 1000, 2)
+    }
+
+
+if __name__ == "__main__":
+    # 基准测试：python -m backend.services.score_analytics
+    print(benchmark())
@@ -0,0 +1,146 @@
+from typing import Iterable, Iterator, List, Optional, Sequence
+from decimal import Decimal
+from urllib.parse import quote
+from fastapi.responses import StreamingResponse
+from sqlalchemy import text, bindparam
+import csv
+import io
+import logging
+import tempfile
+import openpyxl
+
+from backend.config import get_setting
+from backend.database import engine
+from backend.services.score_summary import list_student_scores
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 每批从数据库读取的学生数（按总分索引游标分页，每批使用独立的短连接）
+SCORE_EXPORT_BATCH_SIZE = get_setting("SCORE_EXPORT_BATCH_SIZE", 1000, int)
+# 输出缓冲区大小，攒够后再写给客户端
+_CHUNK_BYTES = 64 * 1024
+
+XLSX_FORMAT = "xlsx"
+CSV_FORMAT = "csv"
+EXPORT_FORMAT_PATTERN = f"^({XLSX_FORMAT}|{CSV_FORMAT})$"
+_MEDIA_TYPES = {
+    XLSX_FORMAT: "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    CSV_FORMAT: "text/csv; charset=utf-8"
+}
+
+EXPORT_HEADER = ["排名", "学号", "姓名", "班级", "总分", "已评分题数", "待复核题数"]
+
+_SELECT_BREAKDOWN_SQL = text("""
+    SELECT student_id, question_id, score FROM exam_question_results
+    WHERE exam_id = :exam_id AND student_id IN :student_ids
+""").bindparams(bindparam("student_ids", expanding=True))
+
+
+def list_export_questions(conn, exam_id: int) -> List[tuple]:
+    """按考试内顺序读取题目，用于逐题得分列"""
+    return conn.execute(text("""
+        SELECT eq.question_id, eq.question_order, q.score
+        FROM exam_questions eq
+        JOIN questions q ON q.id = eq.question_id
+        WHERE eq.exam_id = :exam_id
+        ORDER BY eq.question_order, eq.question_id
+    """), {"exam_id": exam_id}).fetchall()
+
+
+def _cell(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def iter_score_rows(exam_id: int, class_name: Optional[str] = None, question_ids: Sequence[int] = (),
+                    batch_size: int = SCORE_EXPORT_BATCH_SIZE) -> Iterator[list]:
+    """
+    按总分从高到低逐行产出导出数据
+
+    每批学生单独取连接读取后立即归还，客户端下载较慢时不会长时间占用连接；
+    给出question_ids时每行末尾依次追加这些题目的得分（未评分为空）。
+    """
+    cursor = None
+    while True:
+        with engine.connect() as conn:
+            rows, has_more = list_student_scores(conn, exam_id, class_name, cursor, batch_size)
+            breakdown = {}
+            if question_ids and rows:
+                breakdown = {
+                    (r.student_id, r.question_id): r.score
+                    for r in conn.execute(_SELECT_BREAKDOWN_SQL, {
+                        "exam_id": exam_id, "student_ids": [row.student_id for row in rows]
+                    })
+                }
+
+        for row in rows:
+            values = [
+                row.rank, row.student_number, row.name, row.class_name,
+                _cell(row.total_score), row.graded_count, row.review_count
+            ]
+            values.extend(_cell(breakdown.get((row.student_id, qid))) for qid in question_ids)
+            yield values
+
+        if not has_more:
+            return
+        cursor = (rows[-1].total_score, rows[-1].student_id)
+
+
+def stream_csv(header: Sequence[str], rows: Iterable[Sequence]) -> Iterator[bytes]:
+    """逐行编码CSV（带BOM，Excel可直接识别UTF-8中文），缓冲区满后输出"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write("\ufeff")
+    writer.writerow(header)
+    for values in rows:
+        writer.writerow(["" if v is None else v for v in values])
+        if buffer.tell() >= _CHUNK_BYTES:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+
+def stream_xlsx(header: Sequence[str], rows: Iterable[Sequence], sheet_title: str = "成绩") -> Iterator[bytes]:
+    """
+    以openpyxl只写模式生成xlsx
+
+    只写模式下行数据随写随落到临时文件，内存占用与行数无关；xlsx是zip格式，
+    需在全部行写完后打包，因此打包完成后才开始分块输出。
+    """
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet(sheet_title)
+    sheet.append(list(header))
+    for values in rows:
+        sheet.append(list(values))
+    with tempfile.TemporaryFile() as output:
+        workbook.save(output)
+        output.seek(0)
+        while True:
+            chunk = output.read(_CHUNK_BYTES)
+            if not chunk:
+                return
+            yield chunk
+
+
+def export_scores_response(exam_id: int, file_format: str, questions: Sequence = (),
+                           class_name: Optional[str] = None) -> StreamingResponse:
+    """
+    构造成绩导出的流式响应
+
+    questions为 list_export_questions() 的结果时按题追加得分列，为空时只导出总分。
+    """
+    header = list(EXPORT_HEADER)
+    # question_order为间隔排序键，列名按题目在考试中的位置编号
+    header.extend(f"第{position}题({float(q.score or 0):g}分)" for position, q in enumerate(questions, 1))
+    rows = iter_score_rows(exam_id, class_name, [q.question_id for q in questions])
+    body = stream_xlsx(header, rows) if file_format == XLSX_FORMAT else stream_csv(header, rows)
+
+    filename = f"exam_{exam_id}_scores.{file_format}"
+    if class_name:
+        filename = f"exam_{exam_id}_{class_name}_scores.{file_format}"
+    return StreamingResponse(body, media_type=_MEDIA_TYPES[file_format], headers={
+        "Content-Disposition": f"attachment; filename*=UTF-8''{quote(filename)}"
+    })
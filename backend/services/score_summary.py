@@ -0,0 +1,330 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+from collections import namedtuple
+from decimal import Decimal
+from sqlalchemy import text, bindparam
+import logging
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+_ZERO = Decimal("0")
+
+_SELECT_EXISTING_SQL = text("""
+    SELECT student_id, question_id, score, needs_review
+    FROM exam_question_results
+    WHERE exam_id = :exam_id AND student_id IN :student_ids AND question_id IN :question_ids
+    FOR UPDATE
+""").bindparams(bindparam("student_ids", expanding=True), bindparam("question_ids", expanding=True))
+
+_UPSERT_RESULT_SQL = text("""
+    INSERT INTO exam_question_results (exam_id, student_id, question_id, task_id, score, needs_review)
+    VALUES (:exam_id, :student_id, :question_id, :task_id, :score, :needs_review)
+    ON DUPLICATE KEY UPDATE task_id = VALUES(task_id), score = VALUES(score), needs_review = VALUES(needs_review)
+""")
+
+_SELECT_CLASSES_SQL = text("""
+    SELECT student_id, class AS class_name FROM students WHERE student_id IN :student_ids
+""").bindparams(bindparam("student_ids", expanding=True))
+
+# 总分和统计按差值累加，并发写入不同题目的结果时互不覆盖
+_APPLY_TOTALS_SQL = text("""
+    INSERT INTO exam_student_totals (exam_id, student_id, class_name, total_score, graded_count, review_count)
+    VALUES (:exam_id, :student_id, :class_name, :score, :graded, :review)
+    ON DUPLICATE KEY UPDATE
+        total_score = total_score + VALUES(total_score),
+        graded_count = graded_count + VALUES(graded_count),
+        review_count = review_count + VALUES(review_count)
+""")
+
+_APPLY_QUESTION_STATS_SQL = text("""
+    INSERT INTO exam_question_stats (exam_id, question_id, score_sum, graded_count, review_count)
+    VALUES (:exam_id, :question_id, :score, :graded, :review)
+    ON DUPLICATE KEY UPDATE
+        score_sum = score_sum + VALUES(score_sum),
+        graded_count = graded_count + VALUES(graded_count),
+        review_count = review_count + VALUES(review_count)
+""")
+
+# 考试成绩版本号：单题得分、班级或题目满分变化时递增，成绩分析等派生数据以此判断是否过期
+_BUMP_VERSION_SQL = text("""
+    INSERT INTO exam_score_versions (exam_id, version) VALUES (:exam_id, 1)
+    ON DUPLICATE KEY UPDATE version = version + 1
+""")
+
+
+def _dec(value) -> Decimal:
+    if value is None:
+        return _ZERO
+    return value if isinstance(value, Decimal) else Decimal(str(round(float(value), 2)))
+
+
+class _Delta:
+    """一个学生（或一道题）上得分、已评分数、待复核数的变化量"""
+
+    __slots__ = ("score", "graded", "review")
+
+    def __init__(self):
+        self.score = _ZERO
+        self.graded = 0
+        self.review = 0
+
+    def add(self, score, needs_review: bool, sign: int):
+        self.score += sign * _dec(score)
+        self.graded += sign * (score is not None)
+        self.review += sign * bool(needs_review)
+
+
+def _apply_deltas(conn, exam_id: int, totals: Dict[int, _Delta], stats: Dict[int, _Delta]):
+    totals = {sid: d for sid, d in totals.items() if d.score or d.graded or d.review}
+    stats = {qid: d for qid, d in stats.items() if d.score or d.graded or d.review}
+    if totals:
+        classes = {
+            row.student_id: row.class_name
+            for row in conn.execute(_SELECT_CLASSES_SQL, {"student_ids": sorted(totals)})
+        }
+        # 按主键顺序写入，减少并发事务间的死锁
+        conn.execute(_APPLY_TOTALS_SQL, [
+            {"exam_id": exam_id, "student_id": sid, "class_name": classes.get(sid),
+             "score": d.score, "graded": d.graded, "review": d.review}
+            for sid, d in sorted(totals.items())
+        ])
+    if stats:
+        conn.execute(_APPLY_QUESTION_STATS_SQL, [
+            {"exam_id": exam_id, "question_id": qid, "score": d.score, "graded": d.graded, "review": d.review}
+            for qid, d in sorted(stats.items())
+        ])
+
+
+def apply_results(conn, results: Iterable[dict]) -> int:
+    """
+    写入（或覆盖）学生单题得分，并增量更新学生总分和题目统计
+
+    results中每项包含 exam_id、student_id、question_id、task_id、score（None表示待复核、尚无分数）、
+    needs_review。已有结果（如重新阅卷）按新旧差值调整汇总。由调用方提交事务，返回写入条数。
+    """
+    by_exam: Dict[int, Dict[Tuple[int, int], dict]] = {}
+    for result in results:
+        # 同一批中同一学生同一题只保留最后一条
+        by_exam.setdefault(result["exam_id"], {})[(result["student_id"], result["question_id"])] = result
+
+    written = 0
+    for exam_id, latest in sorted(by_exam.items()):
+        existing = {
+            (row.student_id, row.question_id): row
+            for row in conn.execute(_SELECT_EXISTING_SQL, {
+                "exam_id": exam_id,
+                "student_ids": sorted({sid for sid, _ in latest}),
+                "question_ids": sorted({qid for _, qid in latest})
+            })
+        }
+
+        totals: Dict[int, _Delta] = {}
+        stats: Dict[int, _Delta] = {}
+        for (student_id, question_id), result in latest.items():
+            old = existing.get((student_id, question_id))
+            for delta in (totals.setdefault(student_id, _Delta()), stats.setdefault(question_id, _Delta())):
+                delta.add(result["score"], result["needs_review"], 1)
+                if old is not None:
+                    delta.add(old.score, old.needs_review, -1)
+
+        conn.execute(_UPSERT_RESULT_SQL, [
+            {"exam_id": exam_id, "student_id": sid, "question_id": qid, "task_id": r.get("task_id"),
+             "score": None if r["score"] is None else _dec(r["score"]), "needs_review": bool(r["needs_review"])}
+            for (sid, qid), r in sorted(latest.items())
+        ])
+        _apply_deltas(conn, exam_id, totals, stats)
+        conn.execute(_BUMP_VERSION_SQL, {"exam_id": exam_id})
+        written += len(latest)
+    return written
+
+
+def remove_results(conn, exam_id: Optional[int] = None, student_ids: Optional[List[int]] = None,
+                   question_ids: Optional[List[int]] = None) -> int:
+    """
+    删除学生/题目的单题得分并从汇总中扣除（学生或题目移出考试、被删除前调用）
+
+    exam_id为空时处理所有考试。移除学生时同时删除其总分行，移除题目时同时删除该题统计行。
+    由调用方提交事务，返回删除的得分条数。
+    """
+    conditions = []
+    params = {}
+    if exam_id is not None:
+        conditions.append("exam_id = :exam_id")
+        params["exam_id"] = exam_id
+    if student_ids:
+        conditions.append("student_id IN :student_ids")
+        params["student_ids"] = list(student_ids)
+    if question_ids:
+        conditions.append("question_id IN :question_ids")
+        params["question_ids"] = list(question_ids)
+    if not student_ids and not question_ids:
+        return 0
+    where = " AND ".join(conditions)
+
+    def bind(sql: str):
+        statement = text(sql)
+        for name in ("student_ids", "question_ids"):
+            if f":{name}" in sql:
+                statement = statement.bindparams(bindparam(name, expanding=True))
+        return statement
+
+    rows = conn.execute(bind(f"""
+        SELECT exam_id, student_id, question_id, score, needs_review
+        FROM exam_question_results WHERE {where} FOR UPDATE
+    """), params).fetchall()
+
+    by_exam: Dict[int, Tuple[Dict[int, _Delta], Dict[int, _Delta]]] = {}
+    for row in rows:
+        totals, stats = by_exam.setdefault(row.exam_id, ({}, {}))
+        totals.setdefault(row.student_id, _Delta()).add(row.score, row.needs_review, -1)
+        stats.setdefault(row.question_id, _Delta()).add(row.score, row.needs_review, -1)
+    for row_exam_id, (totals, stats) in sorted(by_exam.items()):
+        _apply_deltas(conn, row_exam_id, totals, stats)
+        conn.execute(_BUMP_VERSION_SQL, {"exam_id": row_exam_id})
+
+    conn.execute(bind(f"DELETE FROM exam_question_results WHERE {where}"), params)
+    if student_ids:
+        exam_condition = "exam_id = :exam_id AND " if exam_id is not None else ""
+        conn.execute(bind(f"DELETE FROM exam_student_totals WHERE {exam_condition}student_id IN :student_ids"), params)
+    if question_ids:
+        exam_condition = "exam_id = :exam_id AND " if exam_id is not None else ""
+        conn.execute(bind(f"DELETE FROM exam_question_stats WHERE {exam_condition}question_id IN :question_ids"), params)
+    return len(rows)
+
+
+def update_student_class(conn, student_id: int, class_name: Optional[str]):
+    """学生班级变化时同步汇总表中的班级（用于班级排名）"""
+    conn.execute(
+        text("UPDATE exam_student_totals SET class_name = :class_name WHERE student_id = :student_id"),
+        {"student_id": student_id, "class_name": class_name}
+    )
+    conn.execute(text("""
+        INSERT INTO exam_score_versions (exam_id, version)
+        SELECT exam_id, 1 FROM exam_student_totals WHERE student_id = :student_id
+        ON DUPLICATE KEY UPDATE version = version + 1
+    """), {"student_id": student_id})
+
+
+def bump_question_exams(conn, question_id: int):
+    """题目分值变化时递增包含该题的考试的成绩版本号（得分率、难度随满分变化）"""
+    conn.execute(text("""
+        INSERT INTO exam_score_versions (exam_id, version)
+        SELECT exam_id, 1 FROM exam_questions WHERE question_id = :question_id
+        ON DUPLICATE KEY UPDATE version = version + 1
+    """), {"question_id": question_id})
+
+
+def get_score_version(conn, exam_id: int) -> int:
+    """考试当前的成绩版本号（尚无得分时为0）"""
+    version = conn.execute(
+        text("SELECT version FROM exam_score_versions WHERE exam_id = :exam_id"), {"exam_id": exam_id}
+    ).scalar()
+    return int(version or 0)
+
+
+def rebuild_exam_summary(conn, exam_id: int):
+    """按单题得分重新计算考试的学生总分和题目统计（修复汇总数据时使用），由调用方提交事务"""
+    conn.execute(text("DELETE FROM exam_student_totals WHERE exam_id = :exam_id"), {"exam_id": exam_id})
+    conn.execute(text("DELETE FROM exam_question_stats WHERE exam_id = :exam_id"), {"exam_id": exam_id})
+    conn.execute(text("""
+        INSERT INTO exam_student_totals (exam_id, student_id, class_name, total_score, graded_count, review_count)
+        SELECT r.exam_id, r.student_id, MAX(s.class), COALESCE(SUM(r.score), 0), COUNT(r.score), SUM(r.needs_review)
+        FROM exam_question_results r
+        JOIN students s ON s.student_id = r.student_id
+        WHERE r.exam_id = :exam_id
+        GROUP BY r.exam_id, r.student_id
+    """), {"exam_id": exam_id})
+    conn.execute(text("""
+        INSERT INTO exam_question_stats (exam_id, question_id, score_sum, graded_count, review_count)
+        SELECT exam_id, question_id, COALESCE(SUM(score), 0), COUNT(score), SUM(needs_review)
+        FROM exam_question_results
+        WHERE exam_id = :exam_id
+        GROUP BY exam_id, question_id
+    """), {"exam_id": exam_id})
+    conn.execute(_BUMP_VERSION_SQL, {"exam_id": exam_id})
+
+
+# ==================== 读取 ====================
+
+STUDENT_SCORE_COLUMNS = [
+    "student_id", "name", "student_number", "class_name", "total_score", "graded_count", "review_count", "rank"
+]
+StudentScore = namedtuple("StudentScore", STUDENT_SCORE_COLUMNS)
+
+
+def list_student_scores(conn, exam_id: int, class_name: Optional[str] = None,
+                        cursor: Optional[Tuple[Decimal, int]] = None, limit: int = 50) -> Tuple[List[StudentScore], bool]:
+    """
+    按总分从高到低分页读取学生成绩（按汇总表索引顺序读取，与得分条数无关）
+
+    rank为并列排名（总分更高的人数+1）；指定class_name时为班级内排名。返回 (行, 是否有下一页)。
+    """
+    scope = "t.exam_id = :exam_id"
+    params = {"exam_id": exam_id, "limit": limit + 1}
+    if class_name is not None:
+        scope += " AND t.class_name = :class_name"
+        params["class_name"] = class_name
+
+    page_condition = ""
+    if cursor is not None:
+        page_condition = (
+            " AND (t.total_score < :cursor_total OR (t.total_score = :cursor_total AND t.student_id > :cursor_id))"
+        )
+        params["cursor_total"], params["cursor_id"] = cursor
+
+    rows = conn.execute(text(f"""
+        SELECT t.student_id, s.name, s.student_number, t.class_name, t.total_score, t.graded_count, t.review_count
+        FROM exam_student_totals t
+        JOIN students s ON s.student_id = t.student_id
+        WHERE {scope}{page_condition}
+        ORDER BY t.total_score DESC, t.student_id
+        LIMIT :limit
+    """), params).fetchall()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if not rows:
+        return [], False
+
+    # 首行的排名 = 总分更高的人数 + 1；页内其余行的排名只依赖首行之前与首行同分的人数
+    first = rows[0]
+    counts = conn.execute(text(f"""
+        SELECT COALESCE(SUM(t.total_score > :first_total), 0) AS greater,
+               COALESCE(SUM(t.total_score = :first_total AND t.student_id < :first_id), 0) AS tied_before
+        FROM exam_student_totals t
+        WHERE {scope} AND t.total_score >= :first_total
+    """), {
+        "exam_id": exam_id, "class_name": class_name, "first_total": first.total_score, "first_id": first.student_id
+    }).fetchone()
+    greater, tied_before = int(counts.greater), int(counts.tied_before)
+
+    ranked = []
+    group_start = {}
+    for position, row in enumerate(rows):
+        group_start.setdefault(row.total_score, position)
+        if row.total_score == first.total_score:
+            rank = greater + 1
+        else:
+            rank = greater + tied_before + group_start[row.total_score] + 1
+        ranked.append(StudentScore(*row, rank))
+    return ranked, has_more
+
+
+QUESTION_STAT_COLUMNS = [
+    "question_id", "position", "type", "full_score", "graded_count", "review_count", "average_score", "score_rate"
+]
+
+
+def list_question_stats(conn, exam_id: int) -> List[tuple]:
+    """读取考试各题的平均分和得分率，position为题目在考试中的位置（从1开始）"""
+    return conn.execute(text("""
+        SELECT eq.question_id, ROW_NUMBER() OVER (ORDER BY eq.question_order, eq.question_id) AS position,
+               q.type, q.score AS full_score,
+               COALESCE(st.graded_count, 0) AS graded_count, COALESCE(st.review_count, 0) AS review_count,
+               ROUND(st.score_sum / NULLIF(st.graded_count, 0), 2) AS average_score,
+               ROUND(st.score_sum / NULLIF(st.graded_count, 0) / NULLIF(q.score, 0), 4) AS score_rate
+        FROM exam_questions eq
+        JOIN questions q ON q.id = eq.question_id
+        LEFT JOIN exam_question_stats st ON st.exam_id = eq.exam_id AND st.question_id = eq.question_id
+        WHERE eq.exam_id = :exam_id
+        ORDER BY eq.question_order, eq.question_id
+    """), {"exam_id": exam_id}).fetchall()
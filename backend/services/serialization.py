@@ -0,0 +1,45 @@
+from typing import Any, Optional, Sequence
+from decimal import Decimal
+from itertools import repeat
+from fastapi import Response
+import orjson
+
+# 列表接口的返回格式：rows为对象数组（默认），columnar为按列组织的数组
+ROWS_FORMAT = "rows"
+COLUMNAR_FORMAT = "columnar"
+LIST_FORMAT_PATTERN = f"^({ROWS_FORMAT}|{COLUMNAR_FORMAT})$"
+
+
+def _default(value):
+    # orjson原生支持datetime/date，DECIMAL列需转换为浮点数
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"无法序列化类型 {type(value).__name__}")
+
+
+def dumps(payload: Any) -> bytes:
+    """将响应数据编码为JSON（datetime按ISO格式输出）"""
+    return orjson.dumps(payload, default=_default)
+
+
+def json_response(payload: Any, status_code: int = 200, headers: Optional[dict] = None) -> Response:
+    """直接返回已编码的JSON响应，跳过FastAPI默认的jsonable_encoder"""
+    return Response(content=dumps(payload), status_code=status_code, media_type="application/json", headers=headers)
+
+
+def encode_rows(rows: Sequence[Sequence], columns: Sequence[str], list_format: str = ROWS_FORMAT):
+    """
+    将查询结果转换为列表接口的data字段
+
+    rows中每行的值与columns一一对应（通常直接使用SQL结果行，列别名即输出字段名），
+    行中多出的尾部列（如仅用于游标的排序键）会被忽略。
+    rows格式返回对象数组；columnar格式返回 {"count": 行数, "columns": {列名: 值数组}}，
+    字段名只出现一次，大列表的体积和编码开销都明显更小。
+    """
+    columns = list(columns)
+    if list_format == COLUMNAR_FORMAT:
+        arrays = [list(values) for values in zip(*rows)] if rows else [[] for _ in columns]
+        return {"count": len(rows), "columns": dict(zip(columns, arrays))}
+    # rows格式有意保留逐行构造字典：orjson只能从dict/dataclass输出对象，逐行构造slots dataclass
+    # 比dict(zip)更慢，逐值预编码再拼接更慢；需要降低大列表开销时应使用columnar格式
+    return list(map(dict, map(zip, repeat(columns), rows)))
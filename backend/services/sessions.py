@@ -0,0 +1,325 @@
+from typing import Dict, Optional
+from collections import OrderedDict
+from datetime import datetime
+from fastapi import Header, HTTPException
+from sqlalchemy import text, bindparam
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import secrets
+import threading
+import time
+
+from backend.config import get_setting
+from backend.database import engine
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 令牌签名密钥；未配置时每次启动随机生成（重启后旧令牌失效，多进程部署必须配置）
+SESSION_SECRET = get_setting("SESSION_SECRET", "")
+# 令牌有效期（秒）
+SESSION_TTL = get_setting("SESSION_TTL", 8 * 3600, int)
+# 会话缓存条目的有效期（秒）：过期后重新从数据库确认用户状态，限制禁用账号/角色变更的生效延迟
+SESSION_CACHE_TTL = get_setting("SESSION_CACHE_TTL", 300, int)
+# 会话缓存条数上限
+SESSION_CACHE_SIZE = get_setting("SESSION_CACHE_SIZE", 10000, int)
+# last_login批量写入间隔（秒）
+LAST_LOGIN_FLUSH_INTERVAL = get_setting("LAST_LOGIN_FLUSH_INTERVAL", 5, float)
+# 从数据库同步其他进程注销记录的间隔（秒），即注销在其他进程生效的最长延迟
+SESSION_REVOCATION_SYNC_INTERVAL = get_setting("SESSION_REVOCATION_SYNC_INTERVAL", 5, float)
+# API工作进程数（与uvicorn/gunicorn读取的同名环境变量一致）
+WEB_CONCURRENCY = get_setting("WEB_CONCURRENCY", 1, int)
+
+if not SESSION_SECRET:
+    if WEB_CONCURRENCY > 1:
+        # 各进程的随机密钥不同，一个进程签发的令牌会被其他进程拒绝
+        raise RuntimeError("多进程部署（WEB_CONCURRENCY > 1）必须配置 SESSION_SECRET")
+    logger.warning("未配置 SESSION_SECRET，使用随机密钥（服务重启后所有登录令牌失效）")
+    SESSION_SECRET = secrets.token_hex(32)
+_SECRET_KEY = SESSION_SECRET.encode()
+
+_SELECT_USER_SQL = text("SELECT user_id, username, email, role, is_active FROM users WHERE user_id = :user_id")
+
+_INSERT_REVOCATION_SQL = text("""
+    INSERT INTO revoked_sessions (session_id, expires_at) VALUES (:session_id, FROM_UNIXTIME(:expires_at))
+    ON DUPLICATE KEY UPDATE expires_at = VALUES(expires_at)
+""")
+_PRUNE_REVOCATIONS_SQL = text("DELETE FROM revoked_sessions WHERE expires_at < NOW()")
+
+
+# ==================== 令牌签发与校验 ====================
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def _b64decode(value: str) -> bytes:
+    return base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+
+
+def _sign(payload: str) -> str:
+    return _b64encode(hmac.new(_SECRET_KEY, payload.encode(), hashlib.sha256).digest())
+
+
+def issue_token(user_id: int, ttl: int = SESSION_TTL) -> dict:
+    """签发会话令牌，返回 {token, session_id, expires_at}"""
+    claims = {"uid": user_id, "sid": secrets.token_urlsafe(12), "exp": int(time.time()) + ttl}
+    payload = _b64encode(json.dumps(claims, separators=(",", ":")).encode())
+    return {
+        "token": f"{payload}.{_sign(payload)}",
+        "session_id": claims["sid"],
+        "expires_at": claims["exp"]
+    }
+
+
+def decode_token(token: str) -> Optional[dict]:
+    """校验签名和有效期，返回令牌声明；无效时返回None（不访问数据库）"""
+    try:
+        payload, signature = token.split(".", 1)
+        if not hmac.compare_digest(signature, _sign(payload)):
+            return None
+        claims = json.loads(_b64decode(payload))
+    except Exception:
+        return None
+    if claims.get("exp", 0) <= time.time():
+        return None
+    return claims
+
+
+# ==================== 会话缓存 ====================
+
+class SessionCache:
+    """带TTL的会话缓存（线程安全，按最近使用淘汰）"""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        # 已注销的会话ID -> 令牌过期时间
+        self._revoked: Dict[str, float] = {}
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+    def get(self, session_id: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                return None
+            cached_at, session = entry
+            if time.monotonic() - cached_at > self.ttl:
+                del self._entries[session_id]
+                return None
+            self._entries.move_to_end(session_id)
+            return session
+
+    def put(self, session_id: str, session: dict):
+        with self._lock:
+            self._entries[session_id] = (time.monotonic(), session)
+            self._entries.move_to_end(session_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def revoke(self, session_id: str, expires_at: float):
+        with self._lock:
+            self._entries.pop(session_id, None)
+            now = time.time()
+            # 顺便清理已自然过期的注销记录
+            self._revoked = {sid: exp for sid, exp in self._revoked.items() if exp > now}
+            self._revoked[session_id] = expires_at
+
+    def is_revoked(self, session_id: str) -> bool:
+        with self._lock:
+            return session_id in self._revoked
+
+
+session_cache = SessionCache(SESSION_CACHE_SIZE, SESSION_CACHE_TTL)
+
+
+def _session_from_user(user: dict, claims: dict) -> dict:
+    return {
+        "user_id": user["user_id"],
+        "username": user["username"],
+        "email": user["email"],
+        "role": user["role"],
+        "session_id": claims["sid"],
+        "expires_at": claims["exp"]
+    }
+
+
+def create_session(user: dict) -> dict:
+    """为已通过密码校验的用户签发令牌并写入会话缓存"""
+    issued = issue_token(user["user_id"])
+    claims = {"sid": issued["session_id"], "exp": issued["expires_at"]}
+    session_cache.put(issued["session_id"], _session_from_user(user, claims))
+    return issued
+
+
+def load_session(token: str) -> Optional[dict]:
+    """
+    校验令牌并返回会话信息，无效时返回None
+
+    签名和有效期在本地校验，注销记录定期从数据库同步；会话缓存命中时不访问数据库，未命中（缓存过期、服务重启或其他进程签发）
+    时查询一次用户表确认账号仍然有效，并重新缓存。
+    """
+    claims = decode_token(token)
+    if claims is None:
+        return None
+    revocation_sync.sync()
+    if session_cache.is_revoked(claims["sid"]):
+        return None
+
+    session = session_cache.get(claims["sid"])
+    if session is not None:
+        return session
+
+    with engine.connect() as conn:
+        row = conn.execute(_SELECT_USER_SQL, {"user_id": claims["uid"]}).fetchone()
+    if row is None or not row.is_active:
+        return None
+    session = _session_from_user(dict(row._mapping), claims)
+    session_cache.put(claims["sid"], session)
+    return session
+
+
+class RevocationSync:
+    """
+    多进程间同步注销记录
+
+    注销时写入 revoked_sessions 表；各进程每隔 interval 秒按注销时间增量读取一次，
+    其余请求只查本进程内的注销集合，不访问数据库。
+    """
+
+    def __init__(self, cache: SessionCache, interval: float):
+        self.cache = cache
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._next_sync = 0.0
+        # 已同步到的最大注销时间（数据库时间）；None表示尚未同步，首次读取全部未过期记录
+        self._since: Optional[datetime] = None
+
+    def sync(self):
+        """到达同步间隔时读取新增的注销记录；其他线程正在同步时直接返回"""
+        if time.monotonic() < self._next_sync or not self._lock.acquire(blocking=False):
+            return
+        try:
+            if time.monotonic() < self._next_sync:
+                return
+            if self._since is None:
+                query = text("SELECT session_id, UNIX_TIMESTAMP(expires_at) AS expires_at, revoked_at "
+                             "FROM revoked_sessions WHERE expires_at > NOW()")
+                params = {}
+            else:
+                # 注销时间精度为秒，用 >= 重复读取边界上的记录，避免遗漏
+                query = text("SELECT session_id, UNIX_TIMESTAMP(expires_at) AS expires_at, revoked_at "
+                             "FROM revoked_sessions WHERE revoked_at >= :since")
+                params = {"since": self._since}
+            with engine.connect() as conn:
+                rows = conn.execute(query, params).fetchall()
+            for row in rows:
+                self.cache.revoke(row.session_id, float(row.expires_at))
+                if self._since is None or row.revoked_at > self._since:
+                    self._since = row.revoked_at
+            if self._since is None:
+                with engine.connect() as conn:
+                    self._since = conn.execute(text("SELECT NOW()")).scalar()
+            self._next_sync = time.monotonic() + self.interval
+        except Exception as e:
+            logger.error(f"同步会话注销记录失败: {str(e)}")
+            self._next_sync = time.monotonic() + self.interval
+        finally:
+            self._lock.release()
+
+
+revocation_sync = RevocationSync(session_cache, SESSION_REVOCATION_SYNC_INTERVAL)
+
+
+def revoke_session(session: dict):
+    """注销会话：当前进程立即生效，其他进程在下次同步注销记录（SESSION_REVOCATION_SYNC_INTERVAL秒内）后生效"""
+    session_cache.revoke(session["session_id"], session["expires_at"])
+    with engine.connect() as conn:
+        conn.execute(_INSERT_REVOCATION_SQL, {"session_id": session["session_id"], "expires_at": session["expires_at"]})
+        # 顺便清理已自然过期的注销记录
+        conn.execute(_PRUNE_REVOCATIONS_SQL)
+        conn.commit()
+
+
+def get_current_session(authorization: Optional[str] = Header(None)) -> dict:
+    """FastAPI依赖：从 Authorization: Bearer <token> 解析当前会话，无效时返回401"""
+    if not authorization or not authorization.lower().startswith("bearer "):
+        raise HTTPException(status_code=401, detail="未登录")
+    session = load_session(authorization[7:].strip())
+    if session is None:
+        raise HTTPException(status_code=401, detail="登录已失效，请重新登录")
+    return session
+
+
+# ==================== last_login批量写入 ====================
+
+class LastLoginFlusher:
+    """在后台线程中定期批量写入用户的最后登录时间，避免登录高峰时逐条UPDATE"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._pending: Dict[int, datetime] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def record(self, user_id: int, login_time: Optional[datetime] = None):
+        with self._lock:
+            self._pending[user_id] = login_time or datetime.now()
+
+    def flush(self) -> int:
+        """写入当前累积的登录时间，返回更新的用户数"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        params = {"user_ids": list(pending)}
+        cases = []
+        for i, (user_id, login_time) in enumerate(pending.items()):
+            cases.append(f"WHEN :uid_{i} THEN :login_{i}")
+            params[f"uid_{i}"] = user_id
+            params[f"login_{i}"] = login_time
+        query = text(f"""
+            UPDATE users SET last_login = CASE user_id {' '.join(cases)} END
+            WHERE user_id IN :user_ids
+        """).bindparams(bindparam("user_ids", expanding=True))
+
+        try:
+            with engine.connect() as conn:
+                conn.execute(query, params)
+                conn.commit()
+        except Exception as e:
+            logger.error(f"批量更新登录时间失败: {str(e)}")
+            # 放回队列等待下次写入（保留更新的时间）
+            with self._lock:
+                for user_id, login_time in pending.items():
+                    if user_id not in self._pending:
+                        self._pending[user_id] = login_time
+            return 0
+        return len(pending)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="last-login-flusher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """停止后台线程并写入剩余数据"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+
+last_login_flusher = LastLoginFlusher(LAST_LOGIN_FLUSH_INTERVAL)
@@ -0,0 +1,347 @@
+from typing import Callable, Dict, List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from sqlalchemy import text, bindparam
+import json
+import logging
+import os
+import threading
+import time
+import cv2
+import numpy as np
+
+from backend.config import get_setting
+from backend.database import engine
+from backend.services.answer_storage import object_path
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 预处理进程数，默认与CPU核数一致
+PREPROCESS_WORKERS = get_setting("PREPROCESS_WORKERS", os.cpu_count() or 1, int)
+# 每次领取的待处理图片数量
+PREPROCESS_BATCH_SIZE = get_setting("PREPROCESS_BATCH_SIZE", 64, int)
+# 无新上传通知时的轮询间隔（秒）
+PREPROCESS_POLL_INTERVAL = get_setting("PREPROCESS_POLL_INTERVAL", 10, float)
+# 处理中超过该时长（秒）的图片视为中断，重新领取
+PREPROCESS_STALE_SECONDS = get_setting("PREPROCESS_STALE_SECONDS", 600, int)
+
+# 估算倾斜角时将图片缩小到的最长边（像素）
+DESKEW_SAMPLE_SIZE = 1000
+# 超过该角度（度）的倾斜不自动校正，避免误判整页旋转
+DESKEW_MAX_ANGLE = 15.0
+# 自适应二值化的邻域大小和偏移
+BINARIZE_BLOCK_SIZE = 31
+BINARIZE_OFFSET = 15
+# 边缘行/列中黑色像素占比超过该值时视为扫描仪黑边
+BORDER_INK_RATIO = 0.5
+# 裁剪后在内容四周保留的边距（像素）
+CROP_MARGIN = 10
+
+# 预处理结果存储在 UPLOAD_DIR/processed/<哈希前2位>/<哈希>.png
+PROCESSED_DIR = "processed"
+
+
+class SheetPreprocessError(ValueError):
+    """答题卡图片预处理失败"""
+
+
+# ==================== 处理阶段（ndarray -> ndarray） ====================
+
+def to_grayscale(image: np.ndarray) -> np.ndarray:
+    """转换为8位单通道灰度图"""
+    if image.ndim == 3:
+        code = cv2.COLOR_BGRA2GRAY if image.shape[2] == 4 else cv2.COLOR_BGR2GRAY
+        image = cv2.cvtColor(image, code)
+    if image.dtype != np.uint8:
+        # 16位TIFF等按最大值缩放到8位
+        image = cv2.convertScaleAbs(image, alpha=255.0 / max(int(image.max()), 1))
+    return image
+
+
+def deskew(gray: np.ndarray) -> np.ndarray:
+    """在缩小的样本上用最小外接矩形估计文字倾斜角，再旋转原图"""
+    height, width = gray.shape
+    scale = min(1.0, DESKEW_SAMPLE_SIZE / max(height, width))
+    sample = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1.0 else gray
+    _, ink = cv2.threshold(sample, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+    coords = cv2.findNonZero(ink)
+    if coords is None:
+        return gray
+
+    angle = cv2.minAreaRect(coords)[-1]
+    # 不同OpenCV版本的角度范围不同，统一到 (-45, 45]
+    if angle > 45:
+        angle -= 90
+    elif angle <= -45:
+        angle += 90
+    if abs(angle) < 0.1 or abs(angle) > DESKEW_MAX_ANGLE:
+        return gray
+
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    return cv2.warpAffine(gray, matrix, (width, height), flags=cv2.INTER_LINEAR,
+                          borderMode=cv2.BORDER_CONSTANT, borderValue=255)
+
+
+def binarize(gray: np.ndarray) -> np.ndarray:
+    """轻度去噪后自适应二值化（适应扫描光照不均），输出0为墨迹、255为背景"""
+    blurred = cv2.GaussianBlur(gray, (3, 3), 0)
+    return cv2.adaptiveThreshold(blurred, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY,
+                                 BINARIZE_BLOCK_SIZE, BINARIZE_OFFSET)
+
+
+def _trim_dark_edges(ratios: np.ndarray) -> Tuple[int, int]:
+    """
+    返回去掉两端黑边后的 [start, end) 区间
+
+    自适应二值化会把大片黑边内部变白，只留下黑边轮廓，因此在两端各5%的范围内
+    查找最靠内的深色行/列，并从其之后开始保留。
+    """
+    length = len(ratios)
+    band = max(1, length // 20)
+    dark = np.flatnonzero(ratios[:band] > BORDER_INK_RATIO)
+    start = int(dark[-1]) + 1 if dark.size else 0
+    dark = np.flatnonzero(ratios[length - band:] > BORDER_INK_RATIO)
+    end = length - band + int(dark[0]) if dark.size else length
+    return (start, end) if start < end else (0, length)
+
+
+def crop_border(binary: np.ndarray) -> np.ndarray:
+    """去除扫描黑边，再裁剪到内容区域（保留少量边距）"""
+    ink = binary == 0
+    top, bottom = _trim_dark_edges(ink.mean(axis=1))
+    left, right = _trim_dark_edges(ink.mean(axis=0))
+    ink = ink[top:bottom, left:right]
+
+    rows = np.flatnonzero(ink.any(axis=1))
+    cols = np.flatnonzero(ink.any(axis=0))
+    if rows.size == 0 or cols.size == 0:
+        return binary[top:bottom, left:right]
+
+    y0 = top + max(int(rows[0]) - CROP_MARGIN, 0)
+    y1 = top + min(int(rows[-1]) + 1 + CROP_MARGIN, bottom - top)
+    x0 = left + max(int(cols[0]) - CROP_MARGIN, 0)
+    x1 = left + min(int(cols[-1]) + 1 + CROP_MARGIN, right - left)
+    return binary[y0:y1, x0:x1]
+
+
+# 处理阶段按顺序执行，图片在阶段之间以ndarray传递，不做中间编码
+PIPELINE_STAGES: List[Tuple[str, Callable[[np.ndarray], np.ndarray]]] = [
+    ("grayscale", to_grayscale),
+    ("deskew", deskew),
+    ("binarize", binarize),
+    ("crop", crop_border),
+]
+
+
+def processed_storage_path(content_hash: str) -> str:
+    """预处理结果的存储路径（相对UPLOAD_DIR），同一内容只处理一次"""
+    return os.path.join(PROCESSED_DIR, content_hash[:2], content_hash + ".png")
+
+
+def preprocess_sheet(source_path: str, target_path: str) -> Dict[str, float]:
+    """
+    预处理一张答题卡：解码一次，依次执行各阶段，最后编码一次写入target_path
+
+    返回各阶段耗时（毫秒），包括 decode 和 encode。
+    """
+    timings = {}
+    start = time.perf_counter()
+    # 直接按灰度解码，JPEG只解码亮度通道，比解码彩色再转换更快
+    image = cv2.imread(source_path, cv2.IMREAD_GRAYSCALE | cv2.IMREAD_ANYDEPTH)
+    if image is None:
+        raise SheetPreprocessError(f"无法解码图片: {os.path.basename(source_path)}")
+    timings["decode"] = (time.perf_counter() - start) * 1000
+
+    for name, stage in PIPELINE_STAGES:
+        start = time.perf_counter()
+        image = stage(image)
+        timings[name] = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    tmp_path = f"{target_path}.{os.getpid()}.part.png"
+    if not cv2.imwrite(tmp_path, image, [cv2.IMWRITE_PNG_COMPRESSION, 1]):
+        raise SheetPreprocessError(f"写入预处理结果失败: {os.path.basename(target_path)}")
+    os.replace(tmp_path, target_path)
+    timings["encode"] = (time.perf_counter() - start) * 1000
+    return timings
+
+
+def _init_worker():
+    # 每个进程处理一张图片，关闭OpenCV内部多线程，避免与进程池争抢CPU
+    cv2.setNumThreads(1)
+
+
+def _preprocess_task(source_path: str, target_path: str) -> Dict[str, float]:
+    """进程池任务：结果已存在（相同内容处理过）时直接跳过"""
+    if os.path.exists(target_path):
+        return {}
+    return preprocess_sheet(source_path, target_path)
+
+
+# ==================== 统计 ====================
+
+class PipelineStats:
+    """预处理累计统计（线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.processed = 0
+        self.reused = 0
+        self.failed = 0
+        self.stage_ms: Dict[str, float] = {}
+        self.wall_ms = 0.0
+
+    def record_batch(self, results: List[Dict[str, float]], failed: int, wall_ms: float):
+        with self._lock:
+            self.failed += failed
+            self.wall_ms += wall_ms
+            for timings in results:
+                if not timings:
+                    self.reused += 1
+                    continue
+                self.processed += 1
+                for stage, ms in timings.items():
+                    self.stage_ms[stage] = self.stage_ms.get(stage, 0.0) + ms
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            done = self.processed + self.reused
+            return {
+                "workers": PREPROCESS_WORKERS,
+                "processed": self.processed,
+                "reused": self.reused,
+                "failed": self.failed,
+                "avg_stage_ms": {
+                    stage: round(total / self.processed, 3) for stage, total in self.stage_ms.items()
+                } if self.processed else {},
+                # 按批次墙钟时间计算的吞吐量
+                "sheets_per_minute": round(done / (self.wall_ms / 60000), 1) if self.wall_ms else 0.0
+            }
+
+
+pipeline_stats = PipelineStats()
+
+
+# ==================== 领取与调度 ====================
+
+_CLAIM_SQL = text("""
+    SELECT image_id, content_hash, storage_path
+    FROM answer_images
+    WHERE status = 'uploaded'
+       OR (status = 'processing' AND processing_started_at < NOW() - INTERVAL :stale SECOND)
+    ORDER BY image_id
+    LIMIT :limit
+    FOR UPDATE SKIP LOCKED
+""")
+
+_MARK_PROCESSING_SQL = text("""
+    UPDATE answer_images SET status = 'processing', processing_started_at = NOW()
+    WHERE image_id IN :image_ids
+""").bindparams(bindparam("image_ids", expanding=True))
+
+_MARK_DONE_SQL = text("""
+    UPDATE answer_images
+    SET status = :status, processed_path = :processed_path, preprocess_timings = :timings, error_message = :error
+    WHERE image_id = :image_id
+""")
+
+
+class PreprocessDispatcher:
+    """
+    后台线程：领取新上传的答题卡，提交到进程池预处理并写回结果
+
+    上传完成后调用 notify() 立即唤醒；无通知时按 PREPROCESS_POLL_INTERVAL 轮询，
+    以便处理其他进程上传或上次中断的图片。
+    """
+
+    def __init__(self, workers: int, batch_size: int, poll_interval: float):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def notify(self):
+        self._wake.set()
+
+    def _claim(self) -> list:
+        with engine.connect() as conn:
+            rows = conn.execute(_CLAIM_SQL, {"stale": PREPROCESS_STALE_SECONDS, "limit": self.batch_size}).fetchall()
+            if rows:
+                conn.execute(_MARK_PROCESSING_SQL, {"image_ids": [r.image_id for r in rows]})
+            conn.commit()
+        return rows
+
+    def run_batch(self) -> int:
+        """处理一批待处理图片，返回本批数量"""
+        rows = self._claim()
+        if not rows:
+            return 0
+
+        start = time.perf_counter()
+        futures = {}
+        for row in rows:
+            target = processed_storage_path(row.content_hash)
+            future = self._pool.submit(_preprocess_task, object_path(row.storage_path), object_path(target))
+            futures[future] = (row.image_id, target)
+
+        updates = []
+        results = []
+        for future in as_completed(futures):
+            image_id, target = futures[future]
+            try:
+                timings = future.result()
+                results.append(timings)
+                updates.append({
+                    "image_id": image_id, "status": "processed", "processed_path": target,
+                    "timings": json.dumps({k: round(v, 3) for k, v in timings.items()}) if timings else None,
+                    "error": None
+                })
+            except Exception as e:
+                logger.warning(f"答题卡预处理失败 {image_id}: {str(e)}")
+                updates.append({
+                    "image_id": image_id, "status": "failed", "processed_path": None,
+                    "timings": None, "error": str(e)[:500]
+                })
+
+        with engine.connect() as conn:
+            conn.execute(_MARK_DONE_SQL, updates)
+            conn.commit()
+
+        pipeline_stats.record_batch(results, len(updates) - len(results), (time.perf_counter() - start) * 1000)
+        return len(rows)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                # 一批处理满时继续领取，否则等待新上传或下次轮询
+                if self.run_batch() >= self.batch_size:
+                    continue
+            except Exception as e:
+                logger.error(f"答题卡预处理调度失败: {str(e)}")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sheet-preprocess", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """停止调度线程并关闭进程池（处理中的图片会在超时后被重新领取）"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+preprocess_dispatcher = PreprocessDispatcher(PREPROCESS_WORKERS, PREPROCESS_BATCH_SIZE, PREPROCESS_POLL_INTERVAL)
@@ -0,0 +1,246 @@
+from typing import Iterable, Iterator, List, Optional, Tuple, BinaryIO
+from itertools import islice
+from sqlalchemy import text, bindparam
+import logging
+import pandas as pd
+import openpyxl
+
+from backend.database import engine
+from backend.services.student_search import index_students
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 每批处理的学生数量（一批一个事务）
+CHUNK_SIZE = 1000
+
+# 名单解析时每批读取的行数
+ROSTER_BATCH_SIZE = 5000
+
+# 名单文件列顺序：学号, 班级, 姓名, 联系方式
+ROSTER_COLUMNS = ["student_number", "class", "name", "contact_info"]
+
+
+class RosterParseError(ValueError):
+    """名单文件解析失败"""
+
+_SELECT_STUDENTS_SQL = text(
+    "SELECT student_id, student_number, name, class AS class_name FROM students WHERE student_number IN :numbers"
+).bindparams(bindparam("numbers", expanding=True))
+
+_INSERT_STUDENTS_SQL = text("""
+    INSERT INTO students (name, student_number, class, contact_info)
+    VALUES (:name, :student_number, :class, :contact_info)
+    ON DUPLICATE KEY UPDATE student_number = student_number
+""")
+
+_SELECT_MEMBERS_SQL = text(
+    "SELECT student_id FROM exam_students WHERE exam_id = :exam_id AND student_id IN :student_ids"
+).bindparams(bindparam("student_ids", expanding=True))
+
+_INSERT_MEMBERS_SQL = text("""
+    INSERT INTO exam_students (exam_id, student_id)
+    VALUES (:exam_id, :student_id)
+    ON DUPLICATE KEY UPDATE exam_id = exam_id
+""")
+
+
+def _iter_chunks(rows: Iterable[dict], size: int):
+    iterator = iter(rows)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _write_chunk(conn, exam_id: int, chunk: List[dict], reject_name_mismatch: bool, errors: List[str]) -> int:
+    """写入一批学生：预取已存在学号与考试关联，批量插入缺失的学生和关联，返回新增关联数"""
+    valid_rows = []
+    for row in chunk:
+        student_number = row.get("student_number")
+        name = row.get("name")
+        if not student_number:
+            errors.append(f"学号缺失: {name or '未知姓名'}")
+            continue
+        if not name:
+            errors.append(f"姓名缺失: 学号 {student_number}")
+            continue
+        valid_rows.append(row)
+
+    if not valid_rows:
+        return 0
+
+    numbers = list({row["student_number"] for row in valid_rows})
+    students = {r.student_number: r for r in conn.execute(_SELECT_STUDENTS_SQL, {"numbers": numbers})}
+
+    # 批量创建不存在的学生（同一批内重复学号只插入第一条）
+    new_students = {}
+    for row in valid_rows:
+        number = row["student_number"]
+        if number not in students and number not in new_students:
+            new_students[number] = {
+                "name": row["name"],
+                "student_number": number,
+                "class": row.get("class", ""),
+                "contact_info": row.get("contact_info", "")
+            }
+    if new_students:
+        conn.execute(_INSERT_STUDENTS_SQL, list(new_students.values()))
+        created = conn.execute(_SELECT_STUDENTS_SQL, {"numbers": list(new_students)}).fetchall()
+        students.update((r.student_number, r) for r in created)
+        index_students(conn, ((r.student_id, r.name, r.class_name) for r in created))
+
+    student_ids = list({r.student_id for r in students.values()})
+    members = {r.student_id for r in conn.execute(_SELECT_MEMBERS_SQL, {"exam_id": exam_id, "student_ids": student_ids})}
+
+    # 按原始行顺序生成冲突报告
+    links = []
+    for row in valid_rows:
+        number = row["student_number"]
+        name = row["name"]
+        student = students[number]
+        if reject_name_mismatch and student.name != name:
+            errors.append(f"学号冲突: 学号 {number} 已存在且属于学生 {student.name}，与当前 {name} 不符")
+            continue
+        if student.student_id in members:
+            errors.append(f"重复添加: 学生 {name} ({number}) 已在考试中")
+            continue
+        members.add(student.student_id)
+        links.append({"exam_id": exam_id, "student_id": student.student_id})
+
+    if links:
+        conn.execute(_INSERT_MEMBERS_SQL, links)
+    return len(links)
+
+
+def bulk_add_students_to_exam(exam_id: int, rows: Iterable[dict], reject_name_mismatch: bool = True,
+                              chunk_size: int = CHUNK_SIZE) -> Tuple[int, List[str]]:
+    """
+    批量将学生添加到考试（不存在的学生自动创建）
+
+    rows中每项包含 student_number、name、class、contact_info。
+    按chunk_size分批处理，每批一个事务，返回(新增关联数, 错误列表)。
+    """
+    added_count = 0
+    errors = []
+
+    with engine.connect() as conn:
+        for chunk in _iter_chunks(rows, chunk_size):
+            chunk_errors = []
+            try:
+                added_count += _write_chunk(conn, exam_id, chunk, reject_name_mismatch, chunk_errors)
+                conn.commit()
+                errors.extend(chunk_errors)
+            except Exception as e:
+                conn.rollback()
+                logger.warning(f"批量写入学生失败: {str(e)}")
+                errors.extend(f"系统错误 {row.get('name')}: {str(e)}" for row in chunk)
+
+    return added_count, errors
+
+
+# ==================== 名单文件解析 ====================
+
+def _normalize_roster_frame(df: pd.DataFrame, errors: Optional[List[str]] = None) -> List[dict]:
+    """
+    按列向量化清洗一批名单数据：去空白、过滤缺失学号/姓名、去除重复行
+
+    被去除的重复行逐条记入errors（与逐行导入时的“重复添加”提示一致）。
+    """
+    df = df.reindex(columns=ROSTER_COLUMNS)
+    df = df[df["student_number"].notna() & df["name"].notna()]
+    if df.empty:
+        return []
+
+    columns = {}
+    for name in ROSTER_COLUMNS:
+        col = df[name]
+        # object列中可能混有数字（如xlsx中部分学号为数字），统一转为字符串后再去空白
+        columns[name] = col.where(col.notna(), "").astype(str).str.strip()
+    # Excel中的数字学号可能被读成浮点数（如 2023001.0）
+    columns["student_number"] = columns["student_number"].str.replace(r"\.0$", "", regex=True)
+
+    df = pd.DataFrame(columns)
+    df = df[(df["student_number"] != "") & (df["name"] != "")]
+    duplicated = df.duplicated()
+    if duplicated.any():
+        if errors is not None:
+            dropped = df[duplicated]
+            errors.extend(
+                f"重复行: 学生 {name} ({number}) 在文件中重复出现，已跳过"
+                for number, name in zip(dropped["student_number"].tolist(), dropped["name"].tolist())
+            )
+        df = df[~duplicated]
+    # 按列取出后再组装字典，比 DataFrame.to_dict("records") 快得多
+    return [dict(zip(ROSTER_COLUMNS, values)) for values in zip(*(df[name].tolist() for name in ROSTER_COLUMNS))]
+
+
+def _iter_xlsx_frames(fileobj: BinaryIO, batch_size: int) -> Iterator[pd.DataFrame]:
+    """以只读模式流式读取xlsx第一个工作表（首行为表头）"""
+    workbook = openpyxl.load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        rows = sheet.iter_rows(min_row=2, max_col=len(ROSTER_COLUMNS), values_only=True)
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                return
+            yield pd.DataFrame(batch, columns=ROSTER_COLUMNS[:len(batch[0])])
+    finally:
+        workbook.close()
+
+
+def _iter_xls_frames(fileobj: BinaryIO, batch_size: int) -> Iterator[pd.DataFrame]:
+    """读取xls文件（旧格式不支持流式读取）"""
+    df = pd.read_excel(fileobj, dtype=object)
+    df = df.iloc[:, :len(ROSTER_COLUMNS)]
+    df.columns = ROSTER_COLUMNS[:df.shape[1]]
+    for start in range(0, len(df), batch_size):
+        yield df.iloc[start:start + batch_size]
+
+
+def _split_roster_line(line: str) -> List[str]:
+    """按行判断分隔符：含制表符时按制表符拆分，否则按逗号拆分（只保留前4列）"""
+    return line.split("\t" if "\t" in line else ",")[:len(ROSTER_COLUMNS)]
+
+
+def _iter_text_frames(fileobj: BinaryIO, batch_size: int) -> Iterator[pd.DataFrame]:
+    """
+    分批读取txt/csv文件（无表头）
+
+    同一文件中可能混用制表符和逗号，分隔符逐行判断；列数不足的行由清洗步骤按缺失学号/姓名过滤。
+    """
+    lines = (raw.decode("utf-8-sig").strip() for raw in fileobj)
+    rows = (_split_roster_line(line) for line in lines if line)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return
+        df = pd.DataFrame(batch, dtype=object)
+        df.columns = ROSTER_COLUMNS[:df.shape[1]]
+        yield df
+
+
+def iter_roster_batches(file_extension: str, fileobj: BinaryIO, batch_size: int = ROSTER_BATCH_SIZE,
+                        errors: Optional[List[str]] = None) -> Iterator[List[dict]]:
+    """
+    流式解析学生名单文件，逐批产出清洗后的学生记录
+
+    支持 xlsx/xls（首行为表头）和 txt/csv（逗号或制表符分隔，无表头）。
+    文件内重复的行只保留第一条，其余记入errors。解析失败时抛出 RosterParseError。
+    """
+    if file_extension == ".xlsx":
+        frames = _iter_xlsx_frames(fileobj, batch_size)
+    elif file_extension == ".xls":
+        frames = _iter_xls_frames(fileobj, batch_size)
+    else:
+        frames = _iter_text_frames(fileobj, batch_size)
+
+    try:
+        for frame in frames:
+            records = _normalize_roster_frame(frame, errors)
+            if records:
+                yield records
+    except Exception as e:
+        raise RosterParseError(str(e)) from e
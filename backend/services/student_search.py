@@ -0,0 +1,167 @@
+from typing import Iterable, List, Optional, Set, Tuple
+from sqlalchemy import text, bindparam
+import logging
+
+from backend.database import engine
+from backend.services.pagination import encode_cursor, decode_cursor
+
+# 配置日志
+logger = logging.getLogger(__name__)
+
+# 姓名/班级切分的n-gram长度：单字支持按姓氏检索，双字组合保证多字关键词的选择性
+GRAM_SIZES = (1, 2)
+
+# 可用学生检索结果的列（与查询列顺序一致）
+AVAILABLE_STUDENT_COLUMNS = ["student_id", "name", "student_number", "class_name", "contact_info"]
+
+# 重建索引时每批处理的学生数量
+REINDEX_BATCH_SIZE = 1000
+
+_DELETE_TERMS_SQL = text(
+    "DELETE FROM student_search_terms WHERE student_id IN :student_ids"
+).bindparams(bindparam("student_ids", expanding=True))
+
+_INSERT_TERMS_SQL = text("""
+    INSERT IGNORE INTO student_search_terms (term, student_id)
+    VALUES (:term, :student_id)
+""")
+
+_SELECT_STUDENTS_PAGE_SQL = text("""
+    SELECT student_id, name, class AS class_name
+    FROM students
+    WHERE student_id > :after_id
+    ORDER BY student_id
+    LIMIT :limit
+""")
+
+
+def _grams(value: Optional[str], sizes: Iterable[int] = GRAM_SIZES) -> Set[str]:
+    """将文本切分为n-gram（忽略大小写，不跨越空白）"""
+    grams = set()
+    for token in (value or "").lower().split():
+        for size in sizes:
+            grams.update(token[i:i + size] for i in range(len(token) - size + 1))
+    return grams
+
+
+def _query_grams(search: str) -> Set[str]:
+    """关键词的检索n-gram：能切出双字时只用双字，否则用单字"""
+    return _grams(search, (2,)) or _grams(search, (1,))
+
+
+def student_terms(name: Optional[str], class_name: Optional[str]) -> Set[str]:
+    """生成学生姓名和班级的索引词"""
+    return _grams(name) | _grams(class_name)
+
+
+def index_students(conn, students: Iterable[Tuple[int, Optional[str], Optional[str]]]) -> int:
+    """
+    增量更新学生检索索引，students为(student_id, name, class)
+
+    先删除这些学生的旧索引词再写入新词，由调用方提交事务；返回写入的索引词数量。
+    学生删除时索引词随外键级联删除，无需单独处理。
+    """
+    student_ids = []
+    terms = []
+    for student_id, name, class_name in students:
+        student_ids.append(student_id)
+        terms.extend({"term": term, "student_id": student_id} for term in student_terms(name, class_name))
+
+    if not student_ids:
+        return 0
+    conn.execute(_DELETE_TERMS_SQL, {"student_ids": student_ids})
+    if terms:
+        conn.execute(_INSERT_TERMS_SQL, terms)
+    return len(terms)
+
+
+def rebuild_student_index(batch_size: int = REINDEX_BATCH_SIZE) -> int:
+    """按学生ID分批重建全部检索索引（每批一个事务），返回处理的学生数量"""
+    indexed = 0
+    after_id = 0
+    with engine.connect() as conn:
+        while True:
+            rows = conn.execute(_SELECT_STUDENTS_PAGE_SQL, {"after_id": after_id, "limit": batch_size}).fetchall()
+            if not rows:
+                break
+            index_students(conn, ((r.student_id, r.name, r.class_name) for r in rows))
+            conn.commit()
+            indexed += len(rows)
+            after_id = rows[-1].student_id
+    return indexed
+
+
+def ensure_student_index() -> int:
+    """索引表为空而学生表非空时（如从旧版本升级）重建索引，返回重建的学生数量"""
+    with engine.connect() as conn:
+        has_terms = conn.execute(text("SELECT 1 FROM student_search_terms LIMIT 1")).fetchone()
+        has_students = conn.execute(text("SELECT 1 FROM students LIMIT 1")).fetchone()
+    if has_terms or not has_students:
+        return 0
+    logger.info("学生检索索引为空，开始重建")
+    return rebuild_student_index()
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def search_available_students(conn, exam_id: int, search: Optional[str] = None,
+                              cursor: Optional[str] = None, limit: int = 50) -> Tuple[List, Optional[str]]:
+    """
+    检索未分配到该考试的学生，按姓名排序并游标分页
+
+    学号按前缀匹配（走唯一索引），姓名和班级通过n-gram索引取候选后再精确校验。
+    返回(当前页学生行, 下一页游标)。
+    """
+    conditions = ["es.student_id IS NULL"]
+    params = {"exam_id": exam_id, "limit": limit + 1}
+
+    search = search.strip() if search else ""
+    grams = _query_grams(search)
+    if grams:
+        # 候选集：学号前缀命中，或包含关键词全部n-gram的学生
+        source = """(
+            SELECT student_id FROM students WHERE student_number LIKE :prefix
+            UNION
+            SELECT student_id FROM student_search_terms
+            WHERE term IN :grams
+            GROUP BY student_id
+            HAVING COUNT(*) = :gram_count
+        ) m
+        JOIN students s ON s.student_id = m.student_id"""
+        # n-gram不保证顺序相邻，需按原关键词校验一次
+        conditions.append("(s.student_number LIKE :prefix OR s.name LIKE :contains OR s.class LIKE :contains)")
+        escaped = _escape_like(search)
+        params.update({
+            "prefix": f"{escaped}%",
+            "contains": f"%{escaped}%",
+            "grams": sorted(grams),
+            "gram_count": len(grams)
+        })
+    else:
+        source = "students s"
+
+    if cursor:
+        cursor_name, cursor_id = decode_cursor(cursor, str, int)
+        conditions.append("(s.name > :cursor_name OR (s.name = :cursor_name AND s.student_id > :cursor_id))")
+        params.update({"cursor_name": cursor_name, "cursor_id": cursor_id})
+
+    query = text(f"""
+        SELECT s.student_id, s.name, s.student_number, s.class AS class_name, s.contact_info
+        FROM {source}
+        LEFT JOIN exam_students es ON es.student_id = s.student_id AND es.exam_id = :exam_id
+        WHERE {' AND '.join(conditions)}
+        ORDER BY s.name, s.student_id
+        LIMIT :limit
+    """)
+    if grams:
+        query = query.bindparams(bindparam("grams", expanding=True))
+
+    rows = conn.execute(query, params).fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].name, rows[-1].student_id)
+    return rows, next_cursor
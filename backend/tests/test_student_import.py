@@ -0,0 +1,55 @@
+import io
+
+import openpyxl
+
+from backend.services.student_import import iter_roster_batches
+
+
+def _parse(content: str, extension: str = ".csv"):
+    errors = []
+    batches = list(iter_roster_batches(extension, io.BytesIO(content.encode("utf-8")), errors=errors))
+    return [row for batch in batches for row in batch], errors
+
+
+def test_three_column_csv_without_contact_info():
+    rows, errors = _parse("2023001,高一(1)班,张三\n2023002,高一(2)班,李四\n")
+    assert rows == [
+        {"student_number": "2023001", "class": "高一(1)班", "name": "张三", "contact_info": ""},
+        {"student_number": "2023002", "class": "高一(2)班", "name": "李四", "contact_info": ""},
+    ]
+    assert errors == []
+
+
+def test_mixed_column_counts_in_tab_separated_txt():
+    rows, _ = _parse("2023001\t1班\t张三\n2023002\t2班\t李四\t13800000000\t多余列\n2023003\t3班\n", ".txt")
+    assert [(r["student_number"], r["contact_info"]) for r in rows] == [("2023001", ""), ("2023002", "13800000000")]
+
+
+def test_duplicate_rows_are_reported():
+    rows, errors = _parse("2023001,1班,张三\n2023001,1班,张三\n2023002,1班,李四\n")
+    assert [r["student_number"] for r in rows] == ["2023001", "2023002"]
+    assert errors == ["重复行: 学生 张三 (2023001) 在文件中重复出现，已跳过"]
+
+
+def test_xlsx_column_mixing_numbers_and_text():
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(["学号", "班级", "姓名", "联系方式"])
+    sheet.append([2023001, 1, "张三", 13800000000])
+    sheet.append(["2023002", "2班", "李四", "139"])
+    content = io.BytesIO()
+    workbook.save(content)
+    content.seek(0)
+
+    rows = [row for batch in iter_roster_batches(".xlsx", content) for row in batch]
+    assert rows == [
+        {"student_number": "2023001", "class": "1", "name": "张三", "contact_info": "13800000000"},
+        {"student_number": "2023002", "class": "2班", "name": "李四", "contact_info": "139"},
+    ]
+
+
+def test_separator_is_detected_per_line():
+    rows, _ = _parse("2023001\t1班\t张三\n2023002,2班,李四,139\n")
+    assert [(r["student_number"], r["name"], r["contact_info"]) for r in rows] == [
+        ("2023001", "张三", ""), ("2023002", "李四", "139")
+    ]
@@ -40,6 +40,15 @@ CREATE TABLE exam_students (
     UNIQUE KEY unique_exam_student (exam_id, student_id)
 ) COMMENT '考试学生关联表';
 
+-- 学生检索索引表（姓名/班级的n-gram，由应用在学生增删改时增量维护）
+CREATE TABLE student_search_terms (
+    term VARCHAR(8) NOT NULL COMMENT '索引词（小写n-gram）',
+    student_id INT NOT NULL,
+    PRIMARY KEY (term, student_id),
+    KEY idx_student_search_terms_student_id (student_id),
+    FOREIGN KEY (student_id) REFERENCES students(student_id) ON DELETE CASCADE
+) COMMENT '学生检索索引表';
+
 -- 题目表
 CREATE TABLE questions (
     id INT AUTO_INCREMENT PRIMARY KEY,
@@ -65,6 +74,140 @@ CREATE TABLE exam_questions (
     UNIQUE KEY unique_exam_order (exam_id, question_order)
 ) COMMENT '考试题目关联表';
 
+-- 答题卡图片表（文件按内容哈希存储，同一考试内相同内容只登记一次）
+CREATE TABLE answer_images (
+    image_id INT AUTO_INCREMENT PRIMARY KEY,
+    exam_id INT NOT NULL,
+    student_id INT NULL COMMENT '对应学生（识别后关联）',
+    content_hash CHAR(64) NOT NULL COMMENT '文件内容SHA-256',
+    storage_path VARCHAR(255) NOT NULL COMMENT '相对UPLOAD_DIR的存储路径',
+    original_filename VARCHAR(255) COMMENT '原始文件名',
+    content_type VARCHAR(100) COMMENT 'MIME类型',
+    file_size BIGINT NOT NULL COMMENT '文件大小（字节）',
+    status ENUM('uploaded', 'processing', 'processed', 'failed') DEFAULT 'uploaded' COMMENT '预处理状态',
+    processed_path VARCHAR(255) NULL COMMENT '预处理结果路径（相对UPLOAD_DIR）',
+    preprocess_timings JSON NULL COMMENT '预处理各阶段耗时（毫秒）',
+    error_message VARCHAR(500) NULL COMMENT '预处理失败原因',
+    processing_started_at DATETIME NULL COMMENT '开始预处理时间',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP COMMENT '上传时间',
+    FOREIGN KEY (exam_id) REFERENCES exams(exam_id) ON DELETE CASCADE,
+    FOREIGN KEY (student_id) REFERENCES students(student_id) ON DELETE SET NULL,
+    UNIQUE KEY unique_exam_image (exam_id, content_hash),
+    KEY idx_answer_images_exam_id (exam_id, image_id),
+    KEY idx_answer_images_status (status, image_id)
+) COMMENT '答题卡图片表';
+
+-- 阅卷任务表（每次启动阅卷创建一条）
+CREATE TABLE grading_jobs (
+    job_id INT AUTO_INCREMENT PRIMARY KEY,
+    exam_id INT NOT NULL,
+    status ENUM('pending', 'running', 'cancelled', 'completed', 'failed') DEFAULT 'pending' COMMENT '任务状态',
+    total_tasks INT NOT NULL DEFAULT 0 COMMENT '子任务总数',
+    cache_hits INT NOT NULL DEFAULT 0 COMMENT '评分结果缓存命中次数',
+    cache_misses INT NOT NULL DEFAULT 0 COMMENT '评分结果缓存未命中次数',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+    started_at DATETIME NULL COMMENT '开始时间',
+    finished_at DATETIME NULL COMMENT '结束时间',
+    FOREIGN KEY (exam_id) REFERENCES exams(exam_id) ON DELETE CASCADE,
+    KEY idx_grading_jobs_exam (exam_id, job_id),
+    KEY idx_grading_jobs_status (status)
+) COMMENT '阅卷任务表';
+
+-- 阅卷子任务表（每个学生的每道题一条，由工作进程领取执行）
+CREATE TABLE grading_tasks (
+    task_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    job_id INT NOT NULL,
+    exam_id INT NOT NULL,
+    student_id INT NOT NULL,
+    question_id INT NOT NULL,
+    status ENUM('pending', 'running', 'done', 'failed', 'cancelled') DEFAULT 'pending' COMMENT '子任务状态',
+    attempts INT NOT NULL DEFAULT 0 COMMENT '已尝试次数',
+    answer_text TEXT NULL COMMENT '作答识别文本',
+    score DECIMAL(5,2) NULL COMMENT '得分',
+    needs_review BOOLEAN NOT NULL DEFAULT FALSE COMMENT '是否需要人工复核',
+    detail TEXT NULL COMMENT '评分说明',
+    error_message VARCHAR(500) NULL COMMENT '最近一次失败原因',
+    worker_id VARCHAR(64) NULL COMMENT '领取该任务的工作进程',
+    lease_expires_at DATETIME NULL COMMENT '租约到期时间（过期后可被重新领取）',
+    finished_at DATETIME NULL COMMENT '完成时间',
+    FOREIGN KEY (job_id) REFERENCES grading_jobs(job_id) ON DELETE CASCADE,
+    FOREIGN KEY (exam_id) REFERENCES exams(exam_id) ON DELETE CASCADE,
+    FOREIGN KEY (student_id) REFERENCES students(student_id) ON DELETE CASCADE,
+    FOREIGN KEY (question_id) REFERENCES questions(id) ON DELETE CASCADE,
+    UNIQUE KEY unique_job_task (job_id, student_id, question_id),
+    KEY idx_grading_tasks_job_status (job_id, status),
+    KEY idx_grading_tasks_status (status, task_id)
+) COMMENT '阅卷子任务表';
+
+-- 阅卷结果缓存（相同题目、相同评分标准下相同的规范化答案直接复用评分）
+CREATE TABLE grading_result_cache (
+    cache_key CHAR(64) PRIMARY KEY COMMENT 'SHA-256(题目ID:评分标准指纹:规范化答案)',
+    question_id INT NOT NULL,
+    rubric_hash CHAR(32) NOT NULL COMMENT '参考答案、评分规则、题型、分值的指纹',
+    answer_text VARCHAR(255) NOT NULL COMMENT '规范化答案（截断，仅供排查）',
+    score DECIMAL(5,2) NULL COMMENT '得分',
+    needs_review BOOLEAN NOT NULL DEFAULT FALSE COMMENT '是否需要人工复核',
+    detail TEXT NULL COMMENT '评分说明',
+    hit_count INT NOT NULL DEFAULT 0 COMMENT '命中次数',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+    last_used_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP COMMENT '最近使用时间',
+    FOREIGN KEY (question_id) REFERENCES questions(id) ON DELETE CASCADE,
+    KEY idx_grading_cache_question (question_id),
+    KEY idx_grading_cache_last_used (last_used_at)
+) COMMENT '阅卷结果缓存表';
+
+-- 学生单题得分表（阅卷完成时写入，重新阅卷覆盖；汇总表按新旧差值增量维护）
+CREATE TABLE exam_question_results (
+    exam_id INT NOT NULL,
+    student_id INT NOT NULL,
+    question_id INT NOT NULL,
+    task_id BIGINT NULL COMMENT '产生该得分的阅卷子任务',
+    score DECIMAL(5,2) NULL COMMENT '得分（待复核且无分数时为空）',
+    needs_review BOOLEAN NOT NULL DEFAULT FALSE COMMENT '是否需要人工复核',
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+    PRIMARY KEY (exam_id, student_id, question_id),
+    FOREIGN KEY (exam_id) REFERENCES exams(exam_id) ON DELETE CASCADE,
+    FOREIGN KEY (student_id) REFERENCES students(student_id) ON DELETE CASCADE,
+    FOREIGN KEY (question_id) REFERENCES questions(id) ON DELETE CASCADE,
+    KEY idx_exam_question_results_question (exam_id, question_id)
+) COMMENT '学生单题得分表';
+
+-- 学生总分汇总表（按总分排序的索引用于成绩分页和排名）
+CREATE TABLE exam_student_totals (
+    exam_id INT NOT NULL,
+    student_id INT NOT NULL,
+    class_name VARCHAR(100) NULL COMMENT '班级（冗余自学生表，用于班级排名）',
+    total_score DECIMAL(8,2) NOT NULL DEFAULT 0 COMMENT '总分',
+    graded_count INT NOT NULL DEFAULT 0 COMMENT '已评分题数',
+    review_count INT NOT NULL DEFAULT 0 COMMENT '待复核题数',
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+    PRIMARY KEY (exam_id, student_id),
+    FOREIGN KEY (exam_id) REFERENCES exams(exam_id) ON DELETE CASCADE,
+    FOREIGN KEY (student_id) REFERENCES students(student_id) ON DELETE CASCADE,
+    KEY idx_exam_student_totals_rank (exam_id, total_score DESC, student_id),
+    KEY idx_exam_student_totals_class_rank (exam_id, class_name, total_score DESC, student_id)
+) COMMENT '学生总分汇总表';
+
+-- 题目得分统计表（平均分 = score_sum / graded_count）
+CREATE TABLE exam_question_stats (
+    exam_id INT NOT NULL,
+    question_id INT NOT NULL,
+    score_sum DECIMAL(10,2) NOT NULL DEFAULT 0 COMMENT '得分合计',
+    graded_count INT NOT NULL DEFAULT 0 COMMENT '已评分人数',
+    review_count INT NOT NULL DEFAULT 0 COMMENT '待复核人数',
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+    PRIMARY KEY (exam_id, question_id),
+    FOREIGN KEY (exam_id) REFERENCES exams(exam_id) ON DELETE CASCADE,
+    FOREIGN KEY (question_id) REFERENCES questions(id) ON DELETE CASCADE
+) COMMENT '题目得分统计表';
+
+-- 考试成绩版本号（单题得分、班级或题目分值变化时递增，成绩分析缓存据此失效）
+CREATE TABLE exam_score_versions (
+    exam_id INT PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0 COMMENT '版本号',
+    FOREIGN KEY (exam_id) REFERENCES exams(exam_id) ON DELETE CASCADE
+) COMMENT '考试成绩版本号表';
+
 -- 用户表
 CREATE TABLE users (
     user_id INT AUTO_INCREMENT PRIMARY KEY,
@@ -78,6 +221,24 @@ CREATE TABLE users (
     last_login TIMESTAMP NULL COMMENT '最后登录时间'
 ) COMMENT '用户信息表';
 
+-- 已注销会话表（多个API进程共享注销记录，令牌过期后清理）
+CREATE TABLE revoked_sessions (
+    session_id VARCHAR(32) PRIMARY KEY COMMENT '会话ID',
+    expires_at DATETIME NOT NULL COMMENT '令牌过期时间',
+    revoked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP COMMENT '注销时间',
+    KEY idx_revoked_sessions_revoked_at (revoked_at),
+    KEY idx_revoked_sessions_expires_at (expires_at)
+) COMMENT '已注销会话表';
+
 -- 创建索引优化查询性能
 CREATE INDEX idx_exam_students_exam_id ON exam_students(exam_id);
 CREATE INDEX idx_exam_students_student_id ON exam_students(student_id);
+CREATE INDEX idx_exams_created_at ON exams(created_at, exam_id);
+CREATE INDEX idx_exams_status_created_at ON exams(status, created_at, exam_id);
+
+-- 题库全文检索（ngram分词支持中文，需MySQL 5.7.6+）
+CREATE FULLTEXT INDEX ft_questions_content ON questions(content) WITH PARSER ngram;
+CREATE INDEX idx_questions_type ON questions(type);
+
+-- 可用学生列表按姓名分页
+CREATE INDEX idx_students_name ON students(name, student_id);